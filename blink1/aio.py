@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+aio.py -- asyncio interface to blink(1)
+
+Each AsyncBlink1 runs the blocking HID I/O of its Blink1 on its own
+single-thread executor, so one event loop can drive many devices at once
+without blocking:
+
+    import asyncio
+    from blink1.aio import blink1
+
+    async def main():
+        async with blink1() as b1:
+            await b1.fade_to_color(100, 'navy')
+            task = b1.play_pattern_local('0, red,0.5,0, blue,0.5,0')
+            await asyncio.sleep(10)
+            task.cancel()
+
+    asyncio.run(main())
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from .blink1 import Blink1
+from .patternram import PATTERN_SIZE
+from .pattern import as_pattern
+
+
+class AsyncBlink1(object):
+    """Awaitable wrapper around a Blink1, with its own I/O thread.
+    """
+    def __init__(self, b1, executor=None):
+        """
+        :param b1: an open Blink1
+        :param executor: executor to run I/O on, default a new single thread
+        """
+        self.b1 = b1
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='blink1')
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    async def open(cls, serial_number=None, gamma=None, white_point=None):
+        """ Open a blink(1) without blocking the event loop
+        :param serial_number: serial number of blink(1) to open, otherwise first found
+        :param gamma: Triple of gammas for each channel e.g. (2, 2, 2)
+        :param white_point: white point as (r,g,b), Kelvin or name
+        :raises: Blink1ConnectionFailed: if blink(1) is not present
+        """
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='blink1')
+        loop = asyncio.get_running_loop()
+        try:
+            b1 = await loop.run_in_executor(executor, functools.partial(
+                Blink1, serial_number=serial_number, gamma=gamma,
+                white_point=white_point))
+        except BaseException:
+            executor.shutdown(wait=False)
+            raise
+        return cls(b1, executor)
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _call(self, func, *args, **kwargs):
+        async with self._lock:
+            return await self._run(func, *args, **kwargs)
+
+    async def close(self):
+        """ Close the blink(1) and stop its I/O thread
+        """
+        await self._call(self.b1.close)
+        self._executor.shutdown(wait=False)
+
+    async def fade_to_rgb(self, fade_milliseconds, red, green, blue, ledn=0):
+        """ Command blink(1) to fade to RGB color, see Blink1.fade_to_rgb()
+        """
+        return await self._call(
+            self.b1.fade_to_rgb, fade_milliseconds, red, green, blue, ledn)
+
+    async def fade_to_color(self, fade_milliseconds, color, ledn=0):
+        """ Fade the light to a known colour, see Blink1.fade_to_color()
+        """
+        return await self._call(
+            self.b1.fade_to_color, fade_milliseconds, color, ledn)
+
+    async def off(self):
+        """ Switch the blink(1) off instantly
+        """
+        return await self._call(self.b1.off)
+
+    async def get_version(self):
+        """ Get blink(1) firmware version
+        :raises: Blink1ConnectionFailed: if blink(1) is disconnected
+        """
+        return await self._call(self.b1.get_version)
+
+    async def get_serial_number(self):
+        """ Get blink(1) serial number
+        """
+        return await self._call(self.b1.get_serial_number)
+
+    async def play(self, start_pos=0, end_pos=0, count=0):
+        """ Play internal color pattern, see Blink1.play()
+        """
+        return await self._call(self.b1.play, start_pos, end_pos, count)
+
+    async def stop(self):
+        """ Stop internal color pattern playing
+        """
+        return await self._call(self.b1.stop)
+
+    async def write_pattern_line(self, step_milliseconds, color, pos, ledn=0):
+        """ Write a color & step time color pattern line to RAM
+        """
+        return await self._call(
+            self.b1.write_pattern_line, step_milliseconds, color, pos, ledn)
+
+    async def read_pattern_line(self, pos):
+        """ Read a color pattern line at position
+        """
+        return await self._call(self.b1.read_pattern_line, pos)
+
+    async def read_pattern(self, start_pos=0, end_pos=PATTERN_SIZE):
+        """ Read the color pattern, or just some lines of it
+        """
+        return await self._call(self.b1.read_pattern, start_pos, end_pos)
+
+    async def play_pattern(self, pattern_str):
+        """ Upload a Blink1Control-style pattern string and play it on the blink(1)
+        """
+        return await self._call(self.b1.play_pattern, pattern_str)
+
+    async def server_tickle(self, enable, timeout_millis=0, stay_lit=False,
+                            start_pos=0, end_pos=16):
+        """ Enable/disable servertickle / serverdown watchdog
+        """
+        return await self._call(self.b1.server_tickle, enable, timeout_millis,
+                                stay_lit, start_pos, end_pos)
+
+    def play_pattern_local(self, pattern_str):
+        """ Play a Blink1Control pattern string from the event loop
+        :param pattern_str: The Blink1Control-style pattern string to play,
+            or a compiled Pattern
+        :return: asyncio.Task playing the pattern; cancel() it to stop, or
+            await it to wait for a pattern with a repeat count to finish
+        """
+        return asyncio.get_running_loop().create_task(
+            self._play_pattern_local(pattern_str))
+
+    async def _play_pattern_local(self, pattern_str):
+        pattern = as_pattern(pattern_str)
+        num_repeats = pattern.repeats
+        if num_repeats == 0:
+            num_repeats = -1
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while num_repeats:
+            num_repeats -= 1
+
+            for line in pattern.lines:
+                await self.fade_to_color(line.millis, line.rgb, line.ledn)
+                deadline += line.time
+                await asyncio.sleep(max(0.0, deadline - loop.time()))
+
+
+@asynccontextmanager
+async def blink1(switch_off=True, gamma=None, white_point=None, serial_number=None):
+    """Async context manager which automatically shuts down the Blink(1)
+    after use.
+    :param switch_off: turn blink(1) off when existing context
+    :param gamma: set gamma curve (as tuple)
+    :param white_point: set white point (as tuple)
+    :param serial_number: serial number of blink(1) to open, otherwise first found
+    """
+    b1 = await AsyncBlink1.open(serial_number, gamma=gamma, white_point=white_point)
+    try:
+        yield b1
+        if switch_off:
+            await b1.off()
+    finally:
+        await b1.close()
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+batch.py -- record a burst of blink(1) commands and send it optimized
+
+Inside `with b1.batch():` commands are recorded instead of written. On
+exit the recorded reports are optimized and sent back to back:
+
+ * a fade is dropped when later fades cover all the LEDs it set,
+   so a fade to all LEDs supersedes earlier per-LED fades,
+ * per-LED fades setting every LED to the same color become one fade
+   to all LEDs,
+ * a set_ledn not used by a pattern line write before the next one is
+   dropped, as is one setting the LED that is already current,
+ * a pattern line written twice keeps only the last write.
+
+Any other command (play, save, servertickle, ...) is sent in order and
+nothing is moved across it. A read, e.g. get_version(), sends the
+commands recorded so far first. If the block raises, the recorded
+commands are discarded. The block holds the device's lock, so other
+threads' commands wait until it exits:
+
+    with b1.batch() as batch:
+        b1.fade_to_color(100, 'red', 1)
+        b1.fade_to_color(100, 'blue', 2)
+        b1.write_pattern_line(100, 'red', 0)
+        b1.play()
+    print(batch.saved)  # reports not sent
+"""
+from .protocol import CMD_FADE_TO_RGB, CMD_SET_LEDN, CMD_WRITE_PATTERN_LINE
+from .shadow import NUM_LEDS
+
+
+def optimize(reports, num_leds=NUM_LEDS):
+    """ Optimize a command sequence without changing its outcome
+    :param reports: list of 9-byte reports, in send order
+    :param num_leds: number of LEDs a fade to ledn 0 sets
+    :return: list of reports to send instead
+    """
+    all_leds = frozenset(range(1, num_leds + 1))
+    out = []
+    owner = {}  # led -> index in out of the fade it shows
+    covers = {}  # index in out of a fade -> leds still showing it
+    lines = {}  # pattern pos -> index in out of its newest write
+    ledn = None  # current LED after the kept commands, None if unknown
+    pending = None  # index in out of a set_ledn no line write used yet
+    for report in reports:
+        cmd = report[1]
+        if cmd == CMD_FADE_TO_RGB:
+            n = report[7]
+            targets = all_leds if n == 0 else frozenset((n,)) & all_leds
+            index = len(out)
+            out.append(report)
+            for led in targets:
+                old = owner.get(led)
+                if old is not None:
+                    covers[old].discard(led)
+                    if not covers[old]:
+                        out[old] = None
+                        del covers[old]
+                owner[led] = index
+            covers[index] = set(targets)
+            if n and len(targets) == 1 and _same_fade(out, owner, all_leds):
+                for old in set(owner.values()):
+                    out[old] = None
+                    covers.pop(old, None)
+                out[index] = report[:7] + b'\x00' + report[8:]
+                for led in all_leds:
+                    owner[led] = index
+                covers[index] = set(all_leds)
+        elif cmd == CMD_SET_LEDN:
+            if pending is not None:
+                out[pending] = None  # no line written for that LED
+                pending = None
+            if report[2] != ledn:
+                pending = len(out)
+                out.append(report)
+        elif cmd == CMD_WRITE_PATTERN_LINE:
+            if pending is not None:
+                ledn = out[pending][2]
+                pending = None
+            pos = report[7]
+            old = lines.get(pos)
+            if old is not None:
+                out[old] = None
+            lines[pos] = len(out)
+            out.append(report)
+        else:
+            # a barrier: nothing is dropped or merged across it
+            owner.clear()
+            covers.clear()
+            lines.clear()
+            if pending is not None:
+                ledn = out[pending][2]  # kept: the device has that LED now
+                pending = None
+            out.append(report)
+    return [report for report in out if report is not None]
+
+
+def _same_fade(out, owner, all_leds):
+    """ True if every LED shows its own per-LED fade, all with the same
+    color and fade time
+    """
+    if len(all_leds) < 2 or not all_leds.issubset(owner):
+        return False
+    indexes = set(owner[led] for led in all_leds)
+    if len(indexes) != len(all_leds):
+        return False
+    fades = set(out[i][2:7] for i in indexes)
+    return len(fades) == 1
+
+
+class Batch(object):
+    """Commands recorded by Blink1.batch(), sent when the outermost
+    `with` block exits
+    """
+    def __init__(self, blink1):
+        """
+        :param blink1: Blink1 to send the commands to
+        """
+        self.blink1 = blink1
+        self.reports = []
+        self.recorded = 0
+        self.sent = 0
+        self.saved = 0  # reports the optimizer made unnecessary
+        self.discarded = 0  # reports dropped because of an error
+        self._depth = 0
+
+    def record(self, buf):
+        """ Record a report
+        :param buf: 9-byte report, copied
+        """
+        self.reports.append(bytes(buf))
+        self.recorded += 1
+
+    def flush(self):
+        """ Send the reports recorded so far, optimized, as one burst
+        :raises: Blink1ConnectionFailed: if blink(1) is disconnected
+        """
+        reports = optimize(self.reports)
+        self.saved += len(self.reports) - len(reports)
+        self.reports = []
+        b1 = self.blink1
+        send = b1._write if b1._coalescer is None else b1._coalescer.submit
+        with b1.lock:
+            for i, report in enumerate(reports):
+                try:
+                    send(report)
+                except Exception:
+                    self.discarded += len(reports) - i
+                    self._forget()
+                    raise
+                self.sent += 1
+
+    def discard(self):
+        """ Drop the reports recorded so far
+        """
+        self.discarded += len(self.reports)
+        self.reports = []
+        self._forget()
+
+    def _forget(self):
+        # the shadow state assumed the recorded commands were sent
+        b1 = self.blink1
+        if b1.shadow is not None:
+            b1.shadow.invalidate()
+            b1.pattern_ram.invalidate()
+
+    def __enter__(self):
+        # held until the block exits: other threads' commands wait instead
+        # of being recorded, reordered or discarded with this batch
+        self.blink1.lock.acquire()
+        if not self._depth:
+            self.blink1._batch = self
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self._depth -= 1
+            if self._depth:
+                return
+            self.blink1._batch = None
+            if exc_type is None:
+                self.flush()
+            else:
+                self.discard()
+        finally:
+            self.blink1.lock.release()
+
+    def stats(self):
+        """ Reports recorded, sent, saved by the optimizer and discarded
+        """
+        return {'recorded': self.recorded, 'sent': self.sent,
+                'saved': self.saved, 'discarded': self.discarded}
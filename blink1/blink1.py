@@ -6,24 +6,42 @@ All platforms:
  % pip3 install blink1
 
 """
+import importlib
 import logging
+import threading
 import time
+from time import perf_counter
 from contextlib import contextmanager
-import webcolors
-import hid
 import os
 # from builtins import str as text
 
 from .kelvin import kelvin_to_rgb, COLOR_TEMPERATURES
+from .colors import InvalidColor, color_to_rgb, COLOR_CACHE_SIZE
+from . import protocol
+from .protocol import REPORT_ID, REPORT_SIZE
+from .shadow import ShadowState
+from .patternram import PatternRAM, PATTERN_SIZE, pattern_line
 
 
-class Blink1ConnectionFailed(RuntimeError):
-    """Raised when we cannot connect to a Blink(1)
+class _LazyModule(object):
+    """Imports a module on first attribute access, to keep importing
+    blink1 fast for short-lived command line tools
     """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
 
+hid = _LazyModule('hid')
 
-class InvalidColor(ValueError):
-    """Raised when the user requests an implausible colour
+
+class Blink1ConnectionFailed(RuntimeError):
+    """Raised when we cannot connect to a Blink(1)
     """
 
 
@@ -35,16 +53,20 @@ if os.getenv('DEBUGBLINK1'):
 DEFAULT_GAMMA = (2, 2, 2)
 DEFAULT_WHITE_POINT = (255, 255, 255)
 
-REPORT_ID = 0x01
 VENDOR_ID = 0x27B8
 PRODUCT_ID = 0x01ED
 
-REPORT_SIZE = 9  # 8 bytes + 1 byte reportId
-
+RESPONSE_TIMEOUT = 0.5  # max seconds to wait for a command's response
+RESPONSE_POLL_MIN = 0.001  # first wait between response polls, doubles
+RESPONSE_POLL_MAX = 0.01  # up to this
 
 class ColorCorrect(object):
     """Apply a gamma correction to any selected RGB color, see:
     http://en.wikipedia.org/wiki/Gamma_correction
+
+    The correction for every possible 8-bit channel value is computed once,
+    whenever gamma or white point are set, so correcting a color is just
+    three table lookups.
     """
     def __init__(self, gamma, white_point):
         """
@@ -54,48 +76,270 @@ class ColorCorrect(object):
 
         All gamma values should be 0 > x >= 1
         """
-
-        self.gamma = gamma
+        self._gamma = tuple(gamma)
 
         if isinstance(white_point, str):
             kelvin = COLOR_TEMPERATURES[white_point]
-            self.white_point = kelvin_to_rgb(kelvin)
+            self._white_point = kelvin_to_rgb(kelvin)
         elif isinstance(white_point, (int, float)):
-            self.white_point = kelvin_to_rgb(white_point)
+            self._white_point = kelvin_to_rgb(white_point)
         else:
-            self.white_point = white_point
+            self._white_point = tuple(white_point)
+
+        self._build_tables()
+
+    @property
+    def gamma(self):
+        return self._gamma
+
+    @gamma.setter
+    def gamma(self, gamma):
+        self._gamma = tuple(gamma)
+        self._build_tables()
+
+    @property
+    def white_point(self):
+        return self._white_point
+
+    @white_point.setter
+    def white_point(self, white_point):
+        self._white_point = tuple(white_point)
+        self._build_tables()
+
+    @property
+    def tables(self):
+        """ The (r, g, b) byte lookup tables correct_many() uses, 256 bytes
+        each; two ColorCorrects with equal tables correct alike
+        """
+        return self._tables
+
+    def _build_tables(self):
+        """ Precompute per-channel lookup tables for luminance 0-255
+        """
+        self._corrected = {}
+        self._luts = tuple(
+            tuple(self.gamma_correct(g, w, l) for l in range(256))
+            for (g, w) in zip(self._gamma, self._white_point)
+        )
+        # byte tables for correct_many(), clamped to what fits in a report
+        self._tables = tuple(
+            bytes(min(max(v, 0), 255) for v in lut) for lut in self._luts
+        )
 
     @staticmethod
     def gamma_correct(gamma, white, luminance):
         return round(white * (luminance / 255.0) ** gamma)
 
     def __call__(self, r, g, b):
+        lut_r, lut_g, lut_b = self._luts
+        try:
+            if r >= 0 and g >= 0 and b >= 0:
+                return lut_r[r], lut_g[g], lut_b[b]
+        except (IndexError, TypeError):
+            pass
+        # not plain 0-255 ints (e.g. floats), compute the slow way
         color = [r, g, b]
         return tuple(
             self.gamma_correct(g, w, l)
-            for (g, w, l) in zip(self.gamma, self.white_point, color)
+            for (g, w, l) in zip(self._gamma, self._white_point, color)
         )
 
+    def correct_color(self, color):
+        """ Resolve a color and color correct it, remembering the result
+        :param color: a color string, e.g. "#FF00FF" or "red", or (r,g,b) tuple
+        :return: corrected (r,g,b) tuple
+        :raises: InvalidColor: if color is bad
+        """
+        try:
+            return self._corrected[color]
+        except KeyError:
+            pass
+        except TypeError:  # unhashable, e.g. a list
+            return self(*color_to_rgb(color))
+
+        rgb = self(*color_to_rgb(color))
+        if len(self._corrected) >= COLOR_CACHE_SIZE:
+            del self._corrected[next(iter(self._corrected))]
+        self._corrected[color] = rgb
+        return rgb
+
+    def correct_many(self, colors):
+        """ Color correct a whole buffer of packed RGB triples at once
+        :param colors: bytes-like object (bytes, bytearray, array('B'),
+            C-contiguous uint8 NumPy array, ...) of r,g,b,r,g,b,... values,
+            or a sequence of (r,g,b) tuples
+        :return: corrected r,g,b,r,g,b,... values as bytes
+        :raises: ValueError: if colors is not a whole number of 8-bit triples
+        """
+        try:
+            view = memoryview(colors)
+        except TypeError:
+            view = memoryview(bytes(c for rgb in colors for c in rgb))
+        if view.itemsize != 1:
+            raise ValueError("colors must be a buffer of 8-bit values")
+        view = view.cast('B')
+        if len(view) % 3:
+            raise ValueError("colors must be a multiple of 3 bytes long")
+
+        out = bytearray(len(view))
+        for i, table in enumerate(self._tables):
+            out[i::3] = view[i::3].tobytes().translate(table)
+        return bytes(out)
+
 
 class Blink1(object):
     """Light controller class, sends messages to the blink(1) via USB HID.
     """
-    def __init__(self, serial_number=None, gamma=None, white_point=None):
+    # optional blink1.registry.DeviceRegistry that list() and find() use
+    # instead of enumerating the USB bus each time
+    registry = None
+    # optional transport, e.g. blink1.transport.HidrawTransport(), tried
+    # before hidapi when opening and listing devices
+    transport = None
+    # optional blink1.metrics.Metrics counting every report written and read
+    metrics = None
+
+    def __init__(self, serial_number=None, gamma=None, white_point=None,
+                 shadow=True, reconnect=None):
         """
         :param serial_number: serial number of blink(1) to open, otherwise first found
         :param gamma: Triple of gammas for each channel e.g. (2, 2, 2)
+        :param shadow: True (default) to remember the commanded state and
+            pattern RAM and skip commands that would not change them,
+            see blink1.shadow and blink1.patternram
+        :param reconnect: a blink1.reconnect.ReconnectPolicy to reopen the
+            device when a write fails, instead of raising at once
         """
+        # held by each command across encoding and sending its report, and
+        # by callers that must run several commands without interleaving
+        self.lock = threading.RLock()
         self.cc = ColorCorrect(
             gamma=gamma or DEFAULT_GAMMA,
             white_point=(white_point or DEFAULT_WHITE_POINT)
         )
+        self._report = bytearray(REPORT_SIZE)  # reused for every command
+        self._coalescer = None
+        self._batch = None
+        self._playback = None
+        self.trace = None  # TraceRecorder, see start_trace()
+        self.shadow = ShadowState() if shadow else None
+        self.pattern_ram = PatternRAM() if shadow else None
+        self._version = None
+        self._serial_number = None
+        self._reconnect = None
+        self._device_metrics = None  # DeviceMetrics of this device, see _send()
         self.dev = self.find(serial_number)
         if self.dev is None:
             print("wtf")
+        self.reconnect = reconnect
+        if self.metrics is not None:
+            self.metrics.opened(self._metrics_serial())
+
+    @property
+    def reconnect(self):
+        """ The blink1.reconnect.ReconnectPolicy reopening the device when
+        a write fails, or None to raise at once
+        """
+        return self._reconnect
+
+    @reconnect.setter
+    def reconnect(self, policy):
+        if policy is not None:
+            self.get_serial_number()  # reopen this one, not the first found
+        self._reconnect = policy
+
+    def _reopen(self, replay=True):
+        """ Close and reopen the device with the same serial number, used
+        by blink1.reconnect. The device may have been reset, so the shadow
+        and pattern RAM state are dropped.
+        :param replay: resend the last commanded LED colors
+        :raises: Blink1ConnectionFailed: if it cannot be opened
+        """
+        colors = []
+        if self.shadow is not None:
+            colors = [(n, state) for n, state in enumerate(self.shadow.leds) if state]
+        if self.dev is not None:
+            try:
+                self.dev.close()  # later writes fail until find() succeeds
+            except Exception:
+                pass
+        self.dev = self.find(self._serial_number)
+        if self.metrics is not None:
+            self.metrics.reconnected(self._metrics_serial())
+        if self.shadow is not None:
+            self.shadow.invalidate()
+            self.pattern_ram.invalidate()
+        if replay:
+            buf = bytearray(REPORT_SIZE)
+            for n, (r, g, b, _) in colors:
+                self._send(protocol.encode_fade_to_rgb(buf, 0, r, g, b, n))
+                self.shadow.set_fade(r, g, b, 0, n)
 
     def close(self):
-        self.dev.close()
-        self.dev = None
+        if self._playback is not None:
+            from .player import default_player
+            default_player().stop(self)
+            self._playback = None
+        if self._coalescer is not None:
+            self.disable_coalescing()
+        with self.lock:
+            self.stop_trace()
+            if self.shadow is not None:
+                self.shadow.invalidate()
+                self.pattern_ram.invalidate()
+            self.dev.close()
+            self.dev = None
+
+    def enable_coalescing(self, **kwargs):
+        """ Send reports from a background thread that drops superseded
+        fades and adapts its rate to the device, see blink1.coalesce
+        :param kwargs: CoalescingWriter options, e.g. max_rate, max_pending
+        :return: the CoalescingWriter, for its stats()
+        """
+        if self._coalescer is None:
+            from .coalesce import CoalescingWriter
+            self._coalescer = CoalescingWriter(self._write, lock=self.lock, **kwargs)
+        return self._coalescer
+
+    def start_trace(self, path, **kwargs):
+        """ Record every report sent to and read from the blink(1) in a
+        binary trace file, for blink1.trace.replay(), until stop_trace()
+        :param path: trace file to create
+        :param kwargs: TraceRecorder options, e.g. buffer_records
+        :return: the TraceRecorder
+        """
+        from .trace import TraceRecorder
+        self.stop_trace()
+        self.trace = TraceRecorder(path, **kwargs)
+        return self.trace
+
+    def stop_trace(self):
+        """ Stop recording and close the trace file
+        """
+        trace, self.trace = self.trace, None
+        if trace is not None:
+            trace.close()
+
+    def batch(self):
+        """ Record commands and send them optimized as one burst when the
+        `with` block exits, see blink1.batch. Nested blocks join the
+        outermost one. Other threads' commands wait until the block exits.
+        :return: the Batch, a context manager, for its stats()
+        """
+        with self.lock:  # another thread's batch is not joined
+            if self._batch is not None:
+                return self._batch
+            from .batch import Batch
+            return Batch(self)
+
+    def disable_coalescing(self):
+        """ Send any queued reports and go back to writing synchronously.
+        Not to be called holding self.lock, the writer thread needs it.
+        :raises: Blink1ConnectionFailed: if a queued write failed
+        """
+        coalescer, self._coalescer = self._coalescer, None
+        if coalescer is not None:
+            coalescer.close()
 
     @staticmethod
     def find(serial_number=None):
@@ -103,6 +347,25 @@ class Blink1(object):
         :param serial_number: serial number of blink(1) device (from Blink1.list())
         :raises: Blink1ConnectionFailed: if blink(1) is not present
         """
+        transport = Blink1.transport
+        if transport is not None:
+            try:
+                return transport.open(VENDOR_ID, PRODUCT_ID, serial_number)
+            except (IOError, OSError) as e:
+                log.debug("transport open failed, using hidapi: %s", e)
+
+        registry = Blink1.registry
+        if registry is not None:
+            info = registry.lookup(serial_number)
+            if info is not None:
+                try:
+                    hidraw = hid.device()
+                    hidraw.open_path(info['path'])
+                    return hidraw
+                except (IOError, OSError) as e:
+                    log.debug("cached path failed, enumerating: %s", e)
+                    registry.invalidate()
+
         try:
             hidraw = hid.device(VENDOR_ID, PRODUCT_ID, serial_number)
             hidraw.open(VENDOR_ID, PRODUCT_ID, serial_number)
@@ -122,6 +385,12 @@ class Blink1(object):
         """ List blink(1) devices connected, by serial number
         :return: List of blink(1) device serial numbers
         """
+        if Blink1.registry is not None:
+            return Blink1.registry.serials()
+        if Blink1.transport is not None:
+            devs = Blink1.transport.enumerate(VENDOR_ID, PRODUCT_ID)
+            if devs:
+                return [d.get('serial_number') for d in devs]
         try:
             devs = hid.enumerate(VENDOR_ID, PRODUCT_ID)
             serials = list(map(lambda d: d.get('serial_number'), devs))
@@ -136,13 +405,53 @@ class Blink1(object):
     def write(self, buf):
         """ Write command to blink(1), low-level internal use
         Send USB Feature Report 0x01 to blink(1) with 8-byte payload
-        Note: arg 'buf' must be 8 bytes or bad things happen
+        Note: arg 'buf' must be 9 bytes (see blink1.protocol) or bad things happen
         :raises: Blink1ConnectionFailed if blink(1) is disconnected
         """
-        log.debug("blink1write:" + ",".join('0x%02x' % v for v in buf))
-        rc = self.dev.send_feature_report(buf)
-        # return self.dev.send_feature_report(buf)
+        with self.lock:
+            if self._batch is not None:
+                return self._batch.record(buf)
+            if self._coalescer is not None:
+                return self._coalescer.submit(buf)
+            self._write(buf)
+
+    def _write(self, buf):
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("blink1write:" + protocol.format_report(buf))
+        try:
+            self._send(buf)
+        except Blink1ConnectionFailed as e:
+            if self.reconnect is None or not self.reconnect.recover(self, e):
+                raise
+            self._send(buf)
+
+    def _send(self, buf):
+        if self.trace is not None:
+            self.trace.write(buf)
+        metrics = self.metrics
+        try:
+            if metrics is None:
+                rc = self.dev.send_feature_report(buf)
+            else:
+                device = self._device_metrics
+                if device is None or device.metrics is not metrics:
+                    device = self._open_metrics(metrics)
+                start = perf_counter()
+                rc = self.dev.send_feature_report(buf)
+                device.write(buf[1], perf_counter() - start)
+        except (IOError, OSError, ValueError):
+            if self.reconnect is None:
+                if metrics is not None:
+                    self._count_error(metrics)
+                raise
+            rc = -1  # hidapi raises when the device is gone
+        except Exception:
+            if metrics is not None:
+                self._count_error(metrics)
+            raise
         if rc != REPORT_SIZE:
+            if metrics is not None:
+                self._count_error(metrics)
             raise Blink1ConnectionFailed(
                 "write returned %d instead of %d" % (rc, REPORT_SIZE)
             )
@@ -151,10 +460,68 @@ class Blink1(object):
         """ Read command result from blink(1), low-level internal use
         Receive USB Feature Report 0x01 from blink(1) with 8-byte payload
         Note: buf must be 8 bytes or bad things happen
+        With a reconnect policy, a failed read reopens the device but still
+        raises, as the answer to the command is lost.
+        """
+        with self.lock:
+            if self._batch is not None:
+                self._batch.flush()
+            if self._coalescer is not None:
+                self._coalescer.flush()
+            metrics = self.metrics
+            try:
+                if metrics is None:
+                    buf = self.dev.get_feature_report(REPORT_ID, REPORT_SIZE)
+                else:
+                    device = self._device_metrics
+                    if device is None or device.metrics is not metrics:
+                        device = self._open_metrics(metrics)
+                    start = perf_counter()
+                    try:
+                        buf = self.dev.get_feature_report(REPORT_ID, REPORT_SIZE)
+                    except Exception:
+                        self._count_error(metrics)
+                        raise
+                    device.read(buf[1], perf_counter() - start)
+            except (IOError, OSError, ValueError) as e:
+                if self.reconnect is None:
+                    raise
+                self.reconnect.recover(self, e)
+                raise Blink1ConnectionFailed("read failed: %s" % e)
+            if self.trace is not None:
+                self.trace.read(buf)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("blink1read: " + protocol.format_report(buf))
+            return buf
+
+    def _open_metrics(self, metrics):
+        # the serial number and histograms are looked up once, not per report
+        self._device_metrics = metrics.device(self._metrics_serial())
+        return self._device_metrics
+
+    def _count_error(self, metrics):
+        device = self._device_metrics
+        if device is None or device.metrics is not metrics:
+            device = self._open_metrics(metrics)
+        metrics.error(device.serial)
+
+    def _metrics_serial(self):
+        serial = self._serial_number
+        if serial is None:
+            try:
+                serial = self.get_serial_number()
+            except Exception:
+                serial = ''
+        return serial
+
+    def stats(self):
+        """ Snapshot of this blink(1)'s I/O metrics, see blink1.metrics
+        :return: dict of write and read histograms per command, errors
+            and reconnects, or None if Blink1.metrics is not set
         """
-        buf = self.dev.get_feature_report(REPORT_ID, 9)
-        log.debug("blink1read: " + ",".join('0x%02x' % v for v in buf))
-        return buf
+        if self.metrics is None:
+            return None
+        return self.metrics.stats(self._metrics_serial())
 
     def fade_to_rgb_uncorrected(
         self,
@@ -165,14 +532,28 @@ class Blink1(object):
         ledn=0
     ):
         """ Command blink(1) to fade to RGB color, no color correction applied.
+        :return: True if sent, False if skipped because the LED already has that color
         :raises: Blink1ConnectionFailed if blink(1) is disconnected
         """
-        action = ord('c')
-        fade_time = int(fade_milliseconds / 10)
-        th = (fade_time & 0xff00) >> 8
-        tl = fade_time & 0x00ff
-        buf = [REPORT_ID, action, int(red), int(green), int(blue), th, tl, ledn, 0]
-        self.write(buf)
+        shadow = self.shadow
+        with self.lock:
+            if shadow is None:
+                self.write(protocol.encode_fade_to_rgb(
+                    self._report, fade_milliseconds, red, green, blue, ledn))
+                return True
+
+            r, g, b = int(red), int(green), int(blue)
+            if shadow.fade_is_current(r, g, b, ledn, fade_milliseconds):
+                shadow.skipped += 1
+                return False
+            try:
+                self.write(protocol.encode_fade_to_rgb(
+                    self._report, fade_milliseconds, r, g, b, ledn))
+            except Exception:
+                shadow.invalidate()
+                raise
+            shadow.set_fade(r, g, b, fade_milliseconds, ledn)
+            return True
 
     def fade_to_rgb(self, fade_milliseconds, red, green, blue, ledn=0):
         """ Command blink(1) to fade to RGB color
@@ -181,6 +562,7 @@ class Blink1(object):
         :param green: 0-255
         :param blue: 0-255
         :param ledn: which LED to control (0=all, 1=LED A, 2=LED B)
+        :return: True if sent, False if skipped because the LED already has that color
         :raises: Blink1ConnectionFailed: if blink(1) is disconnected
         """
         r, g, b = self.cc(red, green, blue)
@@ -192,53 +574,69 @@ class Blink1(object):
         :param color: a color string, e.g. "#FF00FF" or "red"
         :raises: InvalidColor: if color string is bad
         """
-        if isinstance(color, tuple):
-            return color
-        if color.startswith('#'):
-            try:
-                return webcolors.hex_to_rgb(color)
-            except ValueError:
-                raise InvalidColor(color)
-
-        try:
-            return webcolors.name_to_rgb(color)
-        except ValueError:
-            raise InvalidColor(color)
+        return color_to_rgb(color)
 
     def fade_to_color(self, fade_milliseconds, color, ledn=0):
         """ Fade the light to a known colour
         :param fade_milliseconds: Duration of the fade in milliseconds
         :param color: Named color to fade to (e.g. "#FF00FF", "red")
         :param ledn: which led to control
+        :return: True if sent, False if skipped because the LED already has that color
         :raises: Blink1ConnectionFailed: if blink(1) is disconnected
         """
-        red, green, blue = self.color_to_rgb(color)
-
-        return self.fade_to_rgb(fade_milliseconds, red, green, blue, ledn)
+        r, g, b = self.cc.correct_color(color)
+        return self.fade_to_rgb_uncorrected(fade_milliseconds, r, g, b, ledn)
 
     def off(self):
         """ Switch the blink(1) off instantly
+        :return: True if sent, False if skipped because it already is off
         :raises: Blink1ConnectionFailed: if blink(1) is disconnected
         """
-        self.fade_to_color(0, 'black')
+        return self.fade_to_color(0, 'black')
+
+    def read_response(self, is_ready, timeout=RESPONSE_TIMEOUT):
+        """ Poll for the response to the last command, backing off from
+        RESPONSE_POLL_MIN to RESPONSE_POLL_MAX seconds between reads
+        :param is_ready: function returning True for a report that is the answer
+        :param timeout: max seconds to wait
+        :return: the response report
+        :raises: Blink1ConnectionFailed: if no answer came in time
+        """
+        deadline = time.monotonic() + timeout
+        delay = RESPONSE_POLL_MIN
+        while True:
+            buf = self.read()
+            if is_ready(buf):
+                return buf
+            if time.monotonic() + delay > deadline:
+                raise Blink1ConnectionFailed("no response from blink(1)")
+            time.sleep(delay)
+            delay = min(delay * 2, RESPONSE_POLL_MAX)
+
+    @staticmethod
+    def _is_version(buf):
+        return (buf[1] == protocol.CMD_GET_VERSION and
+                0x30 <= buf[3] <= 0x39 and 0x30 <= buf[4] <= 0x39)
 
     def get_version(self):
-        """ Get blink(1) firmware version
+        """ Get blink(1) firmware version, asked once and then remembered
         :raises: Blink1ConnectionFailed: if blink(1) is disconnected
         """
-        buf = [REPORT_ID, ord('v'), 0, 0, 0, 0, 0, 0, 0]
-        self.write(buf)
-        time.sleep(.05)
-        version_raw = self.read()
-        version = (version_raw[3] - ord('0')) * 100 + (version_raw[4] - ord('0'))
-        return str(version)
+        with self.lock:
+            if self._version is None:
+                self.write(protocol.encode_get_version(self._report))
+                self._version = protocol.decode_version(
+                    self.read_response(self._is_version))
+            return self._version
 
     def get_serial_number(self):
-        """ Get blink(1) serial number
+        """ Get blink(1) serial number, asked once and then remembered
         :return blink(1) serial number as string
         :raises: Blink1ConnectionFailed: if blink(1) is disconnected
         """
-        return self.dev.get_serial_number_string()
+        if self._serial_number is None:
+            self._serial_number = self.dev.get_serial_number_string()
+        return self._serial_number
 
     def play(self, start_pos=0, end_pos=0, count=0):
         """ Play internal color pattern
@@ -250,18 +648,11 @@ class Blink1(object):
         if self.dev is None:
             raise Blink1ConnectionFailed("must open first")
 
-        buf = [
-            REPORT_ID,
-            ord('p'),
-            1,
-            int(start_pos),
-            int(end_pos),
-            int(count),
-            0,
-            0,
-            0
-        ]
-        self.write(buf)
+        with self.lock:
+            if self.shadow is not None:
+                self.shadow.set_playing(True)
+            self.write(protocol.encode_play(
+                self._report, True, start_pos, end_pos, count))
 
     def stop(self):
         """ Stop internal color pattern playing
@@ -270,23 +661,38 @@ class Blink1(object):
         if self.dev is None:
             return False
 
-        buf = [REPORT_ID, ord('p'), 0, 0, 0, 0, 0, 0, 0]
-        self.write(buf)
+        with self.lock:
+            if self.shadow is not None:
+                self.shadow.set_playing(False)
+            self.write(protocol.encode_play(self._report, False))
 
     def save_pattern(self):
         """ Save internal RAM pattern to flash
         :raises: Blink1ConnectionFailed: if blink(1) is disconnected
         """
-        buf = [REPORT_ID, ord('W'), 0xBE, 0xEF, 0xCA, 0xFE, 0, 0, 0]
-        self.write(buf)
+        with self.lock:
+            self.write(protocol.encode_save_pattern(self._report))
 
     def set_ledn(self, ledn=0):
         """ Set the 'current LED' value for writePatternLine
         :param ledn: LED to adjust, 0=all, 1=LEDA, 2=LEDB
+        :return: True if sent, False if skipped because ledn is already current
         :raises: Blink1ConnectionFailed: if blink(1) is disconnected
         """
-        buf = [REPORT_ID, ord('l'), ledn, 0, 0, 0, 0, 0, 0]
-        self.write(buf)
+        shadow = self.shadow
+        with self.lock:
+            if shadow is not None and shadow.ledn == ledn:
+                shadow.skipped += 1
+                return False
+            try:
+                self.write(protocol.encode_set_ledn(self._report, ledn))
+            except Exception:
+                if shadow is not None:
+                    shadow.invalidate()
+                raise
+            if shadow is not None:
+                shadow.ledn = ledn
+            return True
 
     def write_pattern_line(self, step_milliseconds, color, pos, ledn=0):
         """ Write a color & step time color pattern line to RAM
@@ -294,16 +700,28 @@ class Blink1(object):
         :param color: LED color
         :param pos: color pattern line number (0-15)
         :param ledn: LED number to adjust, 0=all, 1=LEDA, 2=LEDB
+        :return: True if written, False if skipped because the line is unchanged
         :raises: Blink1ConnectionFailed: if blink(1) is disconnected
         """
-        self.set_ledn(ledn)
-        red, green, blue = self.color_to_rgb(color)
-        r, g, b = self.cc(red, green, blue)
-        step_time = int(step_milliseconds / 10)
-        th = (step_time & 0xff00) >> 8
-        tl = step_time & 0x00ff
-        buf = [REPORT_ID, ord('P'), int(r), int(g), int(b), th, tl, pos, 0]
-        self.write(buf)
+        r, g, b = self.cc.correct_color(color)
+        ram = self.pattern_ram
+        with self.lock:
+            if ram is None:
+                self.set_ledn(ledn)
+                self.write(protocol.encode_write_pattern_line(
+                    self._report, step_milliseconds, r, g, b, pos))
+                return True
+
+            line = pattern_line(r, g, b, step_milliseconds, ledn)
+            if ram.is_current(pos, line):
+                ram.skipped += 1
+                return False
+            ram.set(pos, None)  # unknown until the write went through
+            self.set_ledn(ledn)
+            self.write(protocol.encode_write_pattern_line(
+                self._report, step_milliseconds, r, g, b, pos))
+            ram.set(pos, line)
+            return True
 
     def read_pattern_line(self, pos):
         """ Read a color pattern line at position
@@ -311,75 +729,101 @@ class Blink1(object):
         :return pattern line data as tuple (r,g,b, step_millis) or False on err
         :raises: Blink1ConnectionFailed: if blink(1) is disconnected
         """
-        buf = [REPORT_ID, ord('R'), 0, 0, 0, 0, 0, int(pos), 0]
-        self.write(buf)
-        buf = self.read()
-
-        r, g, b = buf[2:5]
-
-        step_millis = ((buf[5] << 8) | buf[6]) * 10
-        return r, g, b, step_millis
-
-    def read_pattern(self):
-        """ Read the entire color pattern
+        with self.lock:
+            self.write(protocol.encode_read_pattern_line(self._report, pos))
+            return protocol.decode_pattern_line(self.read())
+
+    def read_pattern(self, start_pos=0, end_pos=PATTERN_SIZE):
+        """ Read the color pattern, or just some lines of it
+        :param start_pos: first pattern line to read
+        :param end_pos: pattern line to stop before, default the pattern size
         :return List of pattern line tuples
         :raises: Blink1ConnectionFailed: if blink(1) is disconnected
         """
-        pattern = []
-        for i in range(0, 32):  # FIXME: adjustable for diff blink(1) models
-            pattern.append(self.read_pattern_line(i))
-        return pattern
+        return [self.read_pattern_line(i) for i in range(start_pos, end_pos)]
+
+    def sync_from_device(self):
+        """ Rebuild the pattern RAM model by reading every line back,
+        e.g. when another program may have changed the pattern
+        :return: List of pattern line tuples (r,g,b, step_millis, ledn)
+        :raises: Blink1ConnectionFailed: if blink(1) is disconnected
+        """
+        ram = self.pattern_ram or PatternRAM()
+        ram.invalidate()
+        lines = []
+        with self.lock:
+            for pos in range(ram.size):
+                self.write(protocol.encode_read_pattern_line(self._report, pos))
+                line = protocol.decode_pattern_line_n(self.read())
+                ram.set(pos, line)
+                lines.append(line)
+        return lines
 
     def clear_pattern(self):
         """ Clear entire color pattern in blink(1)
         :raises: Blink1ConnectionFailed: if blink(1) is disconnected
         """
-        for i in range(0, 32):  # FIXME: pattern length
+        for i in range(0, PATTERN_SIZE):
             self.write_pattern_line(0, 'black', i)
 
     def play_pattern(self, pattern_str, onDevice=True):
         """ Play a Blink1Control-style pattern string
-        :param pattern_str: The Blink1Control-style pattern string to play
+        :param pattern_str: The Blink1Control-style pattern string to play,
+                            or a Pattern from blink1.pattern.compile_pattern()
         :param onDevice: True (default) to run pattern on blink(1),
                          otherwise plays in Python process
+        :raises: InvalidPattern: if the pattern string is bad
         :raises: Blink1ConnectionFailed: if blink(1) is disconnected
         """
         if not onDevice:
             return self.play_pattern_local(pattern_str)
 
         # else, play it in the blink(1)
-        num_repeats, colorlist = self.parse_pattern(pattern_str)
-
-        empty_color = {
-            'rgb': '#000000',
-            'time': 0.0,
-            'ledn': 0,
-            'millis': 0
-        }
-
-        colorlist += [empty_color] * (32 - len(colorlist))
+        from .pattern import as_pattern
+        pattern = as_pattern(pattern_str)
 
-        for i, c in enumerate(colorlist):
-            self.write_pattern_line(c['millis'], c['rgb'], i, c['ledn'])
+        # the pattern RAM holds PATTERN_SIZE lines, later ones are dropped
+        lines = pattern.lines[:PATTERN_SIZE]
+        for i, line in enumerate(lines):
+            self.write_pattern_line(line.millis, line.rgb, i, line.ledn)
+        for i in range(len(lines), PATTERN_SIZE):
+            self.write_pattern_line(0, (0, 0, 0), i, 0)
 
-        return self.play(count=num_repeats)
+        return self.play(count=pattern.repeats)
 
-    def play_pattern_local(self, pattern_str):
+    def play_pattern_local(self, pattern_str, background=False):
         """ Play a Blink1Control pattern string in Python process
-            (plays in blink1-python, so blocks)
-        :param pattern_str: The Blink1Control-style pattern string to play
+            (plays in blink1-python, so blocks unless background is set)
+            Steps run at absolute deadlines, so the pattern does not drift.
+        :param pattern_str: The Blink1Control-style pattern string to play,
+                            or a Pattern from blink1.pattern.compile_pattern()
+        :param background: play on the shared timer thread of
+                           blink1.player.default_player() and return at once
+        :return: a blink1.player.Playback if background, else None
+        :raises: InvalidPattern: if the pattern string is bad
         :raises: Blink1ConnectionFailed: if blink(1) is disconnected
         """
-        num_repeats, colorlist = self.parse_pattern(pattern_str)
+        from .pattern import as_pattern
+        pattern = as_pattern(pattern_str)
+        if background:
+            from .player import default_player
+            self._playback = default_player().start(self, pattern)
+            return self._playback
+
+        num_repeats = pattern.repeats
         if num_repeats == 0:
             num_repeats = -1
 
+        deadline = time.monotonic()
         while num_repeats:
             num_repeats -= 1
 
-            for c in colorlist:
-                self.fade_to_color(c['millis'], c['rgb'], c['ledn'])
-                time.sleep(c['time'])
+            for line in pattern.lines:
+                self.fade_to_color(line.millis, line.rgb, line.ledn)
+                deadline += line.time
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
 
     @staticmethod
     def parse_pattern(pattern_str):
@@ -433,13 +877,11 @@ class Blink1(object):
         if self.dev is None:
             return ''
 
-        en = int(enable is True)
-        timeout_time = int(timeout_millis / 10)
-        th = (timeout_time & 0xff00) >> 8
-        tl = timeout_time & 0x00ff
-        st = int(stay_lit is True)
-        buf = [REPORT_ID, ord('D'), en, th, tl, st, start_pos, end_pos, 0]
-        self.write(buf)
+        with self.lock:
+            if self.shadow is not None:
+                self.shadow.set_tickle(enable is True)
+            self.write(protocol.encode_server_tickle(
+                self._report, enable, timeout_millis, stay_lit, start_pos, end_pos))
 
 
 @contextmanager
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+cli.py -- fast start for the blink1-shine and blink1-flash commands
+
+Importing click costs more than everything else these commands do, and
+they are run often (e.g. from shell prompt hooks). So the entry points
+first try parse_options(), which handles plain `--name value` and
+`--name=value` options, and only build the click command, for --help,
+errors and anything else, when it cannot.
+"""
+
+
+def parse_options(argv, defaults):
+    """ Parse simple long options without click
+    :param argv: command line arguments, without the program name
+    :param defaults: dict of option name to default value; values are
+        converted to the type of the default
+    :return: dict of option values, or None if argv needs the full parser
+    """
+    options = dict(defaults)
+    args = iter(argv)
+    for arg in args:
+        if not arg.startswith('--'):
+            return None
+        name, sep, value = arg[2:].partition('=')
+        if name not in defaults:
+            return None
+        if not sep:
+            value = next(args, None)
+            if value is None:
+                return None
+        try:
+            options[name] = type(defaults[name])(value)
+        except ValueError:
+            return None
+    return options
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+client.py -- talk to a running blink1d daemon
+
+blink1d (see blink1.daemon) keeps blink(1)s open and serializes access to
+each. Blink1Client sends it commands over a Unix domain socket, one JSON
+line per command; several commands can be pipelined in one write:
+
+    from blink1.client import Blink1Client
+
+    with Blink1Client() as client:
+        client.fade_to_color(100, 'red')
+        client.pipeline([('fade_to_color', (100, 'blue'), None),
+                         ('get_version', (), '20002345')])
+
+This module only uses the standard library, so it is quick to import.
+"""
+import json
+import os
+import socket
+import tempfile
+
+# Blink1 methods the daemon runs
+COMMANDS = frozenset([
+    'fade_to_rgb', 'fade_to_color', 'off', 'get_version', 'get_serial_number',
+    'play', 'stop', 'save_pattern', 'set_ledn', 'write_pattern_line',
+    'read_pattern_line', 'read_pattern', 'clear_pattern', 'play_pattern',
+    'server_tickle',
+])
+# commands of the daemon itself
+DAEMON_COMMANDS = frozenset(['list', 'ping'])
+
+DEFAULT_TIMEOUT = 5.0
+
+
+def default_socket_path():
+    """ Socket path: $BLINK1D_SOCKET, else blink1d.sock in
+    $XDG_RUNTIME_DIR, else a per-user name in the temp directory
+    """
+    path = os.environ.get('BLINK1D_SOCKET')
+    if path:
+        return path
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'blink1d.sock')
+    return os.path.join(tempfile.gettempdir(), 'blink1d-%d.sock' % os.getuid())
+
+
+class Blink1DaemonError(RuntimeError):
+    """Raised when blink1d could not run a command
+    """
+    def __init__(self, kind, message):
+        """
+        :param kind: name of the exception raised in the daemon,
+            e.g. 'Blink1ConnectionFailed'
+        :param message: its message
+        """
+        RuntimeError.__init__(self, "%s: %s" % (kind, message))
+        self.kind = kind
+
+
+class Blink1Client(object):
+    """Connection to blink1d. Command methods have the same arguments as
+    the Blink1 methods, so a client can stand in for a Blink1.
+    """
+    def __init__(self, socket_path=None, serial_number=None, timeout=DEFAULT_TIMEOUT):
+        """
+        :param socket_path: daemon socket, default default_socket_path()
+        :param serial_number: device for commands, default the first found
+        :param timeout: max seconds to wait for the daemon
+        :raises: OSError: if the daemon is not running
+        """
+        self.socket_path = socket_path or default_socket_path()
+        self.serial_number = serial_number
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        try:
+            self._sock.connect(self.socket_path)
+        except OSError:
+            self._sock.close()
+            raise
+        self._file = self._sock.makefile('rb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+    def pipeline(self, commands):
+        """ Send several commands in one write, then read all the answers
+        :param commands: list of (command, args, serial_number) tuples,
+            serial_number None for the client's default device
+        :return: list of results, or of Blink1DaemonError for failed commands
+        """
+        lines = []
+        for command, args, serial in commands:
+            lines.append(json.dumps({'cmd': command, 'args': list(args),
+                                     'serial': serial or self.serial_number}))
+        self._sock.sendall(('\n'.join(lines) + '\n').encode('utf-8'))
+        results = []
+        for i in range(len(commands)):
+            line = self._file.readline()
+            if not line:
+                raise OSError("blink1d closed the connection")
+            reply = json.loads(line.decode('utf-8'))
+            if reply.get('ok'):
+                results.append(reply.get('result'))
+            else:
+                results.append(Blink1DaemonError(reply.get('kind', 'Error'),
+                                                 reply.get('error', '')))
+        return results
+
+    def call(self, command, *args):
+        """ Run one command on the client's device
+        :return: its result
+        :raises: Blink1DaemonError: if it failed
+        """
+        result, = self.pipeline([(command, args, None)])
+        if isinstance(result, Blink1DaemonError):
+            raise result
+        return result
+
+    def list(self):
+        """ Serial numbers of the blink(1)s connected to the daemon's host
+        """
+        return self.call('list')
+
+    def __getattr__(self, name):
+        if name in COMMANDS:
+            return lambda *args: self.call(name, *args)
+        raise AttributeError(name)
+
+
+def connect(socket_path=None, serial_number=None):
+    """ Connect to blink1d if it is running
+    :return: Blink1Client, or None if the daemon is not running
+    """
+    try:
+        return Blink1Client(socket_path, serial_number)
+    except OSError:
+        return None
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+coalesce.py -- coalescing, rate-adaptive report writer for a Blink1
+
+When colors are commanded faster than the blink(1) accepts feature reports,
+a plain Blink1 blocks and falls behind on stale colors. A CoalescingWriter
+queues reports and sends them from a background thread instead:
+
+ * a fade to an LED replaces an older unsent fade to the same LED
+   (and a fade to all LEDs replaces unsent fades to single LEDs),
+ * other commands are sent in order and never merged or dropped,
+ * when more than max_pending reports are queued, the oldest fade that
+   a later queued fade overwrites is dropped, or else submit() sends the
+   oldest queued reports itself,
+ * the send rate adapts to the measured write latency: it grows by
+   `increase` reports/s while writes are fast and halves when they are
+   slower than `target_latency` (AIMD).
+
+Enable it with Blink1.enable_coalescing(); read() flushes the queue first,
+so commands with responses still see their own answer. Each report is sent
+holding Blink1.lock, and flush() sends what is queued in the calling thread
+instead of waiting for the writer, so neither waits on the other while
+holding the lock.
+"""
+import threading
+import time
+
+from .protocol import CMD_FADE_TO_RGB
+
+DEFAULT_MAX_RATE = 250.0  # reports per second
+DEFAULT_MIN_RATE = 10.0
+DEFAULT_TARGET_LATENCY = 0.008  # seconds per send_feature_report
+DEFAULT_MAX_PENDING = 16
+
+
+class CoalescingWriter(object):
+    """Background writer that merges superseded fades and paces reports.
+    """
+    def __init__(self, send, max_rate=DEFAULT_MAX_RATE, min_rate=DEFAULT_MIN_RATE,
+                 target_latency=DEFAULT_TARGET_LATENCY, increase=None,
+                 max_pending=DEFAULT_MAX_PENDING, lock=None):
+        """
+        :param send: function sending one report, e.g. Blink1._write
+        :param max_rate: upper bound on reports per second
+        :param min_rate: lower bound on reports per second
+        :param target_latency: write latency in seconds above which the
+            rate is halved
+        :param increase: reports/s added after each fast write, default 5% of max_rate
+        :param max_pending: queue length above which the oldest unsent fade
+            that a later queued fade overwrites is dropped; when no fade can
+            go without losing an LED's newest color, submit() sends the
+            oldest reports itself instead. With at most max_pending reports
+            queued, the newest state reaches the device within
+            max_pending / min_rate seconds plus the write time.
+        :param lock: reentrant lock held around every send, e.g. Blink1.lock;
+            submit() and flush() may be called holding it
+        """
+        self._send = send
+        self._lock = lock if lock is not None else threading.RLock()
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.target_latency = target_latency
+        self.increase = increase if increase is not None else max_rate * 0.05
+        self.max_pending = max_pending
+        self.rate = max_rate
+
+        self._pending = []  # [key, report] in send order; key None = barrier
+        self._latest = {}  # ledn -> entry of newest unsent fade since last barrier
+        self._cond = threading.Condition()  # taken after self._lock, never before
+        self._closed = False
+        self.error = None
+        self.submitted = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.last_latency = 0.0
+
+        self._thread = threading.Thread(target=self._run, name='blink1-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, buf):
+        """ Queue a report for sending, merging it with unsent fades.
+        While the queue is full and nothing in it can be dropped, sends the
+        oldest reports in this thread.
+        :param buf: 9-byte report, copied
+        :raises: Exception: the error of a previous failed write
+        """
+        report = bytes(buf)
+        with self._cond:
+            self._raise_error()
+            self.submitted += 1
+            if report[1] == CMD_FADE_TO_RGB:
+                ledn = report[7]
+                if ledn == 0:
+                    # an all-LED fade supersedes every unsent fade
+                    for entry in self._latest.values():
+                        entry[1] = None
+                        self.coalesced += 1
+                    self._latest.clear()
+                elif ledn in self._latest:
+                    self._latest[ledn][1] = report
+                    self.coalesced += 1
+                    return
+                entry = [ledn, report]
+                self._latest[ledn] = entry
+            else:
+                entry = [None, report]
+                self._latest.clear()
+            self._pending.append(entry)
+            full = not self._trim()
+            self._cond.notify_all()
+        if full:
+            # every queued report is the newest of its kind, dropping one
+            # would lose state: send the oldest here rather than wait for
+            # the writer, which may need the lock the caller holds
+            with self._lock:
+                while self._queued() > self.max_pending:
+                    self._send_next()
+            with self._cond:
+                self._raise_error()
+
+    def _trim(self):
+        # drop superseded fades while over max_pending; False if still over
+        while True:
+            self._pending = [e for e in self._pending if e[1] is not None]
+            if len(self._pending) <= self.max_pending:
+                return True
+            i = self._superseded()
+            if i is None:
+                return False
+            entry = self._pending.pop(i)
+            if self._latest.get(entry[0]) is entry:
+                del self._latest[entry[0]]
+            self.dropped += 1
+
+    def _queued(self):
+        with self._cond:
+            return sum(1 for e in self._pending if e[1] is not None)
+
+    def _superseded(self):
+        # index of the oldest queued fade that a later queued fade to the
+        # same LED, or to all LEDs, overwrites; None if there is none
+        later = set()
+        found = None
+        for i in range(len(self._pending) - 1, -1, -1):
+            ledn = self._pending[i][0]
+            if ledn is None:
+                continue
+            if ledn in later or 0 in later:
+                found = i
+            later.add(ledn)
+        return found
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _send_next(self):
+        # send the oldest queued report, holding self._lock but not
+        # self._cond, so submit() can coalesce meanwhile. Returns the time
+        # the send started, or None if nothing was queued.
+        with self._cond:
+            report = None
+            while report is None and self._pending:
+                entry = self._pending.pop(0)
+                if self._latest.get(entry[0]) is entry:
+                    del self._latest[entry[0]]
+                report = entry[1]
+            if report is None:
+                return None
+
+        start = time.monotonic()
+        error = None
+        try:
+            self._send(report)
+        except Exception as e:
+            error = e
+        latency = time.monotonic() - start
+
+        with self._cond:
+            if error is not None:
+                # report it to the caller, the queued state is now moot
+                self.error = error
+                self._pending = []
+                self._latest.clear()
+            else:
+                self.sent += 1
+            self.last_latency = latency
+            if latency > self.target_latency:
+                self.rate = max(self.min_rate, self.rate / 2)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+            self._cond.notify_all()
+        return start
+
+    def _run(self):
+        next_send = time.monotonic()
+        while True:
+            with self._cond:
+                while not self._closed and not any(e[1] for e in self._pending):
+                    self._cond.wait()
+                if self._closed and not any(e[1] for e in self._pending):
+                    return
+                delay = next_send - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)  # more reports may coalesce meanwhile
+                    continue
+            with self._lock:
+                start = self._send_next()  # None if flush() sent it first
+            if start is not None:
+                next_send = start + 1.0 / self.rate
+
+    def flush(self, timeout=None):
+        """ Send every queued report now, in this thread
+        :param timeout: max seconds to wait for a send in progress,
+            None waits forever
+        :return: True if the queue drained in time
+        :raises: Exception: the error of a failed write
+        """
+        if not self._lock.acquire(timeout=-1 if timeout is None else timeout):
+            return False
+        try:
+            while self._send_next() is not None:
+                pass
+        finally:
+            self._lock.release()
+        with self._cond:
+            self._raise_error()
+        return True
+
+    def close(self):
+        """ Send whatever is queued, then stop the writer thread. Not to be
+        called holding the lock given to the constructor.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        with self._cond:
+            self._raise_error()
+
+    def stats(self):
+        """ Counters of the writer
+        :return: dict with submitted, sent, coalesced, dropped, pending,
+            current rate (reports/s) and last write latency (s)
+        """
+        with self._cond:
+            return {
+                'submitted': self.submitted,
+                'sent': self.sent,
+                'coalesced': self.coalesced,
+                'dropped': self.dropped,
+                'pending': sum(1 for e in self._pending if e[1] is not None),
+                'rate': self.rate,
+                'last_latency': self.last_latency,
+            }
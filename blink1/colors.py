@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+colors.py -- color name and hex code parsing for blink(1)
+"""
+from functools import lru_cache
+
+
+class InvalidColor(ValueError):
+    """Raised when the user requests an implausible colour
+    """
+
+
+COLOR_CACHE_SIZE = 1024  # max color specs remembered by color_to_rgb & co
+
+_HEX_DIGITS = frozenset('0123456789abcdefABCDEF')
+
+
+@lru_cache(maxsize=COLOR_CACHE_SIZE)
+def _parse_color_str(color):
+    if color.startswith('#'):
+        digits = color[1:]
+        if len(digits) == 3:
+            digits = ''.join(c * 2 for c in digits)
+        if len(digits) != 6 or not _HEX_DIGITS.issuperset(digits):
+            raise InvalidColor(color)
+        value = int(digits, 16)
+        return value >> 16, (value >> 8) & 0xff, value & 0xff
+
+    import webcolors  # only needed for names, and slow to import
+    try:
+        return tuple(webcolors.name_to_rgb(color))
+    except ValueError:
+        raise InvalidColor(color)
+
+
+def color_to_rgb(color):
+    """ Convert color name, hexcode or (r,g,b) tuple to a validated (r,g,b) tuple
+    :param color: a color string, e.g. "#FF00FF", "#F0F" or "red",
+        or an (r,g,b) tuple with each value 0 <= lum <= 255
+    :raises: InvalidColor: if color is bad
+    """
+    if isinstance(color, str):
+        return _parse_color_str(color)
+    try:
+        if len(color) == 3 and all(0 <= c <= 255 for c in color):
+            return tuple(color)
+    except TypeError:
+        pass
+    raise InvalidColor(color)
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+daemon.py -- blink1d, keeps blink(1)s open and serves commands over a socket
+
+Opening a blink(1) costs far more than commanding it, and separate
+processes commanding one device at once can interleave their reports.
+blink1d opens each device once, runs commands from any number of clients
+one at a time per device, and reopens a device that was unplugged.
+
+Each request is one line of JSON, {"cmd": ..., "args": [...], "serial": ...}
+with a null serial for the first device found, answered by one line,
+{"ok": true, "result": ...} or {"ok": false, "kind": ..., "error": ...}.
+Clients may send many requests before reading the answers, which come back
+in order. See blink1.client for the client side.
+
+run with:
+blink1d [--socket PATH]
+"""
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+
+from .blink1 import Blink1, Blink1ConnectionFailed
+from .client import COMMANDS, default_socket_path
+
+log = logging.getLogger(__name__)
+
+
+def _tuples(value):
+    # JSON has no tuples, and colors must be (r,g,b) tuples
+    if isinstance(value, list):
+        return tuple(_tuples(v) for v in value)
+    return value
+
+
+class Blink1Daemon(object):
+    """Serves blink(1) commands on a Unix domain socket
+    """
+    def __init__(self, socket_path=None, gamma=None, white_point=None):
+        """
+        :param socket_path: socket to listen on, default
+            blink1.client.default_socket_path()
+        :param gamma: Triple of gammas for each channel e.g. (2, 2, 2)
+        :param white_point: white point as (r,g,b), Kelvin or name
+        """
+        self.socket_path = socket_path or default_socket_path()
+        self.gamma = gamma
+        self.white_point = white_point
+        self._devices = {}  # serial number -> Blink1
+        self._locks = {}  # serial number -> Lock
+        self._default_serial = None  # first device, to skip enumerating
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _device_lock(self, serial):
+        with self._lock:
+            return self._locks.setdefault(serial, threading.Lock())
+
+    def _open(self, serial):
+        b1 = self._devices.get(serial)
+        if b1 is None:
+            # no shadow state: other processes may change the device
+            # between requests, so a repeated command is not redundant
+            b1 = Blink1(serial, gamma=self.gamma, white_point=self.white_point,
+                        shadow=False)
+            self._devices[serial] = b1
+        return b1
+
+    def _drop(self, serial):
+        if serial == self._default_serial:
+            self._default_serial = None  # unplugged? look again next time
+        b1 = self._devices.pop(serial, None)
+        if b1 is not None:
+            try:
+                b1.close()
+            except Exception:
+                pass
+
+    def execute(self, command, args=(), serial=None):
+        """ Run a command on a device, opening it if needed. If the
+        device fails, it is reopened and the command tried once more.
+        :return: the command's result
+        :raises: ValueError: for an unknown command
+        """
+        if command == 'ping':
+            return 'pong'
+        if command == 'list':
+            return Blink1.list()
+        if command not in COMMANDS:
+            raise ValueError("unknown command %r" % command)
+        if serial is None:
+            serial = self._default_serial
+            if serial is None:
+                serials = Blink1.list()
+                serial = self._default_serial = serials[0] if serials else None
+
+        with self._device_lock(serial):
+            for attempt in (0, 1):
+                try:
+                    b1 = self._open(serial)
+                    return getattr(b1, command)(*args)
+                except (Blink1ConnectionFailed, IOError, OSError):
+                    self._drop(serial)
+                    if attempt:
+                        raise
+
+    def handle_line(self, line):
+        """ Answer one request line
+        :return: reply line
+        """
+        try:
+            request = json.loads(line)
+            result = self.execute(request['cmd'], _tuples(request.get('args', [])),
+                                  request.get('serial'))
+            reply = {'ok': True, 'result': result}
+        except Exception as e:
+            reply = {'ok': False, 'kind': type(e).__name__, 'error': str(e)}
+        return json.dumps(reply) + '\n'
+
+    def serve_forever(self):
+        """ Listen on the socket and serve clients until shutdown()
+        :raises: OSError: if another blink1d is already listening
+        """
+        self._remove_stale_socket()
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    self.wfile.write(daemon.handle_line(line.decode('utf-8')).encode('utf-8'))
+
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        old_umask = os.umask(0o077)  # socket only usable by this user
+        try:
+            self._server = Server(self.socket_path, Handler)
+        finally:
+            os.umask(old_umask)
+        log.info("blink1d listening on %s", self.socket_path)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+            for serial in list(self._devices):
+                self._drop(serial)
+
+    def shutdown(self):
+        """ Stop serve_forever() (from another thread)
+        """
+        if self._server is not None:
+            self._server.shutdown()
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.unlink(self.socket_path)  # left over from a dead daemon
+        else:
+            raise OSError("blink1d already running on %s" % self.socket_path)
+        finally:
+            probe.close()
+
+
+def main():
+    """ blink1d entry point
+    """
+    import click
+
+    @click.command()
+    @click.option('--socket', 'socket_path', default=None,
+                  help='Unix socket to listen on')
+    def blink1d(socket_path):
+        logging.basicConfig(level=logging.INFO)
+        try:
+            Blink1Daemon(socket_path).serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+    blink1d()
+
+
+if __name__ == '__main__':
+    main()
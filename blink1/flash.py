@@ -1,20 +1,29 @@
 # -*- coding: utf-8 -*-
+import sys
 import time
 
-import click
-# import webcolors
-from blink1.blink1 import Blink1
+from blink1.cli import parse_options
 
+DEFAULTS = {'on': 'white', 'off': 'black', 'duration': 1, 'repeat': 2, 'fade': 0.2}
 
-@click.command()
-@click.option('--on', default='white', help='Color to flash on')
-@click.option('--off', default='black', help='Color to flash off')
-@click.option('--duration', default=1, help='Length of each flash cycle in seconds')
-@click.option('--repeat', default=2, help='Number of times to flash')
-@click.option('--fade', default=0.2, help='Fade time in seconds')
-def flash(on, off, duration, repeat, fade):
+
+def run(on, off, duration, repeat, fade):
+    from blink1.client import connect
+    client = connect()  # blink1d, if running, has the device open already
+    if client is not None:
+        with client:
+            _flash(client, on, off, duration, repeat, fade)
+        return
+
+    from blink1.blink1 import Blink1
     blink1 = Blink1()
+    try:
+        _flash(blink1, on, off, duration, repeat, fade)
+    finally:
+        blink1.close()
+
 
+def _flash(blink1, on, off, duration, repeat, fade):
     for i in range(0, repeat):
         blink1.fade_to_color(fade * 1000, on)
         time.sleep(duration/2.0)
@@ -24,5 +33,39 @@ def flash(on, off, duration, repeat, fade):
     blink1.fade_to_rgb(fade * 1000, 0, 0, 0)
 
 
+def make_command():
+    """ The click command, built on demand since importing click is slow
+    """
+    import click
+
+    @click.command()
+    @click.option('--on', default=DEFAULTS['on'], help='Color to flash on')
+    @click.option('--off', default=DEFAULTS['off'], help='Color to flash off')
+    @click.option('--duration', default=DEFAULTS['duration'],
+                  help='Length of each flash cycle in seconds')
+    @click.option('--repeat', default=DEFAULTS['repeat'], help='Number of times to flash')
+    @click.option('--fade', default=DEFAULTS['fade'], help='Fade time in seconds')
+    def flash(on, off, duration, repeat, fade):
+        run(on, off, duration, repeat, fade)
+
+    return flash
+
+
+def main(argv=None):
+    """ blink1-flash entry point, skips click for simple command lines
+    """
+    options = parse_options(sys.argv[1:] if argv is None else argv, DEFAULTS)
+    if options is None:
+        return make_command()(args=argv)
+    run(**options)
+
+
+def __getattr__(name):
+    # blink1.flash.flash is still the click command
+    if name == 'flash':
+        return make_command()
+    raise AttributeError(name)
+
+
 if __name__ == '__main__':
-    flash()
+    main()
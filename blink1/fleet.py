@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+fleet.py -- control many blink(1) devices at once
+
+Blink1Fleet opens a set of blink(1)s, keeps them open and runs each command
+on all of them (or a tagged subset) in parallel on a thread pool:
+
+    from blink1.fleet import Blink1Fleet
+
+    with Blink1Fleet() as fleet:  # every blink(1) plugged in
+        fleet.tag('door', '20002345', '20002346')
+        fleet.fade_to_color(100, 'green')
+        result = fleet.fade_to_color(100, 'red', target='door')
+        for serial, err in result.errors.items():
+            print(serial, "failed:", err)
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .blink1 import Blink1
+from .patternram import PATTERN_SIZE
+
+DEFAULT_MAX_WORKERS = 16
+
+
+class FleetResult(object):
+    """Outcome of a fleet command: per-serial return values and exceptions
+    """
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+
+    @property
+    def ok(self):
+        """ True if the command succeeded on every device
+        """
+        return not self.errors
+
+    def __repr__(self):
+        return "FleetResult(results=%r, errors=%r)" % (self.results, self.errors)
+
+
+class Blink1Fleet(object):
+    """A group of open blink(1) devices addressed by serial number and tag.
+    """
+    def __init__(self, serial_numbers=None, gamma=None, white_point=None,
+                 max_workers=None):
+        """
+        :param serial_numbers: serial numbers to open, default all connected
+        :param gamma: Triple of gammas for each channel e.g. (2, 2, 2)
+        :param white_point: white point as (r,g,b), Kelvin or name
+        :param max_workers: max devices talked to at once
+        """
+        if serial_numbers is None:
+            serial_numbers = Blink1.list()
+        serial_numbers = list(serial_numbers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or min(DEFAULT_MAX_WORKERS, len(serial_numbers) or 1),
+            thread_name_prefix='blink1fleet')
+        self.devices = {}
+        self._locks = {}
+        self._tags = {}
+
+        # open devices in parallel too; failures are kept, not raised
+        opened = self._run(
+            serial_numbers,
+            lambda serial: Blink1(serial, gamma=gamma, white_point=white_point))
+        self.open_errors = opened.errors
+        for serial in serial_numbers:
+            if serial in opened.results:
+                self.devices[serial] = opened.results[serial]
+                self._locks[serial] = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.devices)
+
+    def __iter__(self):
+        return iter(self.devices)
+
+    def __getitem__(self, serial):
+        return self.devices[serial]
+
+    def close(self):
+        """ Close every device and stop the thread pool
+        """
+        self.map(lambda b1: b1.close())
+        self.devices.clear()
+        self._executor.shutdown(wait=True)
+
+    def tag(self, tag, *serials):
+        """ Add a tag to devices, so commands can target them as a group
+        :param tag: tag name
+        :param serials: serial numbers of devices to tag
+        :raises: KeyError: if a serial number is not in the fleet
+        """
+        for serial in serials:
+            if serial not in self.devices:
+                raise KeyError(serial)
+        self._tags.setdefault(tag, set()).update(serials)
+
+    def untag(self, tag, *serials):
+        """ Remove a tag from the given devices, or from all if none given
+        """
+        if not serials:
+            self._tags.pop(tag, None)
+        else:
+            self._tags.get(tag, set()).difference_update(serials)
+
+    def tags(self, serial):
+        """ Tags of a device
+        :return: set of tag names
+        """
+        return set(t for t, serials in self._tags.items() if serial in serials)
+
+    def select(self, target=None):
+        """ Resolve a command target to a list of serial numbers
+        :param target: None for all devices, a tag name, or a list of
+            serial numbers and/or tag names
+        """
+        if target is None:
+            return list(self.devices)
+        if isinstance(target, str):
+            target = [target]
+        selected = set()
+        for t in target:
+            if t in self._tags:
+                selected.update(self._tags[t])
+            elif t in self.devices:
+                selected.add(t)
+            else:
+                raise KeyError(t)
+        return [s for s in self.devices if s in selected]
+
+    def _run(self, serials, func):
+        futures = [(s, self._executor.submit(func, s)) for s in serials]
+        result = FleetResult()
+        for serial, future in futures:
+            try:
+                result.results[serial] = future.result()
+            except Exception as e:
+                result.errors[serial] = e
+        return result
+
+    def map(self, func, target=None):
+        """ Call func(blink1) for every targeted device in parallel
+        :param func: function taking a Blink1
+        :param target: see select()
+        :return: FleetResult
+        """
+        def call(serial):
+            with self._locks[serial]:
+                return func(self.devices[serial])
+        return self._run(self.select(target), call)
+
+    def fade_to_rgb(self, fade_milliseconds, red, green, blue, ledn=0, target=None):
+        """ Fade targeted devices to RGB color, see Blink1.fade_to_rgb()
+        """
+        return self.map(
+            lambda b1: b1.fade_to_rgb(fade_milliseconds, red, green, blue, ledn),
+            target)
+
+    def fade_to_color(self, fade_milliseconds, color, ledn=0, target=None):
+        """ Fade targeted devices to a color, see Blink1.fade_to_color()
+        """
+        return self.map(
+            lambda b1: b1.fade_to_color(fade_milliseconds, color, ledn), target)
+
+    def off(self, target=None):
+        """ Switch targeted devices off instantly
+        """
+        return self.map(lambda b1: b1.off(), target)
+
+    def play_pattern(self, pattern_str, target=None):
+        """ Upload and play a pattern string on targeted devices, see Blink1.play_pattern()
+        """
+        return self.map(lambda b1: b1.play_pattern(pattern_str), target)
+
+    def read_pattern(self, start_pos=0, end_pos=PATTERN_SIZE, target=None):
+        """ Read the color pattern (or some lines of it) of targeted devices
+        :return: FleetResult with a list of pattern lines per device
+        """
+        return self.map(lambda b1: b1.read_pattern(start_pos, end_pos), target)
+
+    def server_tickle(self, enable, timeout_millis=0, stay_lit=False,
+                      start_pos=0, end_pos=16, target=None):
+        """ Enable/disable servertickle on targeted devices, see Blink1.server_tickle()
+        """
+        return self.map(
+            lambda b1: b1.server_tickle(enable, timeout_millis, stay_lit,
+                                        start_pos, end_pos),
+            target)
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+gauge.py -- show a live metric stream on a blink(1) as a color gauge
+
+Gauge maps values (queue depth, p99 latency, ...) through a Colormap to
+colors. Samples arriving faster than the device's update rate are
+averaged, so however fast the stream, at most `rate` fades a second are
+sent, each fading over one update interval so the color moves smoothly.
+Only a running sum is kept, so memory is constant however long the
+stream runs:
+
+    from blink1.gauge import Gauge
+
+    gauge = Gauge(b1, low=0, high=500, colormap=('green', 'yellow', 'red'))
+    gauge.run(latencies())  # any iterable of numbers
+    await gauge.run_async(queue_depths())  # or an async iterable
+"""
+import inspect
+import math
+import time
+
+from .colors import color_to_rgb
+
+LUT_SIZE = 256  # colors precomputed along the colormap
+DEFAULT_RATE = 20  # updates a second, fast enough to look continuous
+DEFAULT_COLORMAP = ('green', 'yellow', 'red')
+
+
+class Colormap(object):
+    """Gradient between color stops, precomputed into a lookup table
+    """
+    def __init__(self, stops, size=LUT_SIZE):
+        """
+        :param stops: colors evenly spaced from 0 to 1, or (position, color)
+            pairs with positions 0 <= position <= 1 in increasing order
+        :param size: number of colors in the lookup table
+        :raises: InvalidColor: if a color is bad
+        :raises: ValueError: if there are fewer than two stops or the
+            positions are bad
+        """
+        stops = list(stops)
+        if len(stops) < 2:
+            raise ValueError("a colormap needs at least two colors")
+        if all(isinstance(stop, tuple) and len(stop) == 2 for stop in stops):
+            positions = [float(pos) for pos, _ in stops]
+            colors = [color_to_rgb(color) for _, color in stops]
+        else:
+            positions = [i / (len(stops) - 1.0) for i in range(len(stops))]
+            colors = [color_to_rgb(color) for color in stops]
+        if positions[0] != 0 or positions[-1] != 1 or positions != sorted(positions):
+            raise ValueError("color stop positions must rise from 0 to 1")
+        self.size = size
+        self.lut = self._build(positions, colors, size)
+
+    @staticmethod
+    def _build(positions, colors, size):
+        lut = bytearray(size * 3)
+        stop = 0
+        for i in range(size):
+            x = i / (size - 1.0)
+            while stop < len(positions) - 2 and x > positions[stop + 1]:
+                stop += 1
+            x0, x1 = positions[stop], positions[stop + 1]
+            t = (x - x0) / (x1 - x0) if x1 > x0 else 1.0
+            c0, c1 = colors[stop], colors[stop + 1]
+            for c in range(3):
+                lut[i * 3 + c] = int(round(c0[c] + (c1[c] - c0[c]) * t))
+        return bytes(lut)
+
+    def rgb(self, fraction):
+        """ Color at a fraction along the gradient, clamped to 0..1, NaN
+        taken as 0
+        :return: (r,g,b) tuple
+        """
+        # clamped before int(), which raises on inf and NaN
+        fraction = 1.0 if fraction > 1 else fraction if fraction > 0 else 0.0
+        i = int(fraction * (self.size - 1) + 0.5)
+        lut = self.lut
+        return lut[i * 3], lut[i * 3 + 1], lut[i * 3 + 2]
+
+
+class Gauge(object):
+    """Streams values to a blink(1) as colors, down-sampled to its update
+    rate. The device is duck-typed: anything with fade_to_rgb(), including
+    an AsyncBlink1 when used with run_async().
+    """
+    def __init__(self, blink1, low, high, colormap=DEFAULT_COLORMAP,
+                 rate=DEFAULT_RATE, ledn=0):
+        """
+        :param blink1: Blink1 to show the gauge on
+        :param low: value shown as the first color of the colormap
+        :param high: value shown as the last color; may be below low
+        :param colormap: Colormap, or its color stops
+        :param rate: max updates a second sent to the device
+        :param ledn: which LED to control (0=all, 1=LED A, 2=LED B)
+        :raises: ValueError: if low == high or rate is not positive
+        """
+        if low == high:
+            raise ValueError("low and high must differ")
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.blink1 = blink1
+        self.low = low
+        self.high = high
+        self.colormap = colormap if isinstance(colormap, Colormap) else Colormap(colormap)
+        self.interval = 1.0 / rate
+        self.fade_millis = int(self.interval * 1000)
+        self.ledn = ledn
+        self.samples = 0
+        self.updates = 0
+        self.rgb = None  # last color sent
+        self._scale = 1.0 / (high - low)
+        self._sum = 0.0
+        self._count = 0
+        self._next_update = 0.0
+
+    def _add(self, value):
+        """ Add a sample, returning the color to send now, if any
+        """
+        if not math.isfinite(value):  # NaN or inf: no usable information
+            return None
+        self.samples += 1
+        self._sum += value
+        self._count += 1
+        now = time.monotonic()
+        if now < self._next_update:
+            return None
+        # keep to the update grid, but do not catch up after an idle spell
+        self._next_update += self.interval
+        if self._next_update <= now:
+            self._next_update = now + self.interval
+        return self._take()
+
+    def _take(self):
+        if not self._count:
+            return None
+        mean = self._sum / self._count
+        self._sum = 0.0
+        self._count = 0
+        rgb = self.colormap.rgb((mean - self.low) * self._scale)
+        if rgb == self.rgb:
+            return None
+        self.rgb = rgb
+        self.updates += 1
+        return rgb
+
+    def update(self, value):
+        """ Add one sample, sending the average color if an update is due
+        :return: True if a fade was sent
+        :raises: Blink1ConnectionFailed: if blink(1) is disconnected
+        """
+        rgb = self._add(value)
+        if rgb is None:
+            return False
+        self.blink1.fade_to_rgb(self.fade_millis, rgb[0], rgb[1], rgb[2], self.ledn)
+        return True
+
+    def flush(self):
+        """ Send the average of samples not yet shown
+        :return: True if a fade was sent
+        """
+        rgb = self._take()
+        if rgb is None:
+            return False
+        self.blink1.fade_to_rgb(self.fade_millis, rgb[0], rgb[1], rgb[2], self.ledn)
+        return True
+
+    def run(self, values):
+        """ Show every value of an iterable, until it ends
+        :return: dict with samples and updates
+        """
+        for value in values:
+            self.update(value)
+        self.flush()
+        return self.stats()
+
+    async def run_async(self, values):
+        """ Show every value of an async iterable, until it ends. With an
+        AsyncBlink1 the fades are awaited; a Blink1 writes from the loop.
+        :return: dict with samples and updates
+        """
+        async for value in values:
+            rgb = self._add(value)
+            if rgb is not None:
+                await self._send_async(rgb)
+        rgb = self._take()
+        if rgb is not None:
+            await self._send_async(rgb)
+        return self.stats()
+
+    async def _send_async(self, rgb):
+        result = self.blink1.fade_to_rgb(self.fade_millis, rgb[0], rgb[1], rgb[2], self.ledn)
+        if inspect.isawaitable(result):
+            await result
+
+    def stats(self):
+        """ Samples seen and fades sent
+        """
+        return {'samples': self.samples, 'updates': self.updates}
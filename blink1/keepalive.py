@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+keepalive.py -- keep the servertickle watchdog of many blink(1)s armed
+
+With servertickle enabled, a blink(1) plays its stored pattern unless it
+is re-armed within timeout_millis. KeepaliveScheduler re-arms any number
+of devices from one timer thread, each at a fraction of its own timeout,
+so an application does not need a sleep loop per device. An optional
+health check gates each re-arm: while it fails (returns false or raises),
+the device is left to time out and play its pattern, announcing trouble:
+
+    from blink1.keepalive import KeepaliveScheduler
+
+    keepalive = KeepaliveScheduler()
+    keepalive.add(b1, timeout_millis=5000, check=lambda: db.ping())
+    ...
+    keepalive.remove(b1)  # disables the watchdog
+"""
+import logging
+import threading
+import time
+
+from .scheduler import BUSY_RETRY, Scheduler, device_lock
+
+log = logging.getLogger(__name__)
+
+# re-arm at this fraction of the timeout, so one late or failed re-arm
+# (a slow USB write, a busy timer thread) does not trigger the watchdog
+DEFAULT_FRACTION = 0.4
+
+
+class Keepalive(object):
+    """Watchdog of one device, as returned by KeepaliveScheduler.add()
+    """
+    def __init__(self, blink1, timeout_millis, period, check, stay_lit,
+                 start_pos, end_pos):
+        self.blink1 = blink1
+        self.timeout_millis = timeout_millis
+        self.period = period  # seconds between re-arms
+        self.check = check
+        self.stay_lit = stay_lit
+        self.start_pos = start_pos
+        self.end_pos = end_pos
+        self.active = True
+        self.healthy = None  # result of the last check, None before the first
+        self.rearms = 0
+        self.skipped = 0  # re-arms withheld by a failing check
+        self.errors = 0  # re-arms that could not be sent
+        self.last_error = None
+        self._deadline = None
+        self._timer = None
+
+    def _healthy(self):
+        if self.check is None:
+            return True
+        try:
+            return bool(self.check())
+        except Exception as e:
+            log.warning("blink1 keepalive check failed: %s", e)
+            return False
+
+    def as_dict(self):
+        return {'timeout_millis': self.timeout_millis, 'period': self.period,
+                'healthy': self.healthy, 'rearms': self.rearms,
+                'skipped': self.skipped, 'errors': self.errors}
+
+    def __repr__(self):
+        return "<Keepalive %s every %.3fs>" % (
+            'active' if self.active else 'removed', self.period)
+
+
+class KeepaliveScheduler(object):
+    """Re-arms servertickle on any number of devices from one timer thread.
+    Devices are duck-typed: anything with server_tickle() like Blink1.
+    """
+    def __init__(self, scheduler=None, fraction=DEFAULT_FRACTION):
+        """
+        :param scheduler: Scheduler to run on, default a new one
+        :param fraction: re-arm each device after this fraction of its timeout
+        :raises: ValueError: if fraction is not between 0 and 1
+        """
+        if not 0 < fraction < 1:
+            raise ValueError("fraction must be between 0 and 1")
+        self.fraction = fraction
+        self._own_scheduler = scheduler is None
+        self._scheduler = scheduler or Scheduler(name='blink1-keepalive')
+        self._lock = threading.RLock()
+        self._keepalives = {}
+
+    def add(self, blink1, timeout_millis, check=None, stay_lit=False,
+            start_pos=0, end_pos=16):
+        """ Enable the watchdog of a device and keep re-arming it, replacing
+        any keepalive it had. The first re-arm is sent now, if check passes.
+        :param blink1: Blink1 to keep alive
+        :param timeout_millis: millisecs until servertickle is triggered
+        :param check: callable returning True while the device should be
+            kept from playing its pattern, default always. It runs on the
+            timer thread before each re-arm, so should be quick
+        :param stay_lit: Set True to keep current color of blink(1) when
+            triggered, False to turn off
+        :param start_pos: Sub-pattern start position in whole color pattern
+        :param end_pos: Sub-pattern end position in whole color pattern
+        :return: Keepalive
+        :raises: ValueError: if timeout_millis is not positive
+        """
+        if timeout_millis <= 0:
+            raise ValueError("timeout_millis must be positive")
+        keepalive = Keepalive(blink1, timeout_millis,
+                              timeout_millis / 1000.0 * self.fraction, check,
+                              stay_lit, start_pos, end_pos)
+        with self._lock:
+            self.remove(blink1, disable=False)
+            self._keepalives[blink1] = keepalive
+            keepalive._deadline = time.monotonic()
+            keepalive._timer = self._scheduler.call_at(
+                keepalive._deadline, self._rearm, keepalive)
+        return keepalive
+
+    def remove(self, blink1, disable=True):
+        """ Stop re-arming a device
+        :param disable: also disable its watchdog, so it does not trigger
+        :return: True if it was kept alive
+        """
+        with self._lock:
+            keepalive = self._keepalives.pop(blink1, None)
+            if keepalive is None:
+                return False
+            keepalive.active = False
+            keepalive._timer.cancel()
+        # outside our lock: _rearm() takes the device lock before it
+        if disable:
+            try:
+                blink1.server_tickle(enable=False)
+            except Exception as e:
+                keepalive.errors += 1
+                keepalive.last_error = e
+        return True
+
+    def keepalive(self, blink1):
+        """ The Keepalive of a device, or None
+        """
+        return self._keepalives.get(blink1)
+
+    def _rearm(self, keepalive, healthy=None):
+        if not keepalive.active:
+            return
+        # the check may be slow (a database ping), so it runs holding no
+        # lock: neither the caller's commands nor add()/remove() wait on it
+        if healthy is None:
+            healthy = keepalive._healthy()
+        # the device lock first, so the caller's commands do not interleave
+        lock = device_lock(keepalive.blink1)
+        if not lock.acquire(blocking=False):
+            # the caller is using the device: try again shortly, with the
+            # same check result, rather than block the timer thread
+            with self._lock:
+                if keepalive.active:
+                    keepalive._timer = self._scheduler.call_later(
+                        BUSY_RETRY, self._rearm, keepalive, healthy)
+            return
+        try:
+            with self._lock:
+                if not keepalive.active:
+                    return
+                keepalive.healthy = healthy
+                if not keepalive.healthy:
+                    keepalive.skipped += 1
+                else:
+                    try:
+                        keepalive.blink1.server_tickle(
+                            enable=True, timeout_millis=keepalive.timeout_millis,
+                            stay_lit=keepalive.stay_lit, start_pos=keepalive.start_pos,
+                            end_pos=keepalive.end_pos)
+                        keepalive.rearms += 1
+                    except Exception as e:
+                        # keep trying: the device may come back before it times out
+                        keepalive.errors += 1
+                        keepalive.last_error = e
+                        log.warning("blink1 keepalive re-arm failed: %s", e)
+                # next deadline on the original grid; skip ticks missed while
+                # late rather than sending a burst of re-arms
+                now = time.monotonic()
+                deadline = keepalive._deadline + keepalive.period
+                if deadline <= now:
+                    deadline += ((now - deadline) // keepalive.period + 1) * keepalive.period
+                keepalive._deadline = deadline
+                keepalive._timer = self._scheduler.call_at(deadline, self._rearm, keepalive)
+        finally:
+            lock.release()
+
+    def stats(self, blink1=None):
+        """ Re-arm counts of all devices, or of one device
+        :return: dict with devices, rearms, skipped and errors; for one
+            device timeout_millis, period, healthy, rearms, skipped and
+            errors, or None if it is not kept alive
+        """
+        with self._lock:
+            if blink1 is not None:
+                keepalive = self._keepalives.get(blink1)
+                return keepalive.as_dict() if keepalive else None
+            keepalives = list(self._keepalives.values())
+        return {'devices': len(keepalives),
+                'rearms': sum(k.rearms for k in keepalives),
+                'skipped': sum(k.skipped for k in keepalives),
+                'errors': sum(k.errors for k in keepalives)}
+
+    def close(self, disable=True):
+        """ Stop re-arming all devices, and the timer thread if the
+        scheduler made it
+        :param disable: also disable their watchdogs
+        """
+        with self._lock:
+            blink1s = list(self._keepalives)
+        for blink1 in blink1s:
+            self.remove(blink1, disable)
+        if self._own_scheduler:
+            self._scheduler.close()
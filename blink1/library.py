@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""
+library.py -- precompiled pattern library, memory-mapped from disk
+
+Uploading a pattern string parses it, color corrects every line and
+encodes a report per line each time. A pattern library file holds those
+reports already built, for each name and each gamma / white point it was
+compiled for, so uploading a pattern is a lookup and a burst of writes:
+
+    from blink1.library import PatternLibrary
+
+    library = PatternLibrary('alerts.b1lib')
+    library.play(b1, 'disk-full')  # reports for b1's gamma and white point
+
+Compile the library from pattern strings with:
+blink1-patterns compile alerts.b1lib 'disk-full=3, red,0.3,0, black,0.3,0'
+    [--from FILE] [--gamma 2,2,2 ...] [--white-point 6500 ...]
+blink1-patterns list alerts.b1lib
+
+File layout: a 16-byte header, an index of fixed 104-byte entries (name,
+gamma, white point, repeats, report count and offset), then the reports.
+"""
+import itertools
+import mmap
+import os
+import struct
+import tempfile
+
+from . import protocol
+from .blink1 import DEFAULT_GAMMA, DEFAULT_WHITE_POINT, ColorCorrect
+from .pattern import as_pattern
+from .patternram import PATTERN_SIZE, pattern_line
+from .protocol import CMD_SET_LEDN, REPORT_SIZE
+
+MAGIC = b'BLINK1PL'
+VERSION = 1
+# magic, version, index entry size, number of entries
+HEADER = struct.Struct('<8sHHI')
+# name, gamma r,g,b, white point r,g,b, repeats, pad, report count, data offset
+ENTRY = struct.Struct('<48s3d3dBBHI')
+NAME_SIZE = 48
+
+
+class InvalidLibrary(ValueError):
+    """Raised when a file is not a pattern library
+    """
+
+
+class PatternNotFound(KeyError):
+    """Raised when a library has no pattern of that name compiled for the
+    requested gamma and white point
+    """
+
+
+def compile_reports(pattern, cc):
+    """ Build the reports that upload a pattern to all pattern lines, as
+    Blink1.play_pattern() would send them with the shadow state unknown;
+    lines past PATTERN_SIZE are dropped, as it drops them
+    :param pattern: pattern string or Pattern
+    :param cc: ColorCorrect to correct the colors with
+    :return: bytes of back to back 9-byte reports
+    :raises: InvalidPattern: if the pattern string is bad
+    """
+    pattern = as_pattern(pattern)
+    lines = [(line.millis, cc.correct_color(line.rgb), line.ledn) for line in pattern.lines]
+    lines += [(0, cc(0, 0, 0), 0)] * (PATTERN_SIZE - len(lines))
+    buf = bytearray()
+    report = bytearray(REPORT_SIZE)
+    ledn = None
+    for pos, (millis, (r, g, b), line_ledn) in enumerate(lines[:PATTERN_SIZE]):
+        if line_ledn != ledn:
+            buf += protocol.encode_set_ledn(report, line_ledn)
+            ledn = line_ledn
+        buf += protocol.encode_write_pattern_line(report, millis, r, g, b, pos)
+    return bytes(buf)
+
+
+def write_library(path, entries):
+    """ Write a library file, replacing it atomically
+    :param path: library file
+    :param entries: iterable of (name, gamma, white_point, repeats, reports),
+        gamma and white point as (r,g,b), reports from compile_reports()
+    :raises: ValueError: if a name is too long or given twice for the same settings
+    """
+    entries = list(entries)
+    index = bytearray()
+    data = bytearray()
+    offset = HEADER.size + len(entries) * ENTRY.size
+    seen = set()
+    for name, gamma, white_point, repeats, reports in entries:
+        encoded = name.encode('utf-8')
+        if not encoded or len(encoded) > NAME_SIZE:
+            raise ValueError("pattern name must be 1 to %d bytes: %r" % (NAME_SIZE, name))
+        key = (name, tuple(map(float, gamma)), tuple(map(float, white_point)))
+        if key in seen:
+            raise ValueError("pattern %r given twice for the same settings" % name)
+        seen.add(key)
+        index += ENTRY.pack(encoded, *(key[1] + key[2] + (
+            repeats, 0, len(reports) // REPORT_SIZE, offset + len(data))))
+        data += reports
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, ENTRY.size, len(entries)))
+            f.write(index)
+            f.write(data)
+        os.replace(tmp, path)  # processes with the old file mapped keep it
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def compile_library(path, patterns, settings=((DEFAULT_GAMMA, DEFAULT_WHITE_POINT),)):
+    """ Compile pattern strings into a library file
+    :param path: library file to write
+    :param patterns: dict of name -> pattern string or Pattern
+    :param settings: (gamma, white_point) pairs to compile each pattern for,
+        white point as (r,g,b), Kelvin or name as for Blink1
+    :raises: InvalidPattern: if a pattern string is bad
+    """
+    entries = []
+    for gamma, white_point in settings:
+        cc = ColorCorrect(gamma=gamma, white_point=white_point)
+        for name, pattern in sorted(patterns.items()):
+            pattern = as_pattern(pattern)
+            entries.append((name, cc.gamma, cc.white_point, pattern.repeats,
+                            compile_reports(pattern, cc)))
+    write_library(path, entries)
+
+
+class PatternLibrary(object):
+    """Memory-mapped pattern library file
+    """
+    def __init__(self, path):
+        """
+        :param path: library file
+        :raises: InvalidLibrary: if it is not a pattern library
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                raise InvalidLibrary("%s: empty file" % path)
+        try:
+            self._index = self._read_index()
+        except (struct.error, UnicodeDecodeError):
+            self.close()
+            raise InvalidLibrary("%s: truncated or corrupt" % path)
+        except InvalidLibrary:
+            self.close()
+            raise
+        self._lines = {}  # key -> pattern RAM lines, decoded when first used
+
+    def _read_index(self):
+        magic, version, entry_size, count = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION or entry_size != ENTRY.size:
+            raise InvalidLibrary("%s: not a version %d pattern library" % (self.path, VERSION))
+        index = {}
+        for i in range(count):
+            fields = ENTRY.unpack_from(self._map, HEADER.size + i * ENTRY.size)
+            name = fields[0].rstrip(b'\0').decode('utf-8')
+            repeats, num_reports, offset = fields[7], fields[9], fields[10]
+            if offset + num_reports * REPORT_SIZE > len(self._map):
+                raise InvalidLibrary("%s: truncated" % self.path)
+            index[(name, fields[1:4], fields[4:7])] = (repeats, offset, num_reports)
+        return index
+
+    def names(self):
+        """ Names of the patterns in the library
+        """
+        return sorted(set(name for name, _, _ in self._index))
+
+    def settings(self, name=None):
+        """ (gamma, white_point) pairs patterns are compiled for
+        :param name: only those of this pattern
+        """
+        return sorted(set((gamma, white) for n, gamma, white in self._index
+                          if name is None or n == name))
+
+    def _key(self, name, cc):
+        key = (name, tuple(map(float, cc.gamma)), tuple(map(float, cc.white_point)))
+        if key not in self._index:
+            raise PatternNotFound("no pattern %r compiled for gamma %s and white point %s"
+                                  % (name, key[1], key[2]))
+        return key
+
+    def reports(self, name, cc):
+        """ The reports uploading a pattern
+        :param name: pattern name
+        :param cc: ColorCorrect of the blink(1) it is for, e.g. Blink1.cc
+        :return: list of 9-byte memoryviews into the mapped file, not
+            copies; close() fails while any of them is still referenced
+        :raises: PatternNotFound: if it is not in the library for cc
+        """
+        repeats, offset, count = self._index[self._key(name, cc)]
+        data = memoryview(self._map)[offset:offset + count * REPORT_SIZE]
+        return [data[i:i + REPORT_SIZE] for i in range(0, len(data), REPORT_SIZE)]
+
+    def repeats(self, name, cc):
+        """ Number of times the pattern plays, 0=forever
+        :raises: PatternNotFound: if it is not in the library for cc
+        """
+        return self._index[self._key(name, cc)][0]
+
+    def _pattern_lines(self, key, reports):
+        lines = self._lines.get(key)
+        if lines is None:
+            lines = []
+            ledn = 0
+            for report in reports:
+                if report[1] == CMD_SET_LEDN:
+                    ledn = report[2]
+                else:
+                    r, g, b, millis = protocol.decode_pattern_line(report)
+                    lines.append(pattern_line(r, g, b, millis, ledn))
+            lines = self._lines[key] = tuple(lines)
+        return lines
+
+    def upload(self, blink1, name):
+        """ Write a pattern to the pattern RAM of a blink(1), unless its
+        shadow state shows it is there already
+        :param blink1: Blink1 to upload to
+        :param name: pattern name
+        :return: True if written, False if skipped
+        :raises: PatternNotFound: if it is not in the library for blink1's
+            gamma and white point
+        :raises: Blink1ConnectionFailed: if blink(1) is disconnected
+        """
+        key = self._key(name, blink1.cc)
+        reports = self.reports(name, blink1.cc)
+        with blink1.lock:
+            ram = blink1.pattern_ram
+            if ram is not None:
+                lines = self._pattern_lines(key, reports)
+                if ram.lines[:len(lines)] == list(lines):
+                    ram.skipped += len(lines)
+                    return False
+                ram.invalidate()  # unknown until the writes went through
+            try:
+                for report in reports:
+                    blink1.write(report)
+            except Exception:
+                if blink1.shadow is not None:
+                    blink1.shadow.invalidate()
+                raise
+            if ram is not None:
+                for pos, line in enumerate(lines):
+                    ram.set(pos, line)
+                blink1.shadow.ledn = lines[-1][4]
+            return True
+
+    def play(self, blink1, name):
+        """ Upload a pattern and play it on the blink(1), as
+        Blink1.play_pattern() does with the pattern string
+        :raises: PatternNotFound: if it is not in the library for blink1's
+            gamma and white point
+        :raises: Blink1ConnectionFailed: if blink(1) is disconnected
+        """
+        self.upload(blink1, name)
+        return blink1.play(count=self.repeats(name, blink1.cc))
+
+    def __contains__(self, name):
+        return any(n == name for n, _, _ in self._index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+
+def _floats(text):
+    values = tuple(float(v) for v in text.split(','))
+    return values * 3 if len(values) == 1 else values
+
+
+def _white_point(text):
+    if ',' in text:
+        return tuple(int(v) for v in text.split(','))
+    try:
+        return int(text)
+    except ValueError:
+        return text  # a name, e.g. 'D65'
+
+
+def _read_patterns(path):
+    patterns = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                name, sep, pattern = line.partition('=')
+                if not sep:
+                    raise ValueError("%s: expected name=pattern, got %r" % (path, line))
+                patterns[name.strip()] = pattern.strip()
+    return patterns
+
+
+def main(argv=None):
+    """ Compile pattern strings into a library, or list one
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='blink1-patterns',
+                                     description='Compile or list a blink(1) pattern library')
+    sub = parser.add_subparsers(dest='command', required=True)
+    compile_parser = sub.add_parser('compile', help='compile patterns into a library')
+    compile_parser.add_argument('path')
+    compile_parser.add_argument('patterns', nargs='*', metavar='NAME=PATTERN')
+    compile_parser.add_argument('--from', dest='from_file', action='append', default=[],
+                                metavar='FILE', help='file of NAME=PATTERN lines')
+    compile_parser.add_argument('--gamma', action='append', type=_floats,
+                                help='r,g,b gamma, repeat for more (default 2,2,2)')
+    compile_parser.add_argument('--white-point', action='append', type=_white_point,
+                                help='r,g,b, Kelvin or name, repeat for more')
+    sub.add_parser('list', help='list the patterns of a library').add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        with PatternLibrary(args.path) as library:
+            for name in library.names():
+                for gamma, white in library.settings(name):
+                    print("%s gamma=%s white_point=%s" % (name, gamma, white))
+        return
+
+    patterns = {}
+    for path in args.from_file:
+        patterns.update(_read_patterns(path))
+    for item in args.patterns:
+        name, sep, pattern = item.partition('=')
+        if not sep:
+            parser.error("expected NAME=PATTERN, got %r" % item)
+        patterns[name] = pattern
+    if not patterns:
+        parser.error("no patterns given")
+    settings = list(itertools.product(args.gamma or [DEFAULT_GAMMA],
+                                      args.white_point or [DEFAULT_WHITE_POINT]))
+    compile_library(args.path, patterns, settings)
+    print("compiled %d patterns for %d settings into %s"
+          % (len(patterns), len(settings), args.path))
+
+
+if __name__ == '__main__':
+    main()
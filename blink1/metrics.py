@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+metrics.py -- low overhead blink(1) I/O metrics, with Prometheus export
+
+Metrics counts every report written to and read from each blink(1), per
+command character ('c', 'P', 'R', 'p', 'D', 'v', ...), in fixed-bucket
+latency histograms, along with I/O errors and reconnects per serial
+number. Setting Blink1.metrics turns it on for every device:
+
+    from blink1.blink1 import Blink1
+    from blink1.metrics import Metrics, prometheus_text
+
+    Blink1.metrics = Metrics()
+    b1 = Blink1()
+    b1.fade_to_color(100, 'red')
+    Blink1.metrics.stats()  # -> {'20002345': {'write': {'c': {...}}, ...}}
+    print(prometheus_text(Blink1.metrics))
+
+While Blink1.metrics is None (the default) nothing is measured.
+"""
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# upper bounds of the latency histogram buckets, in seconds (+Inf implied)
+LATENCY_BUCKETS = (0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.5)
+
+WRITE = 'write'
+READ = 'read'
+
+
+class DeviceMetrics(object):
+    """Histograms of one device, from Metrics.device(). Blink1 keeps its
+    own, so counting a report looks nothing up by serial number
+    """
+    # Updated without a lock, which would cost more than the rest: Blink1
+    # sends and reads every report holding Blink1.lock, the coalescing
+    # writer thread included, so one Blink1's updates never race. Only two
+    # Blink1 objects open on the same device at once could race here, and
+    # lose a count now and then.
+    __slots__ = ('metrics', 'serial', '_buckets', '_writes', '_reads')
+
+    def __init__(self, metrics, serial):
+        self.metrics = metrics
+        self.serial = serial
+        self._buckets = metrics.buckets
+        # per op, indexed by command byte: None or
+        # [sum, bucket counts..., +Inf count], the count being their total
+        self._writes = [None] * 256
+        self._reads = [None] * 256
+
+    def _histogram(self, histograms, command):
+        hist = histograms[command] = [0.0] + [0] * (len(self._buckets) + 1)
+        return hist
+
+    def write(self, command, seconds):
+        """ Count one written report and its latency
+        :param command: command byte of the report, e.g. ord('c')
+        :param seconds: how long the USB call took
+        """
+        hist = self._writes[command]
+        if hist is None:
+            hist = self._histogram(self._writes, command)
+        hist[0] += seconds
+        hist[bisect_left(self._buckets, seconds) + 1] += 1
+
+    def read(self, command, seconds):
+        """ Count one read report and its latency, see write()
+        """
+        hist = self._reads[command]
+        if hist is None:
+            hist = self._histogram(self._reads, command)
+        hist[0] += seconds
+        hist[bisect_left(self._buckets, seconds) + 1] += 1
+
+    def _reset(self):
+        self._writes[:] = [None] * 256
+        self._reads[:] = [None] * 256
+
+    def _snapshot(self):
+        return dict((op, [(command, list(hist)) for command, hist in enumerate(histograms)
+                          if hist is not None])
+                    for op, histograms in ((WRITE, self._writes), (READ, self._reads)))
+
+
+class Metrics(object):
+    """Command counters and latency histograms, per serial number
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        :param buckets: ascending histogram bucket upper bounds, in seconds
+        """
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._devices = {}  # serial -> DeviceMetrics
+        self._errors = {}
+        self._reconnects = {}
+        self._opened = set()
+
+    def device(self, serial):
+        """ The histograms of one device, to count its reports without
+        looking them up each time
+        :param serial: serial number of the device
+        :return: DeviceMetrics
+        """
+        with self._lock:
+            device = self._devices.get(serial)
+            if device is None:
+                device = self._devices[serial] = DeviceMetrics(self, serial)
+            return device
+
+    def observe(self, serial, op, command, seconds):
+        """ Count one report and its latency. Blink1 counts through its
+        device() instead, which is faster.
+        :param serial: serial number of the device
+        :param op: WRITE or READ
+        :param command: command byte of the report, e.g. ord('c')
+        :param seconds: how long the USB call took
+        """
+        device = self.device(serial)
+        (device.write if op == WRITE else device.read)(command, seconds)
+
+    def error(self, serial):
+        """ Count a failed write or read
+        """
+        with self._lock:
+            self._errors[serial] = self._errors.get(serial, 0) + 1
+
+    def opened(self, serial):
+        """ Note a device being opened, so it is listed before any report
+        """
+        with self._lock:
+            self._opened.add(serial)
+
+    def reconnected(self, serial):
+        """ Count a device reopened after it failed, see Blink1._reopen()
+        """
+        with self._lock:
+            self._reconnects[serial] = self._reconnects.get(serial, 0) + 1
+            self._opened.add(serial)
+
+    def reset(self):
+        """ Forget everything counted so far
+        """
+        with self._lock:
+            for device in self._devices.values():
+                device._reset()
+            self._errors.clear()
+            self._reconnects.clear()
+
+    def stats(self, serial=None):
+        """ Snapshot of everything counted
+        :param serial: only this device
+        :return: dict of serial: {'write': {command: histogram}, 'read': {...},
+            'errors': n, 'reconnects': n}, where a histogram is a dict of
+            count, sum (seconds) and buckets, a list of (upper bound, count)
+            pairs with cumulative counts; or one device's dict if serial given
+        """
+        with self._lock:
+            histograms = [(s, device._snapshot()) for s, device in self._devices.items()]
+            errors = dict(self._errors)
+            reconnects = dict(self._reconnects)
+            opened = set(self._opened)
+
+        snapshot = {}
+
+        def device(s):
+            return snapshot.setdefault(s, {WRITE: {}, READ: {}, 'errors': 0,
+                                           'reconnects': 0})
+
+        bounds = self.buckets + (float('inf'),)
+        for s, ops in histograms:
+            for op, hists in ops.items():
+                for command, hist in hists:
+                    cumulative, running = [], 0
+                    for bound, n in zip(bounds, hist[1:]):
+                        running += n
+                        cumulative.append((bound, running))
+                    device(s)[op][chr(command)] = {
+                        'count': running, 'sum': hist[0], 'buckets': cumulative}
+        for s, n in errors.items():
+            device(s)['errors'] = n
+        for s, n in reconnects.items():
+            device(s)['reconnects'] = n
+        for s in opened:
+            device(s)
+
+        if serial is not None:
+            return snapshot.get(serial) or {WRITE: {}, READ: {}, 'errors': 0,
+                                            'reconnects': 0}
+        return snapshot
+
+
+def _labels(**labels):
+    return '{%s}' % ','.join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                             for k, v in sorted(labels.items()))
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def prometheus_text(metrics):
+    """ Format metrics in the Prometheus text exposition format
+    :param metrics: Metrics
+    :return: str
+    """
+    snapshot = metrics.stats()
+    lines = [
+        '# HELP blink1_report_seconds blink(1) USB feature report latency',
+        '# TYPE blink1_report_seconds histogram',
+    ]
+    for serial in sorted(snapshot):
+        for op in (WRITE, READ):
+            for command, hist in sorted(snapshot[serial][op].items()):
+                for bound, count in hist['buckets']:
+                    lines.append('blink1_report_seconds_bucket%s %d' % (
+                        _labels(serial=serial, op=op, command=command,
+                                le=_number(bound)), count))
+                labels = _labels(serial=serial, op=op, command=command)
+                lines.append('blink1_report_seconds_sum%s %s' % (labels, _number(hist['sum'])))
+                lines.append('blink1_report_seconds_count%s %d' % (labels, hist['count']))
+    for name, key, help_text in (
+            ('blink1_errors_total', 'errors', 'failed blink(1) writes and reads'),
+            ('blink1_reconnects_total', 'reconnects', 'blink(1) devices reopened after a failure')):
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s counter' % name)
+        for serial in sorted(snapshot):
+            lines.append('%s%s %d' % (name, _labels(serial=serial), snapshot[serial][key]))
+    return '\n'.join(lines) + '\n'
+
+
+def serve_prometheus(metrics, port=9111, addr=''):
+    """ Serve prometheus_text(metrics) over HTTP on a background thread
+    :return: the HTTP server, shutdown() it to stop
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = prometheus_text(metrics).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), Handler)
+    thread = threading.Thread(target=server.serve_forever, name='blink1-metrics',
+                              daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+pattern.py -- compiled Blink1Control-style color patterns
+
+A pattern string is a repeat count followed by triples of color, time in
+seconds and LED, e.g. '10, #ff00ff,0.1,0, #00ff00,0.1,0'. compile_pattern()
+parses it once into an immutable Pattern with the colors already resolved
+to (r,g,b), and remembers recent results, so playing or uploading the same
+pattern string again does no parsing at all:
+
+    from blink1.pattern import compile_pattern
+
+    pattern = compile_pattern('3, red,0.5,1, blue,0.5,2')
+    pattern.repeats         # -> 3
+    pattern.lines[0].rgb    # -> (255, 0, 0)
+    b1.play_pattern(pattern)
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+from .colors import InvalidColor, color_to_rgb
+from .protocol import MAX_MILLIS
+
+PATTERN_CACHE_SIZE = 256  # compiled patterns remembered by compile_pattern
+
+DEFAULT_LINE = ('#000000', 0.0, 0)  # color, time, ledn of missing fields
+MAX_TIME = MAX_MILLIS / 1000.0  # seconds, 655.35: longer times do not fit a report
+
+
+class InvalidPattern(ValueError):
+    """Raised when a pattern string cannot be parsed
+    """
+    def __init__(self, message, pattern_str, position):
+        """
+        :param message: what is wrong
+        :param pattern_str: the pattern string
+        :param position: index into pattern_str of the bad field
+        """
+        ValueError.__init__(self, message, pattern_str, position)
+        self.message = message
+        self.pattern_str = pattern_str
+        self.position = position
+
+    def __str__(self):
+        return "%s at position %d\n  %s\n  %s^" % (
+            self.message, self.position, self.pattern_str, ' ' * self.position)
+
+
+class InvalidPatternColor(InvalidPattern, InvalidColor):
+    """Raised when a pattern string contains a bad color
+    """
+
+
+# a pattern line: rgb is a validated (r,g,b) tuple, time in seconds
+PatternLine = namedtuple('PatternLine', 'rgb time millis ledn')
+
+
+class Pattern(object):
+    """An immutable, parsed color pattern
+    """
+    __slots__ = ('repeats', 'lines', 'source')
+
+    def __init__(self, repeats, lines, source=None):
+        """
+        :param repeats: number of times to play, 0=play forever
+        :param lines: sequence of PatternLine
+        :param source: the pattern string it was compiled from, if any
+        """
+        self.repeats = repeats
+        self.lines = tuple(lines)
+        self.source = source
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __eq__(self, other):
+        return (isinstance(other, Pattern) and
+                (self.repeats, self.lines) == (other.repeats, other.lines))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.repeats, self.lines))
+
+    def __repr__(self):
+        return "Pattern(%r, %r)" % (self.repeats, self.lines)
+
+
+def tokenize(pattern_str):
+    """ Split a pattern string into its comma separated fields, with the
+    position of each for error messages
+    :return: list of (field, position) with spaces removed from each field
+    """
+    fields = []
+    start = 0
+    length = len(pattern_str)
+    while True:
+        end = pattern_str.find(',', start)
+        if end < 0:
+            end = length
+        pos = start
+        while pos < end and pattern_str[pos] == ' ':
+            pos += 1
+        fields.append((pattern_str[start:end].replace(' ', ''), pos))
+        if end == length:
+            return fields
+        start = end + 1
+
+
+def _number(convert, text, what, pattern_str, position, limit):
+    try:
+        value = convert(text)
+    except ValueError:
+        raise InvalidPattern("bad %s %r" % (what, text), pattern_str, position)
+    if not 0 <= value <= limit:
+        raise InvalidPattern("%s %r out of range" % (what, text),
+                             pattern_str, position)
+    return value
+
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def compile_pattern(pattern_str):
+    """ Parse a Blink1Control pattern string, e.g. '10,#ff00ff,0.1,0,#00ff00,0.1,0'
+    Missing or empty fields default to black, 0 seconds and all LEDs.
+    :param pattern_str: The Blink1Control-style pattern string to parse
+    :return: Pattern
+    :raises: InvalidPattern: with the position of the first bad field
+    """
+    # fast path: plain str.split(), field positions are only worked out
+    # by _compile_checked() when something is wrong
+    fields = pattern_str.replace(' ', '').split(',')
+    try:
+        repeats = int(fields[0])
+        if not 0 <= repeats <= 255:
+            raise ValueError(repeats)
+        fields += [''] * (-(len(fields) - 1) % 3)
+        lines = []
+        for i in range(1, len(fields), 3):
+            color, time_, ledn = fields[i], fields[i + 1], fields[i + 2]
+            rgb = color_to_rgb(color or '#000000')
+            seconds = float(time_) if time_ else 0.0
+            ledn = int(ledn) if ledn else 0
+            if not (0 <= seconds <= MAX_TIME and 0 <= ledn <= 255):
+                raise ValueError(time_, ledn)
+            lines.append(PatternLine(rgb, seconds, int(seconds * 1000), ledn))
+    except ValueError:  # InvalidColor too
+        return _compile_checked(pattern_str)
+    return Pattern(repeats, lines, pattern_str)
+
+
+def _compile_checked(pattern_str):
+    # field by field, raising InvalidPattern at the first bad one
+    fields = tokenize(pattern_str)
+    text, position = fields[0]
+    repeats = _number(int, text, "repeat count", pattern_str, position, 255)
+
+    lines = []
+    end = len(pattern_str)
+    for i in range(1, len(fields), 3):
+        group = fields[i:i + 3]
+        values = []
+        for j, default in enumerate(DEFAULT_LINE):
+            text, position = group[j] if j < len(group) else ('', end)
+            values.append((text or default, position))
+
+        (color, color_pos), (time_, time_pos), (ledn, ledn_pos) = values
+        try:
+            rgb = color_to_rgb(color)
+        except InvalidColor:
+            raise InvalidPatternColor("bad color %r" % color, pattern_str, color_pos)
+        seconds = _number(float, time_, "time", pattern_str, time_pos, MAX_TIME)
+        ledn = _number(int, ledn, "LED", pattern_str, ledn_pos, 255)
+        lines.append(PatternLine(rgb, seconds, int(seconds * 1000), ledn))
+
+    return Pattern(repeats, lines, pattern_str)
+
+
+def as_pattern(pattern):
+    """ Compile a pattern string, pass a Pattern through unchanged
+    """
+    if isinstance(pattern, Pattern):
+        return pattern
+    return compile_pattern(pattern)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+patternram.py -- host-side model of a blink(1)'s color pattern RAM
+
+The blink(1) has 32 color pattern lines in RAM (mk2 and later). PatternRAM
+remembers what was written to each line, as the device stores it (color
+after correction, step time in 10 ms units, LED), so uploading a pattern
+only needs to write the lines that differ. Lines never written or read
+back are unknown and always written.
+"""
+
+PATTERN_SIZE = 32
+
+
+def pattern_line(r, g, b, step_millis, ledn=0):
+    """ A pattern line as stored on the device
+    :return: tuple (r, g, b, step_millis, ledn), step_millis rounded down
+        to the device's 10 ms resolution
+    """
+    return (int(r), int(g), int(b), (int(step_millis / 10) & 0xffff) * 10, ledn)
+
+
+class PatternRAM(object):
+    """Last known content of each pattern line of one blink(1).
+    """
+    def __init__(self, size=PATTERN_SIZE):
+        """
+        :param size: number of pattern lines
+        """
+        self.size = size
+        self.lines = [None] * size
+        self.skipped = 0
+
+    def invalidate(self):
+        """ Forget all lines, e.g. after a reconnect
+        """
+        self.lines = [None] * self.size
+
+    def is_current(self, pos, line):
+        """ True if pattern line pos already holds line
+        :param line: tuple from pattern_line()
+        """
+        return 0 <= pos < self.size and self.lines[pos] == line
+
+    def set(self, pos, line):
+        """ Record that line was written to, or read from, position pos
+        """
+        if 0 <= pos < self.size:
+            self.lines[pos] = line
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+player.py -- play host-side patterns on many blink(1)s in the background
+
+PatternPlayer steps patterns against absolute time.monotonic() deadlines,
+so a pattern does not drift however long each USB write takes, and one
+timer thread drives any number of devices:
+
+    from blink1.player import PatternPlayer
+
+    player = PatternPlayer()
+    player.start(b1, '0, red,0.5,0, blue,0.5,0')  # loop forever
+    player.pause(b1)
+    player.resume(b1)
+    player.replace(b1, '0, green,1,0, black,1,0')  # keeps the beat
+    player.stop(b1)
+    player.stats()  # -> {'steps': 6, 'jitter_mean': ..., 'jitter_max': ...}
+"""
+import threading
+import time
+
+from .pattern import as_pattern
+from .scheduler import BUSY_RETRY, Scheduler, device_lock
+
+PLAYING = 'playing'
+PAUSED = 'paused'
+STOPPED = 'stopped'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JitterStats(object):
+    """How late pattern steps ran compared to their deadlines, in seconds
+    """
+    __slots__ = ('steps', 'total', 'max')
+
+    def __init__(self):
+        self.steps = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, late):
+        self.steps += 1
+        self.total += late
+        if late > self.max:
+            self.max = late
+
+    def as_dict(self):
+        return {'steps': self.steps,
+                'jitter_mean': self.total / self.steps if self.steps else 0.0,
+                'jitter_max': self.max}
+
+
+class Playback(object):
+    """A pattern playing on one device, as returned by PatternPlayer.start()
+    """
+    def __init__(self, blink1, pattern):
+        self.blink1 = blink1
+        self.pattern = pattern
+        self.state = PLAYING
+        self.error = None
+        self.jitter = JitterStats()
+        self._index = 0
+        self._remaining = pattern.repeats or None  # None: forever
+        self._deadline = 0.0
+        self._paused_delay = 0.0
+        self._timer = None
+        self._generation = 0  # bumped on pause, so stale steps are ignored
+        self._done = threading.Event()
+
+    @property
+    def active(self):
+        """ True while playing or paused
+        """
+        return self.state in (PLAYING, PAUSED)
+
+    def wait(self, timeout=None):
+        """ Wait for the pattern to finish, be stopped or fail
+        :return: True if it did, False on timeout
+        """
+        return self._done.wait(timeout)
+
+    def _finish(self, state, error=None):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.state = state
+        self.error = error
+        self._done.set()
+
+    def __repr__(self):
+        return "Playback(%r, state=%r)" % (self.pattern, self.state)
+
+
+class PatternPlayer(object):
+    """Plays patterns on any number of devices from one timer thread.
+    Devices are duck-typed: anything with fade_to_color(millis, rgb, ledn).
+    """
+    def __init__(self, scheduler=None):
+        """
+        :param scheduler: Scheduler to run on, default a new one
+        """
+        self._own_scheduler = scheduler is None
+        self._scheduler = scheduler or Scheduler(name='blink1-player')
+        self._lock = threading.RLock()
+        self._playbacks = {}
+        self.jitter = JitterStats()
+
+    def start(self, blink1, pattern):
+        """ Start playing a pattern on a device now, stopping whatever
+        was playing on it
+        :param blink1: Blink1 to play on
+        :param pattern: pattern string or Pattern
+        :return: Playback
+        :raises: InvalidPattern: if the pattern string is bad
+        :raises: ValueError: if the pattern loops forever without taking time
+        """
+        return self._start(blink1, pattern, None)
+
+    def replace(self, blink1, pattern):
+        """ Switch a device to another pattern at its next step deadline,
+        so the new pattern keeps the beat of the old one. Starts the
+        pattern now if nothing is playing.
+        :return: Playback
+        """
+        with self._lock:
+            old = self._playbacks.get(blink1)
+            deadline = None
+            if old is not None and old.state == PLAYING:
+                deadline = old._deadline
+            return self._start(blink1, pattern, deadline)
+
+    def _start(self, blink1, pattern, deadline):
+        pattern = as_pattern(pattern)
+        if not pattern.repeats and pattern.lines and \
+                not sum(line.time for line in pattern.lines):
+            raise ValueError("pattern repeats forever but takes no time")
+        with self._lock:
+            self.stop(blink1)
+            playback = Playback(blink1, pattern)
+            self._playbacks[blink1] = playback
+            if not pattern.lines:
+                playback._finish(DONE)
+                return playback
+            playback._deadline = time.monotonic() if deadline is None else deadline
+            playback._timer = self._scheduler.call_at(
+                playback._deadline, self._step, playback, playback._generation)
+            return playback
+
+    def stop(self, blink1):
+        """ Stop the pattern playing on a device. No command is sent to
+        the device after this returns; it keeps its current color.
+        :return: True if something was playing
+        """
+        with self._lock:
+            playback = self._playbacks.pop(blink1, None)
+            if playback is None or not playback.active:
+                return False
+            playback._finish(STOPPED)
+            return True
+
+    def pause(self, blink1):
+        """ Pause the pattern on a device, remembering where it was
+        :return: True if it was playing
+        """
+        with self._lock:
+            playback = self._playbacks.get(blink1)
+            if playback is None or playback.state != PLAYING:
+                return False
+            playback._timer.cancel()
+            playback._timer = None
+            playback._generation += 1
+            playback._paused_delay = max(0.0, playback._deadline - time.monotonic())
+            playback.state = PAUSED
+            return True
+
+    def resume(self, blink1):
+        """ Resume a paused pattern, with the rest of the step it was
+        paused in
+        :return: True if it was paused
+        """
+        with self._lock:
+            playback = self._playbacks.get(blink1)
+            if playback is None or playback.state != PAUSED:
+                return False
+            playback._deadline = time.monotonic() + playback._paused_delay
+            playback.state = PLAYING
+            playback._timer = self._scheduler.call_at(
+                playback._deadline, self._step, playback, playback._generation)
+            return True
+
+    def playback(self, blink1):
+        """ The Playback of a device, or None
+        """
+        return self._playbacks.get(blink1)
+
+    def _step(self, playback, generation):
+        # the device lock first: callers holding it may call stop() etc.
+        lock = device_lock(playback.blink1)
+        if not lock.acquire(blocking=False):
+            # the caller is using the device: try again shortly rather
+            # than block the timer thread, and every other device on it
+            with self._lock:
+                if playback.state == PLAYING and playback._generation == generation:
+                    playback._timer = self._scheduler.call_later(
+                        BUSY_RETRY, self._step, playback, generation)
+            return
+        try:
+            with self._lock:
+                if playback.state != PLAYING or playback._generation != generation:
+                    return
+                lines = playback.pattern.lines
+                if playback._index == len(lines):
+                    playback._index = 0
+                    if playback._remaining is not None:
+                        playback._remaining -= 1
+                        if not playback._remaining:
+                            playback._finish(DONE)
+                            return
+                late = time.monotonic() - playback._deadline
+                playback.jitter.add(late)
+                self.jitter.add(late)
+
+                line = lines[playback._index]
+                try:
+                    playback.blink1.fade_to_color(line.millis, line.rgb, line.ledn)
+                except Exception as e:
+                    playback._finish(FAILED, e)
+                    return
+                playback._index += 1
+                playback._deadline += line.time  # absolute: no drift
+                playback._timer = self._scheduler.call_at(
+                    playback._deadline, self._step, playback, playback._generation)
+        finally:
+            lock.release()
+
+    def stats(self, blink1=None):
+        """ Jitter statistics of all steps played, or of one device's
+        current playback
+        :return: dict with steps, jitter_mean and jitter_max (seconds)
+        """
+        if blink1 is None:
+            return self.jitter.as_dict()
+        playback = self._playbacks.get(blink1)
+        return playback.jitter.as_dict() if playback else JitterStats().as_dict()
+
+    def close(self):
+        """ Stop all patterns, and the timer thread if the player made it
+        """
+        with self._lock:
+            for blink1 in list(self._playbacks):
+                self.stop(blink1)
+        if self._own_scheduler:
+            self._scheduler.close()
+
+
+_default_player = None
+_default_lock = threading.Lock()
+
+
+def default_player():
+    """ The shared PatternPlayer used by Blink1.play_pattern_local(background=True)
+    """
+    global _default_player
+    with _default_lock:
+        if _default_player is None:
+            _default_player = PatternPlayer()
+        return _default_player
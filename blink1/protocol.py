@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+protocol.py -- blink(1) HID feature report encoders and decoders
+
+Every blink(1) command is a 9-byte USB HID feature report: report id 0x01,
+an ASCII command byte and up to 7 bytes of arguments. The encoders here
+pack a command with a precompiled struct.Struct straight into a caller
+supplied buffer (bytearray, memoryview, ...) so that sending a command
+does not need to build a new Python list each time:
+
+    buf = bytearray(REPORT_SIZE)
+    encode_fade_to_rgb(buf, 500, 255, 0, 255)
+    dev.send_feature_report(buf)
+
+Times are given in milliseconds and sent in the device's 10 ms units.
+"""
+import struct
+
+REPORT_ID = 0x01
+REPORT_SIZE = 9  # 8 bytes + 1 byte reportId
+MAX_MILLIS = 0xffff * 10  # longest fade or step time a report can carry
+
+CMD_FADE_TO_RGB = ord('c')
+CMD_SET_LEDN = ord('l')
+CMD_WRITE_PATTERN_LINE = ord('P')
+CMD_READ_PATTERN_LINE = ord('R')
+CMD_PLAY = ord('p')
+CMD_SAVE_PATTERN = ord('W')
+CMD_SERVER_TICKLE = ord('D')
+CMD_GET_VERSION = ord('v')
+
+# report id, command, r, g, b, time (10ms units), ledn/pos, pad
+_RGB_TIME = struct.Struct('>BBBBBHBB')
+# report id, command, then up to seven argument bytes
+_BYTES = struct.Struct('>BBBBBBBBB')
+# report id, command, enable, timeout (10ms units), stay lit, start, end, pad
+_TICKLE = struct.Struct('>BBBHBBBB')
+
+_SAVE_MAGIC = (0xBE, 0xEF, 0xCA, 0xFE)
+
+
+def _ticks(millis):
+    """ Convert milliseconds to the 16-bit 10 ms ticks the device uses
+    """
+    return int(millis / 10) & 0xffff
+
+
+def encode_fade_to_rgb(buf, fade_millis, r, g, b, ledn=0, offset=0):
+    """ Encode a 'c' fade to RGB command into buf
+    """
+    _RGB_TIME.pack_into(buf, offset, REPORT_ID, CMD_FADE_TO_RGB,
+                        int(r), int(g), int(b), _ticks(fade_millis), ledn, 0)
+    return buf
+
+
+def encode_set_ledn(buf, ledn=0, offset=0):
+    """ Encode an 'l' set current LED command into buf
+    """
+    _BYTES.pack_into(buf, offset, REPORT_ID, CMD_SET_LEDN, ledn, 0, 0, 0, 0, 0, 0)
+    return buf
+
+
+def encode_write_pattern_line(buf, step_millis, r, g, b, pos, offset=0):
+    """ Encode a 'P' write pattern line command into buf
+    """
+    _RGB_TIME.pack_into(buf, offset, REPORT_ID, CMD_WRITE_PATTERN_LINE,
+                        int(r), int(g), int(b), _ticks(step_millis), int(pos), 0)
+    return buf
+
+
+def encode_read_pattern_line(buf, pos, offset=0):
+    """ Encode an 'R' read pattern line command into buf
+    """
+    _BYTES.pack_into(buf, offset, REPORT_ID, CMD_READ_PATTERN_LINE,
+                     0, 0, 0, 0, 0, int(pos), 0)
+    return buf
+
+
+def encode_play(buf, play=True, start_pos=0, end_pos=0, count=0, offset=0):
+    """ Encode a 'p' play/stop pattern command into buf
+    """
+    _BYTES.pack_into(buf, offset, REPORT_ID, CMD_PLAY, int(bool(play)),
+                     int(start_pos), int(end_pos), int(count), 0, 0, 0)
+    return buf
+
+
+def encode_save_pattern(buf, offset=0):
+    """ Encode a 'W' save pattern to flash command into buf
+    """
+    _BYTES.pack_into(buf, offset, REPORT_ID, CMD_SAVE_PATTERN,
+                     *(_SAVE_MAGIC + (0, 0, 0)))
+    return buf
+
+
+def encode_server_tickle(buf, enable, timeout_millis=0, stay_lit=False,
+                         start_pos=0, end_pos=16, offset=0):
+    """ Encode a 'D' servertickle watchdog command into buf
+    """
+    _TICKLE.pack_into(buf, offset, REPORT_ID, CMD_SERVER_TICKLE,
+                      int(enable is True), _ticks(timeout_millis),
+                      int(stay_lit is True), start_pos, end_pos, 0)
+    return buf
+
+
+def encode_get_version(buf, offset=0):
+    """ Encode a 'v' get firmware version command into buf
+    """
+    _BYTES.pack_into(buf, offset, REPORT_ID, CMD_GET_VERSION, 0, 0, 0, 0, 0, 0, 0)
+    return buf
+
+
+def decode_pattern_line(buf):
+    """ Decode the response to an 'R' read pattern line command
+    :return: tuple (r, g, b, step_millis)
+    """
+    _, _, r, g, b, ticks, _, _ = _RGB_TIME.unpack_from(bytes(buf[:REPORT_SIZE]))
+    return r, g, b, ticks * 10
+
+
+def decode_pattern_line_n(buf):
+    """ Decode the response to an 'R' read pattern line command, with the
+    LED the line applies to (mk2 firmware 204 and later)
+    :return: tuple (r, g, b, step_millis, ledn)
+    """
+    _, _, r, g, b, ticks, ledn, _ = _RGB_TIME.unpack_from(bytes(buf[:REPORT_SIZE]))
+    return r, g, b, ticks * 10, ledn
+
+
+def decode_version(buf):
+    """ Decode the response to a 'v' get version command
+    :return: firmware version as string, e.g. "204"
+    """
+    return str((buf[3] - ord('0')) * 100 + (buf[4] - ord('0')))
+
+
+def decode_report(buf):
+    """ Decode any command report into its command character and arguments
+    :return: tuple (command, args) where args is a tuple of ints; fade and
+        pattern line times are given in milliseconds
+    """
+    data = bytes(buf[:REPORT_SIZE])
+    cmd = data[1]
+    if cmd in (CMD_FADE_TO_RGB, CMD_WRITE_PATTERN_LINE):
+        _, _, r, g, b, ticks, n, _ = _RGB_TIME.unpack(data)
+        return chr(cmd), (r, g, b, ticks * 10, n)
+    if cmd == CMD_SERVER_TICKLE:
+        _, _, en, ticks, st, start, end, _ = _TICKLE.unpack(data)
+        return chr(cmd), (en, ticks * 10, st, start, end)
+    return chr(cmd), tuple(data[2:])
+
+
+def format_report(buf):
+    """ Format a report as hex for debug logging
+    """
+    return ",".join('0x%02x' % v for v in buf)
+
+
+class ReportBatch(object):
+    """Several reports packed back to back into one contiguous buffer,
+    for sending bursts of commands without per-command allocation.
+
+        batch = ReportBatch()
+        batch.add(encode_set_ledn, 1)
+        batch.add(encode_write_pattern_line, 100, 255, 0, 0, 0)
+        for report in batch:
+            dev.send_feature_report(report)
+    """
+    def __init__(self, capacity=32):
+        """
+        :param capacity: number of reports to preallocate room for
+        """
+        self.buf = bytearray(capacity * REPORT_SIZE)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, encoder, *args, **kwargs):
+        """ Append a report using one of the encode_*() functions
+        :param encoder: encoder function, e.g. encode_fade_to_rgb
+        :param args: encoder arguments, without the buffer
+        """
+        offset = self.count * REPORT_SIZE
+        if offset + REPORT_SIZE > len(self.buf):
+            self.buf.extend(bytes(len(self.buf) or REPORT_SIZE))
+        encoder(self.buf, *args, offset=offset, **kwargs)
+        self.count += 1
+
+    def clear(self):
+        """ Forget all reports, keeping the allocated buffer
+        """
+        self.count = 0
+
+    def __iter__(self):
+        """ Iterate over the reports as memoryview slices of the buffer
+        """
+        view = memoryview(self.buf)
+        for i in range(0, self.count * REPORT_SIZE, REPORT_SIZE):
+            yield view[i:i + REPORT_SIZE]
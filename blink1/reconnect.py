@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+reconnect.py -- reopen a blink(1) after a USB glitch or replug
+
+By default a failed write raises Blink1ConnectionFailed and the Blink1 is
+no use any more. With a ReconnectPolicy, Blink1 instead reopens the same
+serial number, retrying with exponential backoff, replays the colors last
+commanded to its LEDs and sends the failed command again. No command
+blocks longer than max_block seconds waiting for the device to come back;
+if it does not, the command raises as before and the next command carries
+on with the backoff where it left off:
+
+    from blink1.blink1 import Blink1
+    from blink1.reconnect import ReconnectPolicy
+
+    policy = ReconnectPolicy(max_block=0.5,
+                             on_disconnect=lambda b1, err: print("lost", err),
+                             on_reconnect=lambda b1: print("back"))
+    b1 = Blink1(reconnect=policy)
+
+Use one ReconnectPolicy per Blink1, it holds that device's backoff state.
+"""
+import time
+
+DEFAULT_INITIAL_DELAY = 0.05
+DEFAULT_MAX_DELAY = 5.0
+DEFAULT_MAX_BLOCK = 1.0
+
+
+class ReconnectPolicy(object):
+    """How, and how hard, a Blink1 tries to reopen its device
+    """
+    def __init__(self, initial_delay=DEFAULT_INITIAL_DELAY, max_delay=DEFAULT_MAX_DELAY,
+                 factor=2.0, max_block=DEFAULT_MAX_BLOCK, replay=True,
+                 on_disconnect=None, on_reconnect=None, on_attempt_failed=None):
+        """
+        :param initial_delay: seconds between the first reopen attempts
+        :param max_delay: max seconds between attempts
+        :param factor: delay multiplier after each failed attempt
+        :param max_block: max seconds one command waits for a reconnect
+        :param replay: resend the last commanded LED colors after reopening
+        :param on_disconnect: called as f(blink1, error) when the device fails
+        :param on_reconnect: called as f(blink1) when it is open again
+        :param on_attempt_failed: called as f(blink1, error) for each failed reopen
+        """
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.max_block = max_block
+        self.replay = replay
+        self.on_disconnect = on_disconnect
+        self.on_reconnect = on_reconnect
+        self.on_attempt_failed = on_attempt_failed
+        self.disconnected = False
+        self.attempts = 0
+        self.reconnects = 0
+        self._delay = initial_delay
+        self._next_attempt = 0.0
+
+    def _call(self, callback, *args):
+        if callback is not None:
+            callback(*args)
+
+    def recover(self, blink1, error):
+        """ Reopen a failed device, waiting at most max_block seconds
+        :param blink1: the Blink1 whose write or read failed
+        :param error: the exception it failed with
+        :return: True if the device is open again
+        """
+        deadline = time.monotonic() + self.max_block
+        if not self.disconnected:
+            self.disconnected = True
+            self._call(self.on_disconnect, blink1, error)
+        while True:
+            wait = self._next_attempt - time.monotonic()
+            if time.monotonic() + max(wait, 0.0) > deadline:
+                return False
+            if wait > 0:
+                time.sleep(wait)
+            self.attempts += 1
+            try:
+                blink1._reopen(replay=self.replay)
+            except (IOError, OSError, RuntimeError) as e:  # incl. Blink1ConnectionFailed
+                self._next_attempt = time.monotonic() + self._delay
+                self._delay = min(self._delay * self.factor, self.max_delay)
+                self._call(self.on_attempt_failed, blink1, e)
+                continue
+            self.disconnected = False
+            self.reconnects += 1
+            self._delay = self.initial_delay
+            self._next_attempt = 0.0
+            self._call(self.on_reconnect, blink1)
+            return True
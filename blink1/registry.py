@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+registry.py -- cached blink(1) enumeration, refreshed on hotplug
+
+Enumerating USB HID devices walks the whole HID tree on every call. A
+DeviceRegistry enumerates once, keeps the result keyed by serial number and
+only enumerates again after a hotplug event (a /dev/hidraw* node appearing
+or disappearing on Linux, a polled change elsewhere):
+
+    from blink1.blink1 import Blink1
+    from blink1.registry import DeviceRegistry
+
+    registry = DeviceRegistry()
+    registry.subscribe(on_attach=lambda serial: print("plugged", serial),
+                       on_detach=lambda serial: print("unplugged", serial))
+    Blink1.registry = registry  # Blink1.list()/find() now use the cache
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+import hid
+
+from .blink1 import VENDOR_ID, PRODUCT_ID
+
+log = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 1.0
+# after a hotplug event, seconds between enumerations until two agree: a
+# device can show up in sysfs before hidapi lists it with its serial number
+DEFAULT_SETTLE = 0.05
+SETTLE_RETRIES = 5
+
+# inotify(7) event masks
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+_INOTIFY_EVENT = struct.Struct('iIII')
+
+
+def hid_enumerate():
+    """ Enumerate blink(1) devices with hidapi
+    :return: list of hidapi device info dicts
+    """
+    try:
+        return hid.enumerate(VENDOR_ID, PRODUCT_ID)
+    except IOError:
+        return []
+
+
+def sysfs_fingerprint(sysfs_root='/sys'):
+    """ Cheap summary of attached hidraw devices, changes on hotplug
+    :param sysfs_root: root of sysfs, e.g. a fake tree for tests
+    :return: tuple of hidraw device names
+    """
+    try:
+        return tuple(sorted(os.listdir(os.path.join(sysfs_root, 'class', 'hidraw'))))
+    except OSError:
+        return ()
+
+
+class PollingWatcher(object):
+    """Calls back when a fingerprint function's result changes, checked
+    every `interval` seconds on a background thread.
+    """
+    def __init__(self, fingerprint, interval=DEFAULT_POLL_INTERVAL):
+        """
+        :param fingerprint: function returning a value that changes on hotplug
+        :param interval: seconds between checks
+        """
+        self.fingerprint = fingerprint
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, callback):
+        last = self.fingerprint()
+
+        def run():
+            nonlocal last
+            while not self._stop.wait(self.interval):
+                current = self.fingerprint()
+                if current != last:
+                    last = current
+                    callback()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name='blink1-hotplug', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class InotifyWatcher(object):
+    """Calls back when a hidraw device node is created or removed, using
+    Linux inotify on the /dev directory.
+    """
+    def __init__(self, dev_root='/dev', prefix='hidraw'):
+        """
+        :param dev_root: directory holding the device nodes
+        :param prefix: device node name prefix to react to
+        :raises: OSError: if inotify is not available
+        """
+        self.dev_root = dev_root
+        self.prefix = prefix.encode()
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+        if libc.inotify_add_watch(self._fd, dev_root.encode(), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(err, "inotify_add_watch failed on %s" % dev_root)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _changed(self, data):
+        offset = 0
+        while offset + _INOTIFY_EVENT.size <= len(data):
+            _, _, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+            offset += _INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if name.startswith(self.prefix):
+                return True
+        return False
+
+    def start(self, callback):
+        def run():
+            while not self._stop.is_set():
+                ready, _, _ = select.select([self._fd], [], [], 0.5)
+                if not ready:
+                    continue
+                try:
+                    data = os.read(self._fd, 4096)
+                except BlockingIOError:
+                    continue
+                if self._changed(data):
+                    callback()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name='blink1-hotplug', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def default_watcher():
+    """ Best hotplug watcher for this platform: inotify on Linux,
+    otherwise polling hidapi enumeration
+    """
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError) as e:
+            log.debug("inotify unavailable, polling sysfs: %s", e)
+            return PollingWatcher(sysfs_fingerprint)
+    return PollingWatcher(lambda: tuple(
+        sorted(d.get('serial_number') or '' for d in hid_enumerate())))
+
+
+class DeviceRegistry(object):
+    """Cache of connected blink(1)s by serial number, invalidated on hotplug.
+    """
+    def __init__(self, enumerate_func=hid_enumerate, watcher=True,
+                 settle=DEFAULT_SETTLE):
+        """
+        :param enumerate_func: function returning hidapi-style device info
+            dicts (with 'serial_number' and 'path' keys)
+        :param watcher: hotplug watcher with start(callback)/stop(),
+            True for default_watcher(), or None to only refresh on invalidate()
+        :param settle: seconds between enumerations after a hotplug event,
+            repeated until two enumerations agree
+        """
+        self.enumerate_func = enumerate_func
+        self.settle = settle
+        self._lock = threading.RLock()
+        self._devices = None
+        self._unsettled = False  # a hotplug event came since the last settled scan
+        self._known = None  # devices subscribers were last told about
+        self._on_attach = []
+        self._on_detach = []
+        if watcher is True:
+            watcher = default_watcher()
+        self.watcher = watcher
+        if watcher is not None:
+            watcher.start(self._hotplug)
+
+    def close(self):
+        """ Stop watching for hotplug events
+        """
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+
+    def _scan(self):
+        devices = {}
+        for info in self.enumerate_func():
+            devices.setdefault(info.get('serial_number'), info)
+        return devices
+
+    def _settled_scan(self):
+        # enumerate until two enumerations agree, so a device that is half
+        # way through attaching is not cached or reported as it looks now
+        devices = self._scan()
+        for i in range(SETTLE_RETRIES):
+            time.sleep(self.settle)
+            again = self._scan()
+            if again == devices:
+                self._unsettled = False
+                return devices
+            devices = again
+        self._unsettled = True  # still changing, scan again on next lookup
+        return devices
+
+    def _hotplug(self):
+        with self._lock:
+            self._unsettled = True
+            if not (self._on_attach or self._on_detach):
+                self._devices = None  # rescan lazily on next lookup
+                return
+            old = self._known if self._known is not None else {}
+            self._devices = self._known = new = self._settled_scan()
+        for serial in new:
+            if serial not in old:
+                self._notify(self._on_attach, serial)
+        for serial in old:
+            if serial not in new:
+                self._notify(self._on_detach, serial)
+
+    @staticmethod
+    def _notify(callbacks, serial):
+        for callback in list(callbacks):
+            try:
+                callback(serial)
+            except Exception:
+                log.exception("blink1 hotplug callback failed")
+
+    def invalidate(self):
+        """ Forget the cached enumeration, e.g. after a failed open.
+        Hotplug callbacks still fire only for devices that changed since
+        they last fired.
+        """
+        with self._lock:
+            self._devices = None
+
+    def refresh(self):
+        """ Enumerate now, firing attach/detach callbacks for any changes
+        """
+        self._hotplug()
+        self.devices()
+
+    def devices(self):
+        """ Connected blink(1)s
+        :return: dict of serial number to hidapi device info dict
+        """
+        with self._lock:
+            if self._devices is None or self._unsettled:
+                self._devices = self._settled_scan() if self._unsettled else self._scan()
+            return self._devices
+
+    def serials(self):
+        """ Serial numbers of connected blink(1)s
+        """
+        return list(self.devices())
+
+    def lookup(self, serial_number=None):
+        """ Device info for a serial number, or the first device
+        :return: hidapi device info dict, or None if not connected
+        """
+        devices = self.devices()
+        if serial_number is None:
+            return next(iter(devices.values()), None)
+        return devices.get(serial_number)
+
+    def subscribe(self, on_attach=None, on_detach=None):
+        """ Call on_attach(serial)/on_detach(serial) when a blink(1) is
+        plugged in or removed. Callbacks run on the watcher thread.
+        :return: function that unsubscribes again
+        """
+        with self._lock:
+            if not (self._on_attach or self._on_detach):
+                self._known = self.devices()  # baseline to diff against
+            if on_attach:
+                self._on_attach.append(on_attach)
+            if on_detach:
+                self._on_detach.append(on_detach)
+
+        def unsubscribe():
+            with self._lock:
+                if on_attach in self._on_attach:
+                    self._on_attach.remove(on_attach)
+                if on_detach in self._on_detach:
+                    self._on_detach.remove(on_detach)
+        return unsubscribe
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+render.py -- animate a fleet of blink(1)s frame by frame
+
+A frame holds the color of every LED of every device, shape
+(devices, leds, 3): a bytes-like buffer of r,g,b values in that order
+(bytes, bytearray, array('B'), C-contiguous uint8 NumPy array, ...) or
+nested sequences. FrameRenderer color corrects a whole frame in one pass,
+sends commands only to devices whose colors changed, and fades each
+change over one frame interval so the devices interpolate between frames:
+
+    from blink1.fleet import Blink1Fleet
+    from blink1.render import FrameRenderer
+
+    with Blink1Fleet() as fleet:
+        renderer = FrameRenderer(fleet, fps=20)
+        renderer.run(chase_frames())  # any iterable of frames
+        print(renderer.stats())
+"""
+import time
+
+from .fleet import FleetResult
+from .shadow import NUM_LEDS
+
+
+class FrameRenderer(object):
+    """Renders frames of LED colors onto the devices of a Blink1Fleet
+    """
+    def __init__(self, fleet, fps=30, serials=None, leds=NUM_LEDS):
+        """
+        :param fleet: Blink1Fleet to render on
+        :param fps: target frames per second
+        :param serials: serial numbers in frame order, default fleet order
+        :param leds: LEDs per device in a frame
+        """
+        if fps <= 0:
+            raise ValueError("fps must be positive")
+        self.fleet = fleet
+        self.serials = list(fleet) if serials is None else list(serials)
+        self.leds = leds
+        self.interval = 1.0 / fps
+        self.fade_millis = int(round(self.interval * 1000))
+        self.frame_size = len(self.serials) * leds * 3
+        self._last = [None] * len(self.serials)  # corrected bytes last sent
+        self.frames = 0
+        self.dispatched = 0
+        self.unchanged = 0
+        self.late = 0
+        self.errors = 0
+
+    def _flatten(self, frame):
+        try:
+            view = memoryview(frame)
+        except TypeError:
+            view = memoryview(bytes(c for device in frame for rgb in device for c in rgb))
+        if view.itemsize != 1:
+            raise ValueError("frame must be a buffer of 8-bit values")
+        view = view.cast('B')
+        if len(view) != self.frame_size:
+            raise ValueError("frame must have %d values (%d devices x %d leds x 3), not %d" %
+                             (self.frame_size, len(self.serials), self.leds, len(view)))
+        return view
+
+    def correct(self, frame):
+        """ Color correct a frame with the devices' gamma and white point
+        :return: corrected frame as bytes
+        :raises: ValueError: if the frame has the wrong size
+        """
+        view = self._flatten(frame)
+        devices = [self.fleet[s] for s in self.serials]
+        tables = set(b1.cc.tables for b1 in devices)
+        if len(tables) <= 1:
+            # the usual case: the whole fleet shares one correction
+            return devices[0].cc.correct_many(view) if devices else b''
+        stride = self.leds * 3
+        return b''.join(b1.cc.correct_many(view[i * stride:(i + 1) * stride])
+                        for i, b1 in enumerate(devices))
+
+    def render(self, frame):
+        """ Show a frame, sending commands only to devices that changed
+        :param frame: colors of shape (devices, leds, 3), see module docs
+        :return: FleetResult of the devices that were sent commands
+        :raises: ValueError: if the frame has the wrong size
+        """
+        corrected = self.correct(frame)
+        stride = self.leds * 3
+        chunks = {}
+        for i, serial in enumerate(self.serials):
+            chunk = corrected[i * stride:(i + 1) * stride]
+            if chunk == self._last[i]:
+                self.unchanged += 1
+            else:
+                chunks[serial] = (i, chunk)
+        self.frames += 1
+        if not chunks:
+            return FleetResult()
+
+        # map() passes the device only, so look chunks up by device
+        by_device = dict((self.fleet[s], v) for s, v in chunks.items())
+        result = self.fleet.map(lambda b1: self._send(b1, *by_device[b1]),
+                                target=list(chunks))
+        self.dispatched += len(result.results)
+        self.errors += len(result.errors)
+        return result
+
+    def _send(self, b1, index, chunk):
+        self._last[index] = None  # resend next frame if this fails
+        millis = self.fade_millis
+        first = chunk[0:3]
+        if chunk == first * self.leds:
+            b1.fade_to_rgb_uncorrected(millis, first[0], first[1], first[2], 0)
+        else:
+            for n in range(self.leds):
+                r, g, b = chunk[n * 3:n * 3 + 3]
+                b1.fade_to_rgb_uncorrected(millis, r, g, b, n + 1)
+        self._last[index] = chunk
+
+    def invalidate(self):
+        """ Forget what was sent, so the next frame goes to every device
+        """
+        self._last = [None] * len(self.serials)
+
+    def run(self, frames, max_frames=None):
+        """ Render frames at the target frame rate, against absolute
+        deadlines so the animation does not drift. Frames that fall a
+        whole interval behind are skipped to catch up.
+        :param frames: iterable of frames
+        :param max_frames: stop after this many frames
+        :return: stats()
+        """
+        deadline = time.monotonic()
+        count = 0
+        for frame in frames:
+            if max_frames is not None and count >= max_frames:
+                break
+            count += 1
+            now = time.monotonic()
+            if now - deadline >= self.interval:
+                self.late += 1
+                deadline += self.interval
+                continue
+            self.render(frame)
+            deadline += self.interval
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return self.stats()
+
+    def stats(self):
+        """ Counts of frames rendered and skipped, and of device updates
+        sent, skipped as unchanged and failed
+        """
+        return {'frames': self.frames, 'late': self.late,
+                'dispatched': self.dispatched, 'unchanged': self.unchanged,
+                'errors': self.errors}
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+scheduler.py -- one timer thread running callbacks at absolute deadlines
+
+Deadlines are time.monotonic() values kept in a heap, so any number of
+timed jobs (pattern steps, watchdog re-arms, ...) share a single thread,
+and a job that reschedules itself at `last deadline + period` does not
+drift however late individual callbacks run.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# seconds after which a callback that found its device busy tries again
+BUSY_RETRY = 0.002
+
+
+class _NoLock(object):
+    """Stands in for the lock of a duck-typed device without one
+    """
+    def acquire(self, blocking=True, timeout=-1):
+        return True
+
+    def release(self):
+        pass
+
+
+_NO_LOCK = _NoLock()
+
+
+def device_lock(device):
+    """ The lock a timer callback holds while driving a device the caller
+    also uses, e.g. Blink1.lock, or a no-op one for duck-typed devices
+    without a lock. Callbacks take it with acquire(blocking=False) and
+    reschedule themselves BUSY_RETRY later if it is held: blocking would
+    hold up every other timer on the thread.
+    """
+    lock = getattr(device, 'lock', None)
+    return _NO_LOCK if lock is None else lock
+
+
+class Timer(object):
+    """Handle to a scheduled callback
+    """
+    __slots__ = ('deadline', 'func', 'args', 'cancelled')
+
+    def __init__(self, deadline, func, args):
+        self.deadline = deadline
+        self.func = func
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """ Do not run the callback, if it has not run yet
+        """
+        self.cancelled = True
+
+
+class Scheduler(object):
+    """Runs callbacks at monotonic deadlines on one background thread.
+    Callbacks should be short; a slow one delays all others.
+    """
+    def __init__(self, name='blink1-scheduler'):
+        """
+        :param name: name of the timer thread
+        """
+        self.name = name
+        self._heap = []
+        self._seq = itertools.count()  # tie breaker, keeps FIFO order
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def call_at(self, deadline, func, *args):
+        """ Run func(*args) on the timer thread at deadline
+        :param deadline: time.monotonic() value
+        :return: Timer, to cancel() it
+        """
+        timer = Timer(deadline, func, args)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("scheduler is closed")
+            heapq.heappush(self._heap, (deadline, next(self._seq), timer))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            elif self._heap[0][2] is timer:
+                self._cond.notify()  # new earliest deadline
+        return timer
+
+    def call_later(self, delay, func, *args):
+        """ Run func(*args) on the timer thread after delay seconds
+        :return: Timer, to cancel() it
+        """
+        return self.call_at(time.monotonic() + delay, func, *args)
+
+    def _run(self):
+        heap = self._heap
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return
+                    if not heap:
+                        self._cond.wait()
+                        continue
+                    deadline, _, timer = heap[0]
+                    if timer.cancelled:
+                        heapq.heappop(heap)
+                        continue
+                    delay = deadline - time.monotonic()
+                    if delay > 0:
+                        self._cond.wait(delay)
+                        continue
+                    heapq.heappop(heap)
+                    break
+            try:
+                timer.func(*timer.args)
+            except Exception:
+                log.exception("blink1 scheduled callback failed")
+
+    def close(self):
+        """ Stop the timer thread, dropping callbacks not yet run
+        """
+        with self._cond:
+            self._closed = True
+            del self._heap[:]
+            self._cond.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
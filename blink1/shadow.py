@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+shadow.py -- last known state of a blink(1), to skip redundant commands
+
+A ShadowState remembers what was last commanded to each LED (color after
+gamma correction and fade time), the 'current LED' used for pattern
+writes, and whether the device may be changing its LEDs on its own
+(pattern playing, servertickle armed). Blink1 consults it so that a fade
+to the color an LED already has, or a set_ledn to the LED already
+selected, is not sent at all. A fade still running on the device is only
+redundant if it has the same fade time, as resending the color with
+another fade time changes how the LED gets there.
+"""
+import time
+
+NUM_LEDS = 2
+
+
+class ShadowState(object):
+    """Per-LED shadow of the state commanded to one blink(1).
+    """
+    def __init__(self, num_leds=NUM_LEDS):
+        """
+        :param num_leds: number of addressable LEDs (ledn 1..num_leds)
+        """
+        self.num_leds = num_leds
+        self.leds = [None] * (num_leds + 1)  # (r,g,b,fade_millis) by ledn
+        self.fade_ends = [0.0] * (num_leds + 1)  # time.monotonic() fades finish
+        self.ledn = None  # current LED for pattern line writes
+        self.playing = None  # True/False, None if unknown
+        self.tickle = False  # servertickle armed, device may take over
+        self.skipped = 0
+
+    def _targets(self, ledn):
+        if ledn == 0:
+            return range(1, self.num_leds + 1)
+        return (ledn,)
+
+    def invalidate(self):
+        """ Forget everything, e.g. after a reconnect or failed write
+        """
+        self.leds = [None] * (self.num_leds + 1)
+        self.ledn = None
+        self.playing = None
+
+    def color(self, ledn):
+        """ Last commanded (r,g,b) of an LED, or None if unknown
+        """
+        state = self.leds[ledn] if 0 < ledn <= self.num_leds else None
+        return state[:3] if state else None
+
+    def fade_is_current(self, r, g, b, ledn=0, fade_millis=0):
+        """ True if fading ledn to (r,g,b) would not change the device: the
+        LED has that color, or is fading to it with the same fade time
+        """
+        if self.tickle or self.playing is not False:
+            return False
+        if ledn > self.num_leds:
+            return False
+        now = None
+        for n in self._targets(ledn):
+            state = self.leds[n]
+            if state is None or state[0] != r or state[1] != g or state[2] != b:
+                return False
+            if state[3] != fade_millis:
+                if now is None:
+                    now = time.monotonic()
+                if now < self.fade_ends[n]:
+                    return False
+        return True
+
+    def set_fade(self, r, g, b, fade_millis, ledn=0):
+        """ Record a fade command sent to the device, which stops pattern play
+        """
+        self.playing = False
+        if ledn > self.num_leds:
+            return
+        fade_end = time.monotonic() + fade_millis / 1000.0 if fade_millis else 0.0
+        for n in self._targets(ledn):
+            self.leds[n] = (r, g, b, fade_millis)
+            self.fade_ends[n] = fade_end
+
+    def set_playing(self, playing):
+        """ Record a play/stop: LEDs are now driven (or left) by the pattern
+        """
+        self.leds = [None] * (self.num_leds + 1)
+        self.playing = playing
+
+    def set_tickle(self, enable):
+        """ Record servertickle state: while armed the device may start
+        playing its pattern at any time
+        """
+        self.tickle = bool(enable)
+        self.set_playing(None)
@@ -1,15 +1,53 @@
 # -*- coding: utf-8 -*-
-import click
-from blink1.blink1 import blink1
+import sys
 
+from blink1.cli import parse_options
 
-@click.command()
-@click.option('--color', default='white', help='What colour to set the Blink(1)')
-@click.option('--fade', default=0.2, help='Fade time in seconds')
-def shine(color, fade):
+DEFAULTS = {'color': 'white', 'fade': 0.2}
+
+
+def run(color, fade):
+    from blink1.client import connect
+    client = connect()  # blink1d, if running, has the device open already
+    if client is not None:
+        with client:
+            client.fade_to_color(fade * 1000.0, color)
+        return
+
+    from blink1.blink1 import blink1
     with blink1(switch_off=False) as b1:
         b1.fade_to_color(fade * 1000.0, color)
 
 
+def make_command():
+    """ The click command, built on demand since importing click is slow
+    """
+    import click
+
+    @click.command()
+    @click.option('--color', default=DEFAULTS['color'], help='What colour to set the Blink(1)')
+    @click.option('--fade', default=DEFAULTS['fade'], help='Fade time in seconds')
+    def shine(color, fade):
+        run(color, fade)
+
+    return shine
+
+
+def main(argv=None):
+    """ blink1-shine entry point, skips click for simple command lines
+    """
+    options = parse_options(sys.argv[1:] if argv is None else argv, DEFAULTS)
+    if options is None:
+        return make_command()(args=argv)
+    run(**options)
+
+
+def __getattr__(name):
+    # blink1.shine.shine is still the click command
+    if name == 'shine':
+        return make_command()
+    raise AttributeError(name)
+
+
 if __name__ == '__main__':
-    shine()
+    main()
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+simulator.py -- in-memory stand-in for a blink(1) hid.device
+
+Blink1Simulator has the same methods Blink1 uses on a hidapi device and
+emulates enough of the blink(1) firmware (LED colors, pattern RAM, play
+state, version, servertickle) to exercise the library without hardware:
+
+    from unittest import mock
+    from blink1.blink1 import Blink1
+    from blink1.simulator import Blink1Simulator
+
+    sim = Blink1Simulator(latency=0.001)
+    with mock.patch.object(Blink1, 'find', return_value=sim):
+        b1 = Blink1()
+    b1.fade_to_color(100, 'red')
+    sim.leds[1]  # -> (255, 0, 0)
+"""
+import time
+
+from . import protocol
+from .protocol import REPORT_ID, REPORT_SIZE
+from .patternram import PATTERN_SIZE
+from .shadow import NUM_LEDS
+
+
+class Blink1Simulator(object):
+    """Fake hid.device that answers feature reports like a blink(1) mk2/mk3
+    """
+    def __init__(self, serial_number='SIM00001', version='205',
+                 latency=0.0, response_delay=0.0):
+        """
+        :param serial_number: serial number string to report
+        :param version: firmware version string, e.g. '205'
+        :param latency: seconds each send/get feature report call takes
+        :param response_delay: seconds after a 'v' command before its
+            response can be read (until then the command is echoed back)
+        """
+        self.serial_number = serial_number
+        self.version = version
+        self.latency = latency
+        self.response_delay = response_delay
+        self.connected = True
+        self.reports = []  # copy of every report received, in order
+        self.reads = 0
+        self.leds = [(0, 0, 0)] * (NUM_LEDS + 1)  # index 0 unused, as on device
+        self.pattern = [(0, 0, 0, 0, 0)] * PATTERN_SIZE  # r,g,b,millis,ledn
+        self.ledn = 0
+        self.playing = (0, 0, 0, 0)  # play, start, end, count
+        self.tickle = (0, 0, 0, 0, 0)  # enable, millis, stay_lit, start, end
+        self.saved_pattern = None
+        self._response = bytes(REPORT_SIZE)
+        self._ready_at = 0.0
+
+    def open(self, vendor_id=None, product_id=None, serial_number=None):
+        self.connected = True
+
+    def close(self):
+        self.connected = False
+
+    def get_serial_number_string(self):
+        return self.serial_number
+
+    def disconnect(self):
+        """ Act as if the device was unplugged: all further I/O fails
+        """
+        self.connected = False
+
+    def send_feature_report(self, buf):
+        if self.latency:
+            time.sleep(self.latency)
+        if not self.connected:
+            return -1
+        data = bytes(buf)
+        if len(data) != REPORT_SIZE or data[0] != REPORT_ID:
+            return -1
+        self.reports.append(data)
+        self._response = data
+        self._handle(data)
+        return REPORT_SIZE
+
+    def get_feature_report(self, report_id, size):
+        if self.latency:
+            time.sleep(self.latency)
+        if not self.connected:
+            raise OSError("read error")
+        self.reads += 1
+        if self._response[1] == protocol.CMD_GET_VERSION:
+            if time.monotonic() >= self._ready_at:
+                return list(self._response[:3]) + \
+                    [ord(self.version[0]), ord(self.version[2])] + [0] * 4
+        return list(self._response[:size])
+
+    def _handle(self, data):
+        cmd, args = protocol.decode_report(data)
+        if cmd == 'c':
+            r, g, b, _, ledn = args
+            targets = range(1, NUM_LEDS + 1) if ledn == 0 else [ledn]
+            for n in targets:
+                if n <= NUM_LEDS:
+                    self.leds[n] = (r, g, b)
+        elif cmd == 'l':
+            self.ledn = args[0]
+        elif cmd == 'P':
+            r, g, b, millis, pos = args
+            if pos < PATTERN_SIZE:
+                self.pattern[pos] = (r, g, b, millis, self.ledn)
+        elif cmd == 'R':
+            pos = args[5]
+            r, g, b, millis, ledn = self.pattern[pos % PATTERN_SIZE]
+            ticks = millis // 10
+            self._response = bytes([REPORT_ID, data[1], r, g, b,
+                                    ticks >> 8, ticks & 0xff, ledn, 0])
+        elif cmd == 'p':
+            self.playing = args[:4]
+        elif cmd == 'D':
+            self.tickle = args
+        elif cmd == 'W':
+            self.saved_pattern = list(self.pattern)
+        elif cmd == 'v':
+            self._ready_at = time.monotonic() + self.response_delay
+
+    def commands(self):
+        """ List of the command characters received so far, e.g. ['l', 'P']
+        """
+        return [chr(r[1]) for r in self.reports]
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+trace.py -- record and replay the HID reports sent to and read from a blink(1)
+
+A trace file is a 24-byte header followed by fixed 18-byte records, one per
+report: nanoseconds since the trace started (uint64), kind (0 write,
+1 read) and the 9-byte report. Recording packs records into a preallocated
+buffer that is written to the file in large blocks, so the write path pays
+for one struct.pack_into() and a slice copy:
+
+    b1.start_trace('blink1.trace')
+    ...
+    b1.stop_trace()
+
+Replaying memory-maps the file and sends the same reports to any device
+(hid.device, Blink1Simulator, ...) at the original speed, faster, or as
+fast as possible, to reproduce timing bugs or as a performance corpus:
+
+    from blink1.trace import replay
+    replay('blink1.trace', b1.dev, speed=4)
+
+From the command line:
+python -m blink1.trace dump blink1.trace
+python -m blink1.trace replay blink1.trace [--speed N] [--serial SERIAL]
+"""
+import mmap
+import struct
+import time
+
+from .protocol import REPORT_ID, REPORT_SIZE, format_report
+
+MAGIC = b'BLINK1TR'
+VERSION = 1
+# magic, version, record size, wall clock time the trace started
+HEADER = struct.Struct('<8sHHd4x')
+# nanoseconds since start, kind; the report follows
+RECORD_HEAD = struct.Struct('<QB')
+RECORD_SIZE = RECORD_HEAD.size + REPORT_SIZE
+
+WRITE = 0
+READ = 1
+KIND_NAMES = {WRITE: 'write', READ: 'read'}
+
+DEFAULT_BUFFER_RECORDS = 4096  # records buffered before writing to the file
+
+
+class InvalidTrace(ValueError):
+    """Raised when a file is not a blink(1) trace
+    """
+
+
+class TraceRecorder(object):
+    """Appends reports to a trace file, see Blink1.start_trace().
+    Not safe to use from several threads at once; Blink1 calls it under its lock.
+    """
+    def __init__(self, path, buffer_records=DEFAULT_BUFFER_RECORDS):
+        """
+        :param path: trace file to create, replacing any old one
+        :param buffer_records: records kept in memory between file writes
+        """
+        self.path = path
+        self.records = 0
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, time.time()))
+        self._start = time.perf_counter_ns()
+        self._buf = bytearray(buffer_records * RECORD_SIZE)
+        self._view = memoryview(self._buf)
+        self._end = len(self._buf)
+        self._offset = 0
+        self._pack = RECORD_HEAD.pack_into
+        self._clock = time.perf_counter_ns
+
+    def write(self, report):
+        """ Record a report sent to the device
+        :param report: 9-byte report, bytes-like or a list of ints
+        """
+        offset = self._offset
+        self._pack(self._buf, offset, self._clock() - self._start, WRITE)
+        start = offset + RECORD_HEAD.size
+        self._view[start:start + REPORT_SIZE] = bytes(report)
+        self._offset = offset + RECORD_SIZE
+        if self._offset == self._end:
+            self.flush()
+
+    def read(self, report):
+        """ Record a report read from the device
+        :param report: report as returned by get_feature_report()
+        """
+        offset = self._offset
+        RECORD_HEAD.pack_into(self._buf, offset, time.perf_counter_ns() - self._start, READ)
+        start = offset + RECORD_HEAD.size
+        self._view[start:start + REPORT_SIZE] = \
+            bytes(report[:REPORT_SIZE]).ljust(REPORT_SIZE, b'\0')
+        self._offset = offset + RECORD_SIZE
+        if self._offset == self._end:
+            self.flush()
+
+    def flush(self):
+        """ Write the buffered records to the file
+        """
+        if self._offset:
+            self._file.write(self._view[:self._offset])
+            self.records += self._offset // RECORD_SIZE
+            self._offset = 0
+        self._file.flush()
+
+    def close(self):
+        """ Write the buffered records and close the file
+        """
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+            self._view.release()
+
+
+class TraceReader(object):
+    """Memory-mapped trace file; iterate for (seconds, kind, report) tuples
+    """
+    def __init__(self, path):
+        """
+        :param path: trace file
+        :raises: InvalidTrace: if it is not a trace file
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                raise InvalidTrace("%s: empty file" % path)
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise InvalidTrace("%s: too short" % path)
+        magic, version, record_size, self.started = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+            self.close()
+            raise InvalidTrace("%s: not a version %d blink(1) trace" % (path, VERSION))
+        # ignore a partly written last record
+        self._size = (len(self._map) - HEADER.size) // RECORD_SIZE
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        offset = HEADER.size + i * RECORD_SIZE
+        nanos, kind = RECORD_HEAD.unpack_from(self._map, offset)
+        offset += RECORD_HEAD.size
+        return nanos / 1e9, kind, self._map[offset:offset + REPORT_SIZE]
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self[i]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+
+def replay(path, dev, speed=1.0):
+    """ Send the reports of a trace to a device, with the original timing
+    :param path: trace file
+    :param dev: device with send_feature_report() and get_feature_report(),
+        e.g. Blink1.dev or a Blink1Simulator
+    :param speed: how many times faster than recorded, 0 for no waiting
+    :return: dict with writes, reads, mismatches (reads answered
+        differently than recorded), errors and late_max (seconds)
+    :raises: InvalidTrace: if it is not a trace file
+    """
+    stats = {'writes': 0, 'reads': 0, 'mismatches': 0, 'errors': 0, 'late_max': 0.0}
+    with TraceReader(path) as trace:
+        start = time.monotonic()
+        for seconds, kind, report in trace:
+            if speed:
+                deadline = start + seconds / speed
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                elif -delay > stats['late_max']:
+                    stats['late_max'] = -delay
+            if kind == WRITE:
+                stats['writes'] += 1
+                if dev.send_feature_report(report) != REPORT_SIZE:
+                    stats['errors'] += 1
+            else:
+                stats['reads'] += 1
+                try:
+                    answer = dev.get_feature_report(REPORT_ID, REPORT_SIZE)
+                except (IOError, OSError, ValueError):
+                    stats['errors'] += 1
+                    continue
+                if bytes(answer[:REPORT_SIZE]).ljust(REPORT_SIZE, b'\0') != report:
+                    stats['mismatches'] += 1
+    return stats
+
+
+def dump(path):
+    """ Lines describing each report of a trace
+    :raises: InvalidTrace: if it is not a trace file
+    """
+    with TraceReader(path) as trace:
+        for seconds, kind, report in trace:
+            yield "%12.6f %-5s %s" % (seconds, KIND_NAMES.get(kind, kind), format_report(report))
+
+
+def main(argv=None):
+    """ Dump or replay a trace file
+    """
+    import argparse
+    from .blink1 import Blink1
+
+    parser = argparse.ArgumentParser(prog='python -m blink1.trace',
+                                     description='Dump or replay a blink(1) trace')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('dump', help='print the reports').add_argument('path')
+    replay_parser = sub.add_parser('replay', help='send the reports to a blink(1)')
+    replay_parser.add_argument('path')
+    replay_parser.add_argument('--speed', type=float, default=1.0,
+                               help='times faster than recorded, 0 for no waiting')
+    replay_parser.add_argument('--serial', default=None, help='blink(1) serial number')
+    args = parser.parse_args(argv)
+
+    if args.command == 'dump':
+        for line in dump(args.path):
+            print(line)
+    else:
+        b1 = Blink1(serial_number=args.serial)
+        try:
+            print(replay(args.path, b1.dev, args.speed))
+        finally:
+            b1.close()
+
+
+if __name__ == '__main__':
+    main()
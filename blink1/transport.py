@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+transport.py -- native Linux hidraw transport for blink(1)
+
+By default Blink1 talks to the device through hidapi. On Linux, the
+HidrawTransport here instead opens /dev/hidrawN directly and sends and
+receives feature reports with the HIDIOCSFEATURE/HIDIOCGFEATURE ioctls,
+using preallocated buffers, which skips hidapi's per-call overhead.
+Devices are found by reading HID_ID and HID_UNIQ from sysfs. If the
+transport cannot open a device, Blink1 falls back to hidapi:
+
+    from blink1.blink1 import Blink1
+    from blink1.transport import HidrawTransport
+
+    Blink1.transport = HidrawTransport()
+    b1 = Blink1()  # opened through /dev/hidrawN
+
+A transport is any object with enumerate(vendor_id, product_id) returning
+hidapi-style info dicts and open(vendor_id, product_id, serial_number)
+returning an opened device with the hid.device methods Blink1 uses:
+send_feature_report, get_feature_report, get_serial_number_string, close.
+"""
+import errno
+import os
+
+try:
+    import fcntl
+except ImportError:  # not on Windows
+    fcntl = None
+
+from .protocol import REPORT_SIZE
+
+# <linux/hidraw.h>: _IOC(_IOC_WRITE|_IOC_READ, 'H', nr, len)
+_IOC_READ_WRITE = 3
+_HIDRAW_IOC_TYPE = ord('H')
+_HIDIOCSFEATURE_NR = 0x06
+_HIDIOCGFEATURE_NR = 0x07
+
+
+def _ioc(nr, size):
+    return (_IOC_READ_WRITE << 30) | (size << 16) | (_HIDRAW_IOC_TYPE << 8) | nr
+
+
+def HIDIOCSFEATURE(size):
+    """ ioctl request number to send a feature report of size bytes
+    """
+    return _ioc(_HIDIOCSFEATURE_NR, size)
+
+
+def HIDIOCGFEATURE(size):
+    """ ioctl request number to get a feature report of size bytes
+    """
+    return _ioc(_HIDIOCGFEATURE_NR, size)
+
+
+def parse_uevent(text):
+    """ Parse a sysfs uevent file of KEY=value lines
+    :return: dict
+    """
+    info = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition('=')
+        if sep:
+            info[key] = value
+    return info
+
+
+def hidraw_enumerate(vendor_id, product_id, sysfs_root='/sys', dev_root='/dev'):
+    """ Find hidraw devices with a vendor and product id through sysfs
+    :param sysfs_root: root of sysfs, e.g. a fake tree for tests
+    :param dev_root: directory of the hidraw device nodes
+    :return: list of info dicts with path, vendor_id, product_id and
+        serial_number keys, like hid.enumerate()
+    """
+    class_dir = os.path.join(sysfs_root, 'class', 'hidraw')
+    try:
+        names = sorted(os.listdir(class_dir))
+    except OSError:
+        return []
+    devices = []
+    for name in names:
+        try:
+            with open(os.path.join(class_dir, name, 'device', 'uevent')) as f:
+                uevent = parse_uevent(f.read())
+            _, vid, pid = uevent['HID_ID'].split(':')
+            vid, pid = int(vid, 16), int(pid, 16)
+        except (OSError, KeyError, ValueError):
+            continue
+        if (vid, pid) != (vendor_id, product_id):
+            continue
+        devices.append({
+            'path': os.path.join(dev_root, name),
+            'vendor_id': vid,
+            'product_id': pid,
+            'serial_number': uevent.get('HID_UNIQ', ''),
+            'product_string': uevent.get('HID_NAME', ''),
+        })
+    return devices
+
+
+class HidrawDevice(object):
+    """A /dev/hidrawN node with the hid.device feature report methods
+    """
+    def __init__(self, path, serial_number=None, ioctl=None):
+        """
+        :param path: device node, e.g. '/dev/hidraw3'
+        :param serial_number: serial number from sysfs
+        :param ioctl: ioctl function, default fcntl.ioctl (for tests)
+        """
+        self.path = path
+        self.serial_number = serial_number
+        self._ioctl = ioctl or fcntl.ioctl
+        self._fd = None
+        self._send_buf = bytearray(REPORT_SIZE)
+        self._get_buf = bytearray(REPORT_SIZE)
+        self._send_request = HIDIOCSFEATURE(REPORT_SIZE)
+        self._get_request = HIDIOCGFEATURE(REPORT_SIZE)
+
+    def open(self):
+        self._fd = os.open(self.path, os.O_RDWR)
+        return self
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def fileno(self):
+        return self._fd
+
+    def get_serial_number_string(self):
+        return self.serial_number
+
+    def send_feature_report(self, buf):
+        """ Send a feature report, first byte is the report id
+        :return: number of bytes sent, -1 on error (as hidapi)
+        """
+        if self._fd is None:
+            return -1
+        if len(buf) == REPORT_SIZE:
+            data, request = self._send_buf, self._send_request
+            data[:] = buf
+        else:
+            data, request = bytearray(buf), HIDIOCSFEATURE(len(buf))
+        try:
+            return self._ioctl(self._fd, request, data, True)
+        except OSError:
+            return -1
+
+    def get_feature_report(self, report_id, size):
+        """ Get a feature report
+        :return: the report bytes, report id first
+        :raises: OSError: if the device is gone
+        """
+        if self._fd is None:
+            raise OSError(errno.EBADF, "device not open", self.path)
+        if size == REPORT_SIZE:
+            data, request = self._get_buf, self._get_request
+        else:
+            data, request = bytearray(size), HIDIOCGFEATURE(size)
+        data[0] = report_id
+        n = self._ioctl(self._fd, request, data, True)
+        return bytes(data[:n])
+
+
+class HidrawTransport(object):
+    """Opens blink(1)s as Linux /dev/hidrawN nodes, found through sysfs
+    """
+    def __init__(self, sysfs_root='/sys', dev_root='/dev', ioctl=None):
+        """
+        :param sysfs_root: root of sysfs
+        :param dev_root: directory of the hidraw device nodes
+        :param ioctl: ioctl function, default fcntl.ioctl (for tests)
+        """
+        if ioctl is None and fcntl is None:
+            raise OSError(errno.ENOSYS, "hidraw needs fcntl (Linux)")
+        self.sysfs_root = sysfs_root
+        self.dev_root = dev_root
+        self.ioctl = ioctl
+
+    def enumerate(self, vendor_id, product_id):
+        """ List devices, see hidraw_enumerate()
+        """
+        return hidraw_enumerate(vendor_id, product_id, self.sysfs_root, self.dev_root)
+
+    def open(self, vendor_id, product_id, serial_number=None):
+        """ Open the device with a serial number, or the first one
+        :return: opened HidrawDevice
+        :raises: OSError: if there is no such device or it cannot be opened
+        """
+        for info in self.enumerate(vendor_id, product_id):
+            if serial_number is None or info['serial_number'] == serial_number:
+                return HidrawDevice(info['path'], info['serial_number'],
+                                    ioctl=self.ioctl).open()
+        raise OSError(errno.ENODEV, "no hidraw device %04x:%04x %s" %
+                      (vendor_id, product_id, serial_number or ''))
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+bench_readback -- compare blink(1) readback latency on a simulated device
+
+Runs the old readback (fixed 50 ms sleep before reading the version, all
+32 pattern lines read one by one) against the current one (polling for the
+version answer, reading only the requested lines, caching the version)
+on a Blink1Simulator with a per-report USB latency.
+
+run with:
+python3 -m blink1_bench.bench_readback [latency_ms]
+"""
+import sys
+import time
+
+from unittest import mock
+
+from blink1 import protocol
+from blink1.blink1 import Blink1
+from blink1.simulator import Blink1Simulator
+
+
+def legacy_get_version(b1):
+    b1.write(protocol.encode_get_version(b1._report))
+    time.sleep(.05)
+    return protocol.decode_version(b1.read())
+
+
+def legacy_read_pattern(b1):
+    return [b1.read_pattern_line(i) for i in range(0, 32)]
+
+
+def timed(func, repeat=5):
+    """ Best wall clock time of func() in milliseconds
+    """
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(latency=0.001):
+    sim = Blink1Simulator(latency=latency)
+    with mock.patch.object(Blink1, 'find', return_value=sim):
+        b1 = Blink1()
+
+    def new_get_version():
+        b1._version = None
+        return b1.get_version()
+
+    return {
+        'get_version_legacy_ms': timed(lambda: legacy_get_version(b1)),
+        'get_version_ms': timed(new_get_version),
+        'get_version_cached_ms': timed(b1.get_version),
+        'read_pattern_legacy_ms': timed(lambda: legacy_read_pattern(b1)),
+        'read_pattern_ms': timed(b1.read_pattern),
+        'read_pattern_4_lines_ms': timed(lambda: b1.read_pattern(0, 4)),
+    }
+
+
+if __name__ == '__main__':
+    latency_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    print("simulated USB latency per report: %.1f ms" % latency_ms)
+    for name, ms in run(latency_ms / 1000.0).items():
+        print("  %-26s %8.2f ms" % (name, ms))
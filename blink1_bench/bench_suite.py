@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+"""
+bench_suite -- blink(1) library benchmarks on a simulated device, as JSON
+
+Measures the host side cost of the common operations on a Blink1Simulator
+with a configurable per-report USB latency, so no hardware is needed:
+
+  fade_to_color        commands per second
+  play_pattern         full 32 line upload, and re-upload of an unchanged pattern
+  read_pattern         reading all pattern lines back
+  parse_pattern        legacy parser and compile_pattern(), patterns per second
+  color_correct        ColorCorrect ns per call, per color and per buffered color
+  construct            Blink1() construction time
+  import               importing blink1.blink1 in a new interpreter, in ms
+  metrics_overhead     extra ns per write with Blink1.metrics enabled
+  trace_overhead       extra ns per write while recording a trace
+
+The exit status is 1 if a result is over its fixed budget in BUDGETS, or
+with --baseline, if any benchmark got slower than an earlier JSON run by
+more than --tolerance.
+
+run with:
+python3 -m blink1_bench.bench_suite [--latency MS] [--output FILE]
+                                    [--baseline FILE] [--tolerance PCT]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from unittest import mock
+
+import blink1
+from blink1 import protocol
+from blink1.blink1 import Blink1
+from blink1.metrics import Metrics
+from blink1.pattern import compile_pattern
+from blink1.protocol import REPORT_SIZE
+from blink1.simulator import Blink1Simulator
+
+PATTERN_STR = '10, ' + ', '.join(
+    '#%02x%02x%02x,0.1,%d' % (i * 8, 255 - i * 8, i, i % 3) for i in range(32))
+
+# result keys where bigger is better; the rest are times, where smaller is
+HIGHER_IS_BETTER = ('fade_to_color_cmds_per_s', 'parse_pattern_legacy_per_s',
+                    'compile_pattern_per_s')
+
+# upper limits for results, whatever the baseline
+BUDGETS = {'metrics_overhead_ns': 1000.0}
+
+
+def best_of(func, number=1, repeat=5):
+    """ Best wall clock seconds per call of func(), over repeat runs of
+    number calls each
+    """
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for j in range(number):
+            func()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def open_blink1(latency, **kwargs):
+    sim = Blink1Simulator(latency=latency)
+    with mock.patch.object(Blink1, 'find', return_value=sim):
+        return Blink1(**kwargs)
+
+
+def bench_fade_to_color(latency, count=200):
+    b1 = open_blink1(latency)
+    colors = ['#ff0000', '#0000ff']
+
+    def fades():
+        for i in range(count):
+            b1.fade_to_color(100, colors[i & 1])
+
+    return count / best_of(fades, repeat=3)
+
+
+def bench_play_pattern(latency):
+    b1 = open_blink1(latency)
+    pattern = compile_pattern(PATTERN_STR)
+
+    def upload():
+        b1.pattern_ram.invalidate()
+        b1.play_pattern(pattern)
+
+    full = best_of(upload, repeat=3)
+    b1.play_pattern(pattern)
+    unchanged = best_of(lambda: b1.play_pattern(pattern), repeat=3)
+    return full * 1000, unchanged * 1000
+
+
+def bench_read_pattern(latency):
+    b1 = open_blink1(latency)
+    return best_of(b1.read_pattern, repeat=3) * 1000
+
+
+def bench_parse_pattern(count=200):
+    uncached = compile_pattern.__wrapped__
+    legacy = best_of(lambda: Blink1.parse_pattern(PATTERN_STR), number=count)
+    compiled = best_of(lambda: uncached(PATTERN_STR), number=count)
+    return 1 / legacy, 1 / compiled
+
+
+def bench_color_correct(count=10000):
+    b1 = open_blink1(0.0)
+    cc = b1.cc
+    call = best_of(lambda: cc(200, 100, 50), number=count)
+    color = best_of(lambda: cc.correct_color('#c86432'), number=count)
+    buf = bytes(range(255)) * 4
+    many = best_of(lambda: cc.correct_many(buf), number=100) / (len(buf) // 3)
+    return call * 1e9, color * 1e9, many * 1e9
+
+
+def bench_construct(latency):
+    sim = Blink1Simulator(latency=latency)
+
+    def construct():
+        with mock.patch.object(Blink1, 'find', return_value=sim):
+            Blink1()
+
+    return best_of(construct, number=20) * 1000
+
+
+def bench_import(module='blink1.blink1', repeat=3):
+    """ Cumulative import time of a module from `python -X importtime`, in
+    ms, best of repeat fresh interpreters
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(blink1.__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    best = None
+    for i in range(repeat):
+        out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                             env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True, check=True).stderr
+        for line in out.splitlines():
+            fields = [f.strip() for f in line.split('|')]
+            if len(fields) == 3 and fields[2] == module:
+                ms = int(fields[1]) / 1000.0
+                best = ms if best is None else min(best, ms)
+    return best
+
+
+class NullDevice(object):
+    """Takes every report at once, so only the host side cost is timed
+    """
+    def send_feature_report(self, buf):
+        return REPORT_SIZE
+
+
+def bench_metrics_overhead(count=20000, repeat=7):
+    b1 = open_blink1(0.0, shadow=False)
+    b1.get_serial_number()  # read from the simulator before swapping it out
+    b1.dev = NullDevice()
+    report = protocol.encode_fade_to_rgb(bytearray(REPORT_SIZE), 100, 255, 0, 0)
+    metrics = Metrics()
+
+    def writes():
+        for i in range(count):
+            b1._write(report)
+
+    # alternate the runs, so a slow spell on the machine hits both sides
+    plain = measured = None
+    for i in range(repeat):
+        elapsed = best_of(writes, repeat=1)
+        plain = elapsed if plain is None else min(plain, elapsed)
+        with mock.patch.object(Blink1, 'metrics', metrics):
+            elapsed = best_of(writes, repeat=1)
+        measured = elapsed if measured is None else min(measured, elapsed)
+    return max(0.0, measured - plain) / count * 1e9
+
+
+def bench_trace_overhead(count=20000):
+    b1 = open_blink1(0.0, shadow=False)
+    report = protocol.encode_fade_to_rgb(bytearray(REPORT_SIZE), 100, 255, 0, 0)
+
+    def writes():
+        for i in range(count):
+            b1._write(report)
+
+    plain = best_of(writes, repeat=3)
+    fd, path = tempfile.mkstemp(suffix='.trace')
+    os.close(fd)
+    try:
+        b1.start_trace(path)
+        measured = best_of(writes, repeat=3)
+        b1.stop_trace()
+    finally:
+        os.unlink(path)
+    return max(0.0, measured - plain) / count * 1e9
+
+
+def run(latency=0.0):
+    """ Run all benchmarks
+    :param latency: simulated USB latency per report, in seconds
+    :return: dict of results
+    """
+    upload_ms, reupload_ms = bench_play_pattern(latency)
+    legacy_per_s, compiled_per_s = bench_parse_pattern()
+    call_ns, color_ns, many_ns = bench_color_correct()
+    return {
+        'fade_to_color_cmds_per_s': bench_fade_to_color(latency),
+        'play_pattern_upload_ms': upload_ms,
+        'play_pattern_unchanged_ms': reupload_ms,
+        'read_pattern_ms': bench_read_pattern(latency),
+        'parse_pattern_legacy_per_s': legacy_per_s,
+        'compile_pattern_per_s': compiled_per_s,
+        'color_correct_call_ns': call_ns,
+        'color_correct_color_ns': color_ns,
+        'color_correct_many_ns': many_ns,
+        'construct_ms': bench_construct(latency),
+        'import_ms': bench_import(),
+        'metrics_overhead_ns': bench_metrics_overhead(),
+        'trace_overhead_ns': bench_trace_overhead(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """ Benchmarks that got worse than baseline by more than tolerance
+    :param tolerance: allowed slowdown as a fraction, e.g. 0.2
+    :return: dict of name: (baseline value, new value)
+    """
+    regressions = {}
+    for name, old in baseline.items():
+        new = results.get(name)
+        if new is None or not old:
+            continue
+        if name in HIGHER_IS_BETTER:
+            worse = new < old * (1 - tolerance)
+        else:
+            worse = new > old * (1 + tolerance)
+        if worse:
+            regressions[name] = (old, new)
+    return regressions
+
+
+def over_budget(results, budgets=BUDGETS):
+    """ Results over their budget
+    :return: dict of name: (budget, value)
+    """
+    return dict((name, (limit, results[name])) for name, limit in budgets.items()
+                if results.get(name) is not None and results[name] > limit)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="simulated USB latency per report, in ms")
+    parser.add_argument('--output', help="write JSON results to this file")
+    parser.add_argument('--baseline', help="JSON results to compare against")
+    parser.add_argument('--tolerance', type=float, default=20.0,
+                        help="allowed slowdown against baseline, in percent")
+    args = parser.parse_args(argv)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'latency_ms': args.latency,
+        'results': run(args.latency / 1000.0),
+        'budgets': BUDGETS,
+    }
+    report['over_budget'] = dict((k, {'budget': limit, 'value': value})
+                                 for k, (limit, value) in over_budget(report['results']).items())
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(report['results'], baseline, args.tolerance / 100.0)
+        report['regressions'] = dict((k, {'baseline': old, 'new': new})
+                                     for k, (old, new) in regressions.items())
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+    return 1 if report['over_budget'] or report.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""
+demo_fleet -- demo of blink1 library, controlling all blink(1) devices at once
+
+"""
+
+import time,sys
+from blink1.fleet import Blink1Fleet
+
+fleet = Blink1Fleet()
+if not len(fleet):
+    print("no blink1 found")
+    sys.exit()
+print("blink(1) devices opened: " + ','.join(fleet))
+
+# tag the first device so it can be addressed on its own
+first = list(fleet)[0]
+fleet.tag('first', first)
+
+print("  all green...")
+fleet.fade_to_color(300, 'green')
+time.sleep(1)
+print("  first one red...")
+fleet.fade_to_color(300, 'red', target='first')
+time.sleep(1)
+
+print("  reading patterns...")
+result = fleet.read_pattern()
+for serial, pattern in result.results.items():
+    print("    %s: %s" % (serial, pattern[0]))
+for serial, err in result.errors.items():
+    print("    %s failed: %s" % (serial, err))
+
+print("closing.")
+fleet.off()
+fleet.close()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+"""
+demo_keepalive -- demo of blink1 library servertickle keepalive scheduler
+
+"""
+import sys
+import time
+from blink1.blink1 import Blink1
+from blink1.keepalive import KeepaliveScheduler
+
+try:
+    blink1 = Blink1()
+except:
+    print("no blink1 found")
+    sys.exit()
+print("blink(1) found")
+
+healthy = [True]
+
+print("setting blink(1) green")
+blink1.fade_to_color(100, 'green')
+
+keepalive = KeepaliveScheduler()
+keepalive.add(blink1, timeout_millis=5000, stay_lit=True, check=lambda: healthy[0])
+print("keeping servertickle armed for 10 seconds")
+time.sleep(10)
+
+print("health check failing, blink1 will play its pattern in 5 seconds")
+healthy[0] = False
+time.sleep(10)
+print(keepalive.stats())
+
+print("Disabling servertickle")
+keepalive.close()
+blink1.close()
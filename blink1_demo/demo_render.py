@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+"""
+demo_render -- demo of blink1 library, a red "chase" across all blink(1) devices
+
+"""
+
+import sys
+from blink1.fleet import Blink1Fleet
+from blink1.render import FrameRenderer
+
+fleet = Blink1Fleet()
+if not len(fleet):
+    print("no blink1 found")
+    sys.exit()
+print("blink(1) devices opened: " + ','.join(fleet))
+
+num_leds = len(fleet) * 2
+
+
+def chase(cycles):
+    for i in range(cycles * num_leds):
+        frame = bytearray(num_leds * 3)
+        frame[(i % num_leds) * 3] = 255
+        yield frame
+
+
+renderer = FrameRenderer(fleet, fps=10)
+print("  chasing...")
+print(renderer.run(chase(5)))
+
+print("closing.")
+fleet.off()
+fleet.close()
@@ -0,0 +1,68 @@
+import asyncio
+import unittest
+
+import mock
+from blink1.aio import AsyncBlink1, blink1
+from blink1.blink1 import Blink1, Blink1ConnectionFailed
+from blink1.simulator import Blink1Simulator
+
+
+class TestAsyncBlink1(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = Blink1Simulator(version='204')
+        patcher = mock.patch.object(Blink1, 'find', return_value=self.sim)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_context_manager(self):
+        async def main():
+            async with blink1(gamma=(1, 1, 1)) as b1:
+                await b1.fade_to_color(0, 'teal')
+                self.assertEqual(self.sim.leds[1], (0, 128, 128))
+                self.assertEqual(await b1.get_version(), '204')
+                self.assertEqual(await b1.get_serial_number(), 'SIM00001')
+        asyncio.run(main())
+        self.assertEqual(self.sim.leds[1], (0, 0, 0))
+        self.assertFalse(self.sim.connected)
+
+    def test_read_pattern(self):
+        async def main():
+            b1 = await AsyncBlink1.open(gamma=(1, 1, 1))
+            await b1.write_pattern_line(300, '#102030', 3)
+            pattern = await b1.read_pattern()
+            await b1.close()
+            return pattern
+        pattern = asyncio.run(main())
+        self.assertEqual(len(pattern), 32)
+        self.assertEqual(pattern[3], (16, 32, 48, 300))
+
+    def test_play_pattern_local_cancel(self):
+        async def main():
+            async with blink1(switch_off=False, gamma=(1, 1, 1)) as b1:
+                task = b1.play_pattern_local('0, #ff0000,0.01,0, #0000ff,0.01,0')
+                await asyncio.sleep(0.05)
+                self.assertFalse(task.done())
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+        asyncio.run(main())
+        self.assertGreater(self.sim.commands().count('c'), 2)
+
+    def test_play_pattern_local_count(self):
+        async def main():
+            async with blink1(switch_off=False) as b1:
+                await b1.play_pattern_local('2, #ff0000,0.0,0, #0000ff,0.0,0')
+        asyncio.run(main())
+        self.assertEqual(self.sim.commands(), ['c'] * 4)
+
+    def test_open_failure(self):
+        async def main():
+            with mock.patch.object(Blink1, 'find', side_effect=Blink1ConnectionFailed):
+                await AsyncBlink1.open()
+        with self.assertRaises(Blink1ConnectionFailed):
+            asyncio.run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import threading
+import time
+import unittest
+
+import mock
+from blink1 import protocol
+from blink1.batch import optimize
+from blink1.blink1 import Blink1, Blink1ConnectionFailed
+from blink1.simulator import Blink1Simulator
+
+
+def fade(r, g, b, ledn=0, millis=100):
+    return bytes(protocol.encode_fade_to_rgb(bytearray(9), millis, r, g, b, ledn))
+
+
+def ledn(n):
+    return bytes(protocol.encode_set_ledn(bytearray(9), n))
+
+
+def line(pos, r=1, g=2, b=3):
+    return bytes(protocol.encode_write_pattern_line(bytearray(9), 100, r, g, b, pos))
+
+
+def play():
+    return bytes(protocol.encode_play(bytearray(9), True, 0, 0, 0))
+
+
+class TestOptimize(unittest.TestCase):
+
+    def test_overwritten_fades_dropped(self):
+        self.assertEqual(optimize([fade(1, 0, 0, 1), fade(2, 0, 0, 1)]), [fade(2, 0, 0, 1)])
+        self.assertEqual(optimize([fade(1, 0, 0, 1), fade(2, 0, 0, 2), fade(3, 0, 0, 0)]),
+                         [fade(3, 0, 0, 0)])
+        # an all-LED fade is only dropped once every LED is refaded
+        self.assertEqual(optimize([fade(1, 0, 0, 0), fade(2, 0, 0, 1)]),
+                         [fade(1, 0, 0, 0), fade(2, 0, 0, 1)])
+        self.assertEqual(optimize([fade(1, 0, 0, 0), fade(2, 0, 0, 1), fade(3, 0, 0, 2)]),
+                         [fade(2, 0, 0, 1), fade(3, 0, 0, 2)])
+
+    def test_per_led_fades_merged(self):
+        self.assertEqual(optimize([fade(9, 8, 7, 1), fade(9, 8, 7, 2)]), [fade(9, 8, 7, 0)])
+        # different fade times are not merged
+        self.assertEqual(len(optimize([fade(9, 8, 7, 1), fade(9, 8, 7, 2, millis=500)])), 2)
+
+    def test_set_ledn(self):
+        self.assertEqual(optimize([ledn(1), ledn(2), line(0)]), [ledn(2), line(0)])
+        self.assertEqual(optimize([ledn(1), line(0), ledn(1), line(1)]),
+                         [ledn(1), line(0), line(1)])
+        # the last set_ledn still changes the device's state
+        self.assertEqual(optimize([ledn(1), line(0), ledn(2)]), [ledn(1), line(0), ledn(2)])
+        self.assertEqual(optimize([ledn(1), line(0), ledn(2), play(), ledn(1), line(1)]),
+                         [ledn(1), line(0), ledn(2), play(), ledn(1), line(1)])
+
+    def test_pattern_line_rewritten(self):
+        self.assertEqual(optimize([line(3, 1), line(4), line(3, 9)]), [line(4), line(3, 9)])
+
+    def test_barrier(self):
+        reports = [fade(1, 0, 0, 1), line(0), play(), fade(2, 0, 0, 1), line(0)]
+        self.assertEqual(optimize(reports), reports)
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = Blink1Simulator()
+        patcher = mock.patch.object(Blink1, 'find', return_value=self.sim)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.b1 = Blink1(gamma=(1, 1, 1), shadow=False)
+
+    def test_batch(self):
+        with self.b1.batch() as batch:
+            self.b1.fade_to_rgb(100, 255, 0, 0, 1)
+            self.b1.fade_to_rgb(100, 0, 255, 0, 2)
+            self.b1.fade_to_rgb(100, 0, 0, 255)
+            self.b1.write_pattern_line(100, '#ff0000', 0, 1)
+            self.b1.write_pattern_line(100, '#00ff00', 1, 1)
+            self.b1.write_pattern_line(100, '#0000ff', 0, 2)
+            self.b1.play()
+            self.assertEqual(self.sim.reports, [])
+        self.assertEqual(self.sim.commands(), ['c', 'l', 'P', 'l', 'P', 'p'])
+        self.assertEqual(batch.stats(), {'recorded': 10, 'sent': 6, 'saved': 4, 'discarded': 0})
+        self.assertEqual(self.sim.leds[1], (0, 0, 255))
+        self.assertEqual(self.sim.pattern[0], (0, 0, 255, 100, 2))
+        self.assertIsNone(self.b1._batch)
+        self.b1.off()
+        self.assertEqual(len(self.sim.reports), 7)
+
+    def test_read_flushes(self):
+        with self.b1.batch() as batch:
+            self.b1.fade_to_rgb(0, 1, 2, 3)
+            self.assertEqual(self.b1.get_version(), '205')
+            self.assertEqual(self.sim.commands(), ['c', 'v'])
+            self.b1.fade_to_rgb(0, 4, 5, 6)
+        self.assertEqual(self.sim.commands(), ['c', 'v', 'c'])
+        self.assertEqual(batch.sent, 3)
+
+    def test_nested(self):
+        with self.b1.batch() as outer:
+            with self.b1.batch() as inner:
+                self.b1.fade_to_rgb(0, 1, 2, 3)
+            self.assertIs(inner, outer)
+            self.assertEqual(self.sim.reports, [])
+        self.assertEqual(self.sim.commands(), ['c'])
+
+    def test_exception_discards(self):
+        b1 = Blink1(gamma=(1, 1, 1))
+        with self.assertRaises(KeyError):
+            with b1.batch() as batch:
+                b1.fade_to_rgb(0, 1, 2, 3)
+                raise KeyError()
+        self.assertEqual(self.sim.reports, [])
+        self.assertEqual(batch.discarded, 1)
+        # the shadow must not believe the fade was sent
+        self.assertTrue(b1.fade_to_rgb(0, 1, 2, 3))
+        self.assertEqual(self.sim.commands(), ['c'])
+
+    def test_other_thread_not_recorded(self):
+        started = threading.Event()
+
+        def other():
+            started.set()
+            self.b1.fade_to_rgb(0, 9, 9, 9, 2)
+
+        thread = threading.Thread(target=other)
+        with self.assertRaises(KeyError):
+            with self.b1.batch() as batch:
+                self.b1.fade_to_rgb(0, 1, 2, 3, 1)
+                thread.start()
+                self.assertTrue(started.wait(1))
+                time.sleep(0.02)
+                self.assertEqual(self.sim.reports, [])
+                raise KeyError()
+        thread.join()
+        # the other thread's fade waited for the block and was not discarded
+        self.assertEqual(batch.recorded, 1)
+        self.assertEqual(batch.discarded, 1)
+        self.assertEqual(self.sim.commands(), ['c'])
+        self.assertEqual(self.sim.leds[2], (9, 9, 9))
+
+    def test_failed_flush(self):
+        with self.assertRaises(Blink1ConnectionFailed):
+            with self.b1.batch() as batch:
+                self.b1.fade_to_rgb(0, 1, 2, 3)
+                self.b1.play()
+                self.sim.disconnect()
+        self.assertEqual(batch.discarded, 2)
+        self.assertIsNone(self.b1._batch)
+
+
+if __name__ == '__main__':
+    unittest.main()
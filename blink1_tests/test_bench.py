@@ -0,0 +1,32 @@
+import unittest
+
+from blink1_bench import bench_suite
+
+
+class TestBenchSuite(unittest.TestCase):
+
+    def test_compare(self):
+        baseline = {'fade_to_color_cmds_per_s': 1000.0, 'read_pattern_ms': 10.0,
+                    'construct_ms': 1.0}
+        results = {'fade_to_color_cmds_per_s': 700.0, 'read_pattern_ms': 11.0,
+                   'construct_ms': 2.0}
+        self.assertEqual(bench_suite.compare(results, baseline, 0.2), {
+            'fade_to_color_cmds_per_s': (1000.0, 700.0),
+            'construct_ms': (1.0, 2.0),
+        })
+
+    def test_over_budget(self):
+        self.assertEqual(bench_suite.over_budget({'metrics_overhead_ns': 1500.0}),
+                         {'metrics_overhead_ns': (1000.0, 1500.0)})
+        self.assertEqual(bench_suite.over_budget({'metrics_overhead_ns': 600.0}), {})
+        self.assertEqual(bench_suite.over_budget({}), {})
+
+    def test_run(self):
+        results = bench_suite.run(latency=0.0)
+        self.assertIn('fade_to_color_cmds_per_s', results)
+        for name, value in results.items():
+            self.assertGreaterEqual(value, 0, name)
+
+
+if __name__ == '__main__':
+    unittest.main()
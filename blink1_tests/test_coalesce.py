@@ -0,0 +1,166 @@
+import threading
+import time
+import unittest
+
+import mock
+from blink1 import protocol
+from blink1.blink1 import Blink1, Blink1ConnectionFailed
+from blink1.coalesce import CoalescingWriter
+from blink1.simulator import Blink1Simulator
+
+
+def fade(r, ledn=0):
+    return protocol.encode_fade_to_rgb(bytearray(protocol.REPORT_SIZE), 0, r, 0, 0, ledn)
+
+
+class TestCoalescingWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.sent = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def send(self, report):
+        self.gate.wait()
+        self.sent.append(report)
+
+    def test_newest_fade_per_led_wins(self):
+        self.gate.clear()
+        writer = CoalescingWriter(self.send)
+        writer.submit(fade(1, 1))
+        time.sleep(0.05)  # first report is now blocked in send
+        for r in range(2, 10):
+            writer.submit(fade(r, 1))
+        writer.submit(fade(20, 2))
+        self.gate.set()
+        self.assertTrue(writer.flush(2))
+        writer.close()
+        self.assertEqual([(r[2], r[7]) for r in self.sent], [(1, 1), (9, 1), (20, 2)])
+        stats = writer.stats()
+        self.assertEqual(stats['submitted'], 10)
+        self.assertEqual(stats['sent'], 3)
+        self.assertEqual(stats['coalesced'], 7)
+
+    def test_all_leds_fade_supersedes_and_barriers_keep_order(self):
+        self.gate.clear()
+        writer = CoalescingWriter(self.send)
+        writer.submit(fade(1, 1))
+        time.sleep(0.05)
+        writer.submit(fade(2, 1))
+        writer.submit(fade(3, 2))
+        writer.submit(fade(4, 0))
+        writer.submit(protocol.encode_play(bytearray(9), True))
+        writer.submit(fade(5, 0))
+        self.gate.set()
+        writer.close()
+        self.assertEqual([chr(r[1]) + str(r[2]) for r in self.sent],
+                         ['c1', 'c4', 'p1', 'c5'])
+        self.assertEqual(writer.stats()['coalesced'], 2)
+
+    def test_drops_oldest_fade_when_full(self):
+        self.gate.clear()
+        writer = CoalescingWriter(self.send, max_pending=2)
+        writer.submit(fade(1, 1))
+        time.sleep(0.05)
+        writer.submit(fade(2, 1))
+        writer.submit(protocol.encode_play(bytearray(9), True))
+        writer.submit(fade(3, 1))
+        self.gate.set()
+        writer.close()
+        self.assertEqual([chr(r[1]) + str(r[2]) for r in self.sent], ['c1', 'p1', 'c3'])
+        self.assertEqual(writer.stats()['dropped'], 1)
+
+    def test_newest_fade_of_each_led_never_dropped(self):
+        self.gate.clear()
+        writer = CoalescingWriter(self.send, max_pending=4)
+        writer.submit(fade(1, 1))
+        time.sleep(0.05)
+        writer.submit(fade(50, 2))
+        # the queue fills with barriers; submit() must wait, not drop LED 2
+        opener = threading.Timer(0.05, self.gate.set)
+        opener.start()
+        start = time.monotonic()
+        for r in range(2, 12):
+            writer.submit(protocol.encode_play(bytearray(9), True))
+            writer.submit(fade(r, 1))
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+        writer.close()
+        opener.join()
+        sent = [chr(r[1]) + str(r[2]) for r in self.sent if r[1] == ord('c')]
+        self.assertIn('c50', sent)
+        self.assertEqual(sent[-1], 'c11')
+        self.assertEqual(sum(1 for r in self.sent if r[1] == ord('p')), 10)
+        self.assertEqual(writer.stats()['sent'], len(self.sent))
+
+    def test_aimd_rate(self):
+        def slow_send(report):
+            time.sleep(0.02)
+        writer = CoalescingWriter(slow_send, max_rate=100, min_rate=5,
+                                  target_latency=0.01)
+        for i in range(3):
+            writer.submit(protocol.encode_play(bytearray(9), True))
+        writer.close()
+        self.assertEqual(writer.rate, 12.5)
+        writer = CoalescingWriter(lambda report: None, max_rate=100, increase=10)
+        writer.rate = 50
+        writer.submit(fade(1))
+        writer.close()
+        self.assertEqual(writer.rate, 60)
+
+    def test_error_surfaces_on_next_call(self):
+        def fail(report):
+            raise Blink1ConnectionFailed("gone")
+        writer = CoalescingWriter(fail)
+        writer.submit(fade(1))
+        with self.assertRaises(Blink1ConnectionFailed):
+            writer.flush(2)
+        writer.close()
+
+
+class TestBlink1Coalescing(unittest.TestCase):
+
+    def test_blink1_coalescing(self):
+        sim = Blink1Simulator(latency=0.002)
+        with mock.patch.object(Blink1, 'find', return_value=sim):
+            b1 = Blink1(gamma=(1, 1, 1))
+        writer = b1.enable_coalescing()
+        for r in range(100):
+            b1.fade_to_rgb(0, r, 0, 0)
+        b1.write_pattern_line(100, '#0000ff', 2)
+        self.assertEqual(b1.read_pattern_line(2), (0, 0, 255, 100))
+        self.assertEqual(sim.leds[1], (99, 0, 0))
+        self.assertLess(len(sim.reports), 50)
+        self.assertGreater(writer.stats()['coalesced'], 0)
+        b1.close()
+        self.assertIsNone(b1._coalescer)
+
+    def test_writer_takes_device_lock(self):
+        sim = Blink1Simulator(latency=0.001)
+        with mock.patch.object(Blink1, 'find', return_value=sim):
+            b1 = Blink1(gamma=(1, 1, 1), shadow=False)
+        b1.enable_coalescing(max_pending=2)
+        done = threading.Event()
+        held = []
+
+        def holder():
+            with b1.lock:
+                b1.fade_to_rgb(0, 1, 2, 3)
+                time.sleep(0.03)
+                held.extend(sim.reports)
+                # a full queue and a read send from this thread, not wait
+                for i in range(5):
+                    b1.play(0, i)
+                held.append(b1.get_version())
+            done.set()
+
+        thread = threading.Thread(target=holder, daemon=True)
+        thread.start()
+        self.assertTrue(done.wait(2))
+        # the writer thread waited for the lock
+        self.assertEqual(held, ['205'])
+        self.assertEqual(sim.commands(), ['c', 'p', 'p', 'p', 'p', 'p', 'v'])
+        b1.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
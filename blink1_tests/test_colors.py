@@ -0,0 +1,46 @@
+import unittest
+
+import webcolors
+from blink1.blink1 import Blink1, ColorCorrect, InvalidColor, color_to_rgb
+
+
+class TestColorToRgb(unittest.TestCase):
+
+    def test_hex_matches_webcolors(self):
+        for spec in ['#ffffff', '#000000', '#FF00ff', '#123abc', '#fff', '#A0c']:
+            self.assertEqual(color_to_rgb(spec), tuple(webcolors.hex_to_rgb(spec)))
+
+    def test_names(self):
+        self.assertEqual(color_to_rgb('teal'), (0, 128, 128))
+        self.assertEqual(color_to_rgb('Red'), (255, 0, 0))
+        self.assertIsInstance(color_to_rgb('red'), tuple)
+
+    def test_tuple(self):
+        self.assertEqual(color_to_rgb((22, 33, 44)), (22, 33, 44))
+        self.assertEqual(Blink1.color_to_rgb((255, 255, 255)), (255, 255, 255))
+
+    def test_invalid(self):
+        for spec in ['moomintrol', '#xxxxxx', '#ff00f', '#', '', '#ff 0ff',
+                     (256, 0, 0), (-1, 0, 0), (1, 2), ('a', 'b', 'c'), None]:
+            with self.assertRaises(InvalidColor):
+                color_to_rgb(spec)
+
+
+class TestCorrectColor(unittest.TestCase):
+
+    def test_correct_color(self):
+        cc = ColorCorrect(gamma=(2, 2, 2), white_point=(255, 255, 255))
+        self.assertEqual(cc.correct_color('#7f7f7f'), cc(127, 127, 127))
+        self.assertEqual(cc.correct_color([127, 127, 127]), cc(127, 127, 127))
+        with self.assertRaises(InvalidColor):
+            cc.correct_color('moomintrol')
+
+    def test_cache_cleared_on_gamma_change(self):
+        cc = ColorCorrect(gamma=(2, 2, 2), white_point=(255, 255, 255))
+        self.assertEqual(cc.correct_color('gray'), cc(128, 128, 128))
+        cc.gamma = (1, 1, 1)
+        self.assertEqual(cc.correct_color('gray'), (128, 128, 128))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import mock
+from blink1 import flash, shine
+from blink1.blink1 import Blink1, Blink1ConnectionFailed
+from blink1.client import Blink1Client, Blink1DaemonError, connect
+from blink1.daemon import Blink1Daemon
+from blink1.simulator import Blink1Simulator
+
+
+class TestBlink1Daemon(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        self.socket_path = os.path.join(tmp, 'blink1d.sock')
+        self.sims = {'A1': Blink1Simulator(serial_number='A1'),
+                     'A2': Blink1Simulator(serial_number='A2')}
+        self.opened = []
+
+        def find(serial_number=None):
+            if serial_number not in self.sims:
+                raise Blink1ConnectionFailed(serial_number)
+            self.opened.append(serial_number)
+            self.sims[serial_number].connected = True
+            return self.sims[serial_number]
+
+        patchers = [
+            mock.patch.object(Blink1, 'find', side_effect=find),
+            mock.patch.object(Blink1, 'list', side_effect=lambda: list(self.sims)),
+            mock.patch.dict(os.environ, {'BLINK1D_SOCKET': self.socket_path}),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+
+        self.daemon = Blink1Daemon(self.socket_path, gamma=(1, 1, 1))
+        thread = threading.Thread(target=self.daemon.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.daemon.shutdown)
+        for i in range(100):
+            if os.path.exists(self.socket_path):
+                break
+            time.sleep(0.01)
+
+    def test_commands_keep_device_open(self):
+        with Blink1Client() as client:
+            client.fade_to_color(0, 'red')
+            client.fade_to_color(0, (0, 0, 255))
+            self.assertEqual(client.get_version(), '205')
+        with Blink1Client() as client:
+            client.off()
+        self.assertEqual(self.opened, ['A1'])
+        self.assertEqual(self.sims['A1'].commands(), ['c', 'c', 'v', 'c'])
+
+    def test_repeated_command_sent(self):
+        with Blink1Client() as client:
+            client.fade_to_color(0, 'red')
+            self.sims['A1'].leds[1] = (0, 0, 255)  # another process changed it
+            client.fade_to_color(0, 'red')
+        self.assertEqual(self.sims['A1'].commands(), ['c', 'c'])
+        self.assertEqual(self.sims['A1'].leds[1], (255, 0, 0))
+
+    def test_pipeline(self):
+        with Blink1Client() as client:
+            results = client.pipeline([
+                ('fade_to_color', (0, 'green'), 'A2'),
+                ('read_pattern_line', (0,), 'A2'),
+                ('fade_to_color', (0, 'moomintroll'), 'A2'),
+                ('list', (), None),
+            ])
+        self.assertEqual(results[1], [0, 0, 0, 0])
+        self.assertIsInstance(results[2], Blink1DaemonError)
+        self.assertEqual(results[2].kind, 'InvalidColor')
+        self.assertEqual(results[3], ['A1', 'A2'])
+        self.assertEqual(self.sims['A2'].leds[1], (0, 128, 0))
+
+    def test_errors(self):
+        with Blink1Client(serial_number='nope') as client:
+            with self.assertRaises(Blink1DaemonError) as cm:
+                client.off()
+            self.assertEqual(cm.exception.kind, 'Blink1ConnectionFailed')
+            with self.assertRaises(Blink1DaemonError):
+                client.call('write', [1, 2, 3])
+
+    def test_reopens_unplugged_device(self):
+        with Blink1Client() as client:
+            client.off()
+            self.sims['A1'].disconnect()
+            client.fade_to_color(0, 'red')
+        self.assertEqual(self.opened, ['A1', 'A1'])
+        self.assertEqual(self.sims['A1'].leds[1], (255, 0, 0))
+
+    def test_concurrent_clients(self):
+        def worker(n):
+            with Blink1Client() as client:
+                for i in range(20):
+                    client.fade_to_rgb(0, n, i, 1)
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(self.sims['A1'].reports), 80)
+
+    def test_second_daemon_refused(self):
+        with self.assertRaises(OSError):
+            Blink1Daemon(self.socket_path).serve_forever()
+
+    def test_cli_uses_daemon(self):
+        shine.main(['--color', '#0000ff', '--fade', '0'])
+        self.assertEqual(self.sims['A1'].leds[1], (0, 0, 255))
+        with mock.patch('time.sleep'):
+            flash.main(['--repeat', '1'])
+        self.assertEqual(self.opened, ['A1'])
+        # blue, white, black, black: the daemon keeps no shadow state
+        self.assertEqual(self.sims['A1'].commands(), ['c'] * 4)
+
+
+class TestNoDaemon(unittest.TestCase):
+
+    def test_connect_without_daemon(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        self.assertIsNone(connect(os.path.join(tmp, 'none.sock')))
+
+    def test_cli_falls_back_to_direct(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        sim = Blink1Simulator()
+        with mock.patch.dict(os.environ, {'BLINK1D_SOCKET': os.path.join(tmp, 'none.sock')}), \
+                mock.patch.object(Blink1, 'find', return_value=sim):
+            shine.main(['--color', 'red'])
+        self.assertEqual(sim.commands(), ['c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
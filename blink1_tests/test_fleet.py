@@ -0,0 +1,82 @@
+import unittest
+
+import mock
+from blink1.blink1 import Blink1, Blink1ConnectionFailed
+from blink1.fleet import Blink1Fleet
+from blink1.simulator import Blink1Simulator
+
+
+class TestBlink1Fleet(unittest.TestCase):
+
+    def setUp(self):
+        self.sims = dict((s, Blink1Simulator(serial_number=s))
+                         for s in ['A1', 'A2', 'B1'])
+
+        def find(serial_number=None):
+            if serial_number not in self.sims:
+                raise Blink1ConnectionFailed(serial_number)
+            return self.sims[serial_number]
+
+        patchers = [
+            mock.patch.object(Blink1, 'find', side_effect=find),
+            mock.patch.object(Blink1, 'list', return_value=list(self.sims)),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_open_all(self):
+        with Blink1Fleet(gamma=(1, 1, 1)) as fleet:
+            self.assertEqual(list(fleet), ['A1', 'A2', 'B1'])
+            result = fleet.fade_to_color(0, 'red')
+            self.assertTrue(result.ok)
+            self.assertEqual(sorted(result.results), ['A1', 'A2', 'B1'])
+        for sim in self.sims.values():
+            self.assertEqual(sim.leds[1], (255, 0, 0))
+            self.assertFalse(sim.connected)
+
+    def test_open_errors(self):
+        fleet = Blink1Fleet(['A1', 'nope'])
+        self.assertEqual(list(fleet), ['A1'])
+        self.assertIsInstance(fleet.open_errors['nope'], Blink1ConnectionFailed)
+        fleet.close()
+
+    def test_tags(self):
+        fleet = Blink1Fleet(gamma=(1, 1, 1))
+        fleet.tag('a', 'A1', 'A2')
+        fleet.tag('b', 'B1')
+        self.assertEqual(fleet.tags('A1'), set(['a']))
+        self.assertEqual(fleet.select(['b', 'A2']), ['A2', 'B1'])
+        fleet.fade_to_color(0, 'blue', target='a')
+        self.assertEqual(self.sims['A2'].leds[1], (0, 0, 255))
+        self.assertEqual(self.sims['B1'].leds[1], (0, 0, 0))
+        fleet.untag('a', 'A1')
+        self.assertEqual(fleet.select('a'), ['A2'])
+        with self.assertRaises(KeyError):
+            fleet.select('unknown')
+        with self.assertRaises(KeyError):
+            fleet.tag('c', 'unknown')
+        fleet.close()
+
+    def test_errors_per_device(self):
+        fleet = Blink1Fleet()
+        self.sims['A2'].disconnect()
+        result = fleet.server_tickle(True, 2000)
+        self.assertFalse(result.ok)
+        self.assertEqual(list(result.errors), ['A2'])
+        self.assertIsInstance(result.errors['A2'], Blink1ConnectionFailed)
+        self.assertEqual(self.sims['A1'].tickle, (1, 2000, 0, 0, 16))
+        fleet.close()
+
+    def test_play_and_read_pattern(self):
+        fleet = Blink1Fleet(gamma=(1, 1, 1))
+        fleet.play_pattern('3, #ff0000,0.5,0, #00ff00,0.5,0', target=['B1'])
+        result = fleet.read_pattern(target='B1')
+        self.assertEqual(result.results['B1'][:2],
+                         [(255, 0, 0, 500), (0, 255, 0, 500)])
+        self.assertEqual(self.sims['B1'].playing, (1, 0, 0, 3))
+        fleet.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
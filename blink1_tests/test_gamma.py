@@ -29,5 +29,59 @@ class TestGamma(unittest.TestCase):
             (expected,expected,expected)
         )
 
+class TestColorCorrectTables(unittest.TestCase):
+
+    def testTablesMatchGammaCorrect(self):
+        for gamma, white in [((2, 2, 2), (255, 255, 255)),
+                             ((0.5, 1.8, 2.2), (255, 200, 120)),
+                             ((1, 1, 1), 'candle')]:
+            g = ColorCorrect(gamma=gamma, white_point=white)
+            for lum in range(256):
+                expected = tuple(
+                    ColorCorrect.gamma_correct(gc, w, lum)
+                    for gc, w in zip(g.gamma, g.white_point)
+                )
+                self.assertEqual(g(lum, lum, lum), expected)
+
+    def testNonIntegerFallsBack(self):
+        g = ColorCorrect(gamma=(2, 2, 2), white_point=(255, 255, 255))
+        self.assertEqual(
+            g(127.5, 0, 300),
+            (round(255 * (127.5 / 255) ** 2), 0, round(255 * (300 / 255) ** 2))
+        )
+
+    def testSettersRebuildTables(self):
+        g = ColorCorrect(gamma=(2, 2, 2), white_point=(255, 255, 255))
+        g.gamma = (1, 1, 1)
+        self.assertEqual(g(127, 127, 127), (127, 127, 127))
+        g.white_point = (100, 100, 100)
+        self.assertEqual(g(255, 255, 255), (100, 100, 100))
+
+    def testCorrectMany(self):
+        g = ColorCorrect(gamma=(2, 1.5, 0.5), white_point=(255, 240, 200))
+        colors = bytes(range(0, 255))
+        out = g.correct_many(colors)
+        self.assertIsInstance(out, bytes)
+        expected = b''.join(
+            bytes(g(*colors[i:i + 3])) for i in range(0, len(colors), 3)
+        )
+        self.assertEqual(out, expected)
+        self.assertEqual(g.correct_many(bytearray(colors)), expected)
+        self.assertEqual(g.correct_many([(0, 1, 2), (3, 4, 5)]), expected[:6])
+
+    def testTables(self):
+        g = ColorCorrect(gamma=(2, 1.5, 0.5), white_point=(255, 240, 200))
+        self.assertEqual([len(t) for t in g.tables], [256, 256, 256])
+        self.assertEqual(tuple(t[100] for t in g.tables), g(100, 100, 100))
+        same = ColorCorrect(gamma=(2, 1.5, 0.5), white_point=(255, 240, 200))
+        self.assertEqual(same.tables, g.tables)
+        same.gamma = (1, 1, 1)
+        self.assertNotEqual(same.tables, g.tables)
+
+    def testCorrectManyBadLength(self):
+        g = ColorCorrect(gamma=(2, 2, 2), white_point=(255, 255, 255))
+        with self.assertRaises(ValueError):
+            g.correct_many(b'\x01\x02')
+
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,129 @@
+import asyncio
+import unittest
+
+import mock
+from blink1.aio import AsyncBlink1
+from blink1.blink1 import Blink1
+from blink1.gauge import Colormap, Gauge
+from blink1.simulator import Blink1Simulator
+
+
+class FakeTime(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+class TestColormap(unittest.TestCase):
+
+    def test_evenly_spaced_stops(self):
+        cmap = Colormap(['#000000', '#ff0000', '#ffffff'], size=5)
+        self.assertEqual(len(cmap.lut), 15)
+        self.assertEqual(cmap.rgb(0), (0, 0, 0))
+        self.assertEqual(cmap.rgb(0.25), (128, 0, 0))
+        self.assertEqual(cmap.rgb(0.5), (255, 0, 0))
+        self.assertEqual(cmap.rgb(1), (255, 255, 255))
+        # clamped
+        self.assertEqual(cmap.rgb(-3), (0, 0, 0))
+        self.assertEqual(cmap.rgb(7), (255, 255, 255))
+        self.assertEqual(cmap.rgb(float('inf')), (255, 255, 255))
+        self.assertEqual(cmap.rgb(float('-inf')), (0, 0, 0))
+        self.assertEqual(cmap.rgb(float('nan')), (0, 0, 0))
+
+    def test_positioned_stops(self):
+        cmap = Colormap([(0, '#0000ff'), (0.9, '#0000ff'), (1, '#ff0000')])
+        self.assertEqual(cmap.rgb(0.5), (0, 0, 255))
+        self.assertEqual(cmap.rgb(1), (255, 0, 0))
+
+    def test_bad_stops(self):
+        with self.assertRaises(ValueError):
+            Colormap(['red'])
+        with self.assertRaises(ValueError):
+            Colormap([(0, 'red'), (0.7, 'blue'), (0.5, 'green'), (1, 'red')])
+        with self.assertRaises(ValueError):
+            Colormap(['red', 'moomintroll'])
+
+
+class TestGauge(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = Blink1Simulator()
+        self.time = FakeTime()
+        for p in (mock.patch.object(Blink1, 'find', return_value=self.sim),
+                  mock.patch('blink1.gauge.time', self.time)):
+            p.start()
+            self.addCleanup(p.stop)
+        self.b1 = Blink1(gamma=(1, 1, 1))
+
+    def stream(self, values, dt):
+        for value in values:
+            yield value
+            self.time.now += dt
+
+    def test_down_samples_to_rate(self):
+        gauge = Gauge(self.b1, 0, 100, colormap=('#000000', '#ff0000'), rate=10)
+        # 1000 samples a second for one second
+        stats = gauge.run(self.stream([i % 100 for i in range(1000)], 0.001))
+        self.assertEqual(stats['samples'], 1000)
+        self.assertLessEqual(stats['updates'], 11)
+        fades = [r for r in self.sim.reports if r[1] == ord('c')]
+        self.assertEqual(len(fades), stats['updates'])
+        # each fade lasts one update interval: 100ms, 10ms ticks
+        self.assertEqual(fades[1][5:7], bytes([0, 10]))
+
+    def test_averages_window(self):
+        gauge = Gauge(self.b1, 0, 100, colormap=('#000000', '#ff0000'), rate=10)
+        self.assertTrue(gauge.update(0))
+        self.assertFalse(gauge.update(100))
+        self.assertFalse(gauge.update(0))
+        self.assertTrue(gauge.flush())
+        self.assertEqual(self.sim.leds[1], (128, 0, 0))
+        self.assertFalse(gauge.flush())
+
+    def test_high_below_low_and_non_finite(self):
+        gauge = Gauge(self.b1, 100, 0, colormap=('#00ff00', '#ff0000'))
+        for value in (float('nan'), float('inf'), float('-inf')):
+            gauge.update(value)
+        self.assertEqual(gauge.samples, 0)
+        gauge.update(100)
+        self.assertEqual(self.sim.leds[1], (0, 255, 0))
+
+    def test_unchanged_color_not_resent(self):
+        gauge = Gauge(self.b1, 0, 10, rate=10)
+        gauge.run(self.stream([5] * 50, 0.05))
+        self.assertEqual(gauge.updates, 1)
+
+    def test_constant_memory(self):
+        gauge = Gauge(self.b1, 0, 1)
+        size = len(vars(gauge))
+        gauge.run(self.stream([0.5] * 10000, 0.0001))
+        self.assertEqual(len(vars(gauge)), size)
+        self.assertIsInstance(gauge._sum, float)
+
+    def test_bad_arguments(self):
+        with self.assertRaises(ValueError):
+            Gauge(self.b1, 1, 1)
+        with self.assertRaises(ValueError):
+            Gauge(self.b1, 0, 1, rate=0)
+
+    def test_run_async(self):
+        async def values():
+            for value in (0, 50, 100):
+                yield value
+                self.time.now += 1
+
+        async def main():
+            b1 = AsyncBlink1(self.b1)
+            try:
+                return await Gauge(b1, 0, 100, colormap=('#000000', '#0000ff')).run_async(values())
+            finally:
+                await b1.close()
+        stats = asyncio.run(main())
+        self.assertEqual(stats, {'samples': 3, 'updates': 3})
+        self.assertEqual(self.sim.leds[1], (0, 0, 255))
+
+
+if __name__ == '__main__':
+    unittest.main()
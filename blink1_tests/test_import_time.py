@@ -0,0 +1,99 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import mock
+from blink1 import flash, shine
+from blink1.cli import parse_options
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the budget the project commits to: importing blink1.blink1, including the
+# standard library modules it needs, in milliseconds (best of 3 runs); it
+# takes about 30-40 ms, the margin is for slow and loaded machines
+IMPORT_BUDGET_MS = 150
+
+# modules that must not be imported until they are used
+LAZY_MODULES = ['hid', 'webcolors', 'click', 'blink1.player', 'blink1.coalesce',
+                'blink1.pattern', 'blink1.scheduler', 'blink1.batch']
+
+
+def python(*args):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable] + list(args), env=env, cwd=ROOT,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=True)
+
+
+def import_time_ms(module):
+    """ Cumulative import time of a module from `python -X importtime`
+    """
+    out = python('-X', 'importtime', '-c', 'import ' + module).stderr
+    for line in out.splitlines():
+        fields = [f.strip() for f in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1000.0
+    raise AssertionError("no import time for %s in:\n%s" % (module, out))
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_import_budget(self):
+        best = min(import_time_ms('blink1.blink1') for i in range(3))
+        self.assertLess(best, IMPORT_BUDGET_MS)
+
+    def test_heavy_modules_are_lazy(self):
+        for module in ('blink1.blink1', 'blink1.shine', 'blink1.flash'):
+            out = python('-c', 'import sys, %s; print(" ".join(sys.modules))' % module)
+            loaded = out.stdout.split()
+            for lazy in LAZY_MODULES:
+                self.assertNotIn(lazy, loaded, "%s imports %s" % (module, lazy))
+
+
+class TestFastCli(unittest.TestCase):
+
+    def test_parse_options(self):
+        defaults = {'color': 'white', 'fade': 0.2, 'repeat': 2}
+        self.assertEqual(parse_options([], defaults), defaults)
+        self.assertEqual(parse_options(['--color', 'red', '--fade=1', '--repeat', '5'], defaults),
+                         {'color': 'red', 'fade': 1.0, 'repeat': 5})
+        for argv in (['--help'], ['--colour', 'red'], ['--fade'], ['--repeat', '1.5'], ['red']):
+            self.assertIsNone(parse_options(argv, defaults), argv)
+
+    def test_shine_fast_path(self):
+        with mock.patch.object(shine, 'run') as run, \
+                mock.patch.object(shine, 'make_command') as make_command:
+            shine.main(['--color', 'blue'])
+        run.assert_called_once_with(color='blue', fade=0.2)
+        self.assertFalse(make_command.called)
+
+    def test_shine_falls_back_to_click(self):
+        with mock.patch.object(shine, 'run') as run:
+            with self.assertRaises(SystemExit) as cm:
+                shine.main(['--help'])
+        self.assertEqual(cm.exception.code, 0)
+        self.assertFalse(run.called)
+
+    def test_flash_fast_path(self):
+        with mock.patch.object(flash, 'run') as run:
+            flash.main(['--on', 'red', '--repeat', '3'])
+        run.assert_called_once_with(on='red', off='black', duration=1, repeat=3, fade=0.2)
+
+    def test_flash_closes_daemon_connection(self):
+        client = mock.MagicMock()
+        with mock.patch('blink1.client.connect', return_value=client), \
+                mock.patch('time.sleep'):
+            flash.run(on='red', off='black', duration=1, repeat=1, fade=0)
+        self.assertEqual(client.fade_to_color.call_count, 2)
+        client.__exit__.assert_called_once_with(None, None, None)
+
+    def test_click_commands_still_importable(self):
+        from blink1.shine import shine as shine_command
+        from blink1.flash import flash as flash_command
+        self.assertEqual(shine_command.name, 'shine')
+        self.assertEqual(flash_command.name, 'flash')
+
+
+if __name__ == '__main__':
+    unittest.main()
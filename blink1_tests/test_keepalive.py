@@ -0,0 +1,151 @@
+import threading
+import time
+import unittest
+
+import mock
+from blink1 import protocol
+from blink1.blink1 import Blink1, Blink1ConnectionFailed
+from blink1.keepalive import KeepaliveScheduler
+from blink1.scheduler import Scheduler
+from blink1.simulator import Blink1Simulator
+
+
+def make_blink1(serial):
+    with mock.patch.object(Blink1, 'find', return_value=Blink1Simulator(serial_number=serial)):
+        return Blink1()
+
+
+class TestKeepaliveScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = Scheduler()
+        self.keepalive = KeepaliveScheduler(self.scheduler)
+        self.addCleanup(self.scheduler.close)
+        self.addCleanup(self.keepalive.close)
+
+    def wait_for(self, predicate, timeout=2.0):
+        end = time.monotonic() + timeout
+        while not predicate():
+            self.assertLess(time.monotonic(), end, "timed out")
+            time.sleep(0.005)
+
+    def test_rearms_many_devices_at_fraction_of_timeout(self):
+        b1s = [make_blink1('A%d' % i) for i in range(3)]
+        for i, b1 in enumerate(b1s):
+            self.keepalive.add(b1, timeout_millis=50 * (i + 1), stay_lit=True)
+        self.assertAlmostEqual(self.keepalive.keepalive(b1s[0]).period, 0.02)
+        self.assertAlmostEqual(self.keepalive.keepalive(b1s[2]).period, 0.06)
+        self.wait_for(lambda: self.keepalive.keepalive(b1s[2]).rearms >= 3)
+        self.assertGreater(self.keepalive.keepalive(b1s[0]).rearms,
+                           self.keepalive.keepalive(b1s[2]).rearms)
+        self.assertEqual(b1s[0].dev.tickle, (1, 50, 1, 0, 16))
+        self.assertEqual(b1s[2].dev.tickle, (1, 150, 1, 0, 16))
+        # one timer thread for all of them
+        names = [t.name for t in threading.enumerate()]
+        self.assertEqual(names.count('blink1-scheduler'), 1)
+        self.assertEqual(self.keepalive.stats()['devices'], 3)
+
+    def test_failing_check_lets_device_time_out(self):
+        b1 = make_blink1('A1')
+        healthy = threading.Event()
+        healthy.set()
+        keepalive = self.keepalive.add(b1, timeout_millis=50, check=healthy.is_set)
+        self.wait_for(lambda: keepalive.rearms >= 1)
+        healthy.clear()
+        self.wait_for(lambda: keepalive.skipped >= 2)
+        self.assertFalse(keepalive.healthy)
+        rearms = keepalive.rearms
+        healthy.set()
+        self.wait_for(lambda: keepalive.rearms > rearms)
+        self.assertTrue(keepalive.healthy)
+
+    def test_raising_check_counts_as_unhealthy(self):
+        b1 = make_blink1('A1')
+        keepalive = self.keepalive.add(b1, timeout_millis=50, check=lambda: 1 / 0)
+        self.wait_for(lambda: keepalive.skipped >= 1)
+        self.assertEqual(keepalive.rearms, 0)
+        self.assertEqual(b1.dev.commands(), [])
+
+    def test_check_runs_without_locks(self):
+        b1 = make_blink1('A1')
+        locks = [b1.lock, self.keepalive._lock]
+        taken = []
+
+        def take(lock):
+            if lock.acquire(timeout=0.2):
+                taken.append(lock)
+                lock.release()
+
+        def check():
+            # another thread can take both locks while the check runs
+            for lock in locks:
+                taker = threading.Thread(target=take, args=(lock,))
+                taker.start()
+                taker.join()
+            return True
+
+        keepalive = self.keepalive.add(b1, timeout_millis=50, check=check)
+        self.wait_for(lambda: keepalive.rearms >= 1)
+        self.assertEqual(taken[:2], locks)
+
+    def test_write_errors_keep_trying(self):
+        b1 = make_blink1('A1')
+        b1.dev.disconnect()
+        keepalive = self.keepalive.add(b1, timeout_millis=50)
+        self.wait_for(lambda: keepalive.errors >= 1)
+        self.assertIsInstance(keepalive.last_error, Blink1ConnectionFailed)
+        b1.dev.connected = True
+        self.wait_for(lambda: keepalive.rearms >= 1)
+
+    def test_remove_disables_watchdog(self):
+        b1 = make_blink1('A1')
+        keepalive = self.keepalive.add(b1, timeout_millis=50)
+        self.wait_for(lambda: keepalive.rearms >= 1)
+        self.assertTrue(self.keepalive.remove(b1))
+        self.assertFalse(self.keepalive.remove(b1))
+        self.assertEqual(b1.dev.tickle[0], 0)
+        count = len(b1.dev.reports)
+        time.sleep(0.05)
+        self.assertEqual(len(b1.dev.reports), count)
+        self.assertIsNone(self.keepalive.stats(b1))
+
+    def test_device_shared_with_caller_thread(self):
+        sim = Blink1Simulator(latency=0.0001)
+        with mock.patch.object(Blink1, 'find', return_value=sim):
+            b1 = Blink1(gamma=(1, 1, 1), shadow=False)
+        keepalive = self.keepalive.add(b1, timeout_millis=20)
+        for i in range(200):
+            b1.fade_to_rgb(0, i, 0, 0, 1)
+        self.wait_for(lambda: keepalive.rearms >= 3)
+        with b1.lock:  # the timer thread waits for it
+            rearms = keepalive.rearms
+            time.sleep(0.03)
+            self.assertEqual(keepalive.rearms, rearms)
+        self.wait_for(lambda: keepalive.rearms > rearms)
+        self.keepalive.remove(b1)
+        decoded = [protocol.decode_report(r) for r in sim.reports]
+        self.assertEqual([args[0] for cmd, args in decoded if cmd == 'c'],
+                         list(range(200)))
+        tickles = [args for cmd, args in decoded if cmd == 'D']
+        self.assertEqual(tickles[:-1], [(1, 20, 0, 0, 16)] * (len(tickles) - 1))
+        self.assertEqual(tickles[-1][0], 0)
+
+    def test_busy_device_does_not_hold_up_others(self):
+        busy, free = make_blink1('A1'), make_blink1('A2')
+        with busy.lock:
+            waiting = self.keepalive.add(busy, timeout_millis=50)
+            keepalive = self.keepalive.add(free, timeout_millis=50)
+            # the timer thread retries the busy device instead of blocking
+            self.wait_for(lambda: keepalive.rearms >= 3)
+            self.assertEqual(waiting.rearms, 0)
+        self.wait_for(lambda: waiting.rearms >= 1)
+
+    def test_bad_arguments(self):
+        with self.assertRaises(ValueError):
+            KeepaliveScheduler(self.scheduler, fraction=1)
+        with self.assertRaises(ValueError):
+            self.keepalive.add(make_blink1('A1'), timeout_millis=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,8 @@ import unittest
 import math
 import mock
 import time
-from blink1.kelvin import kelvin_to_rgb
+from blink1.kelvin import (
+    kelvin_to_rgb, kelvin_to_rgb_table, kelvins_to_rgb, KELVIN_MIN, KELVIN_MAX)
 from blink1.blink1 import blink1
 
 
@@ -30,5 +31,42 @@ class TestGamma(unittest.TestCase):
                 time.sleep(0.05)
 
 
+class TestKelvinTable(unittest.TestCase):
+
+    def test_error_against_formula(self):
+        # documented: at most 1 off in any channel across the table range
+        off = 0
+        for k10 in range(KELVIN_MIN * 10, KELVIN_MAX * 10 + 1, 7):
+            kelvin = k10 / 10.0
+            exact = kelvin_to_rgb.__wrapped__(kelvin)
+            fast = kelvin_to_rgb_table(kelvin)
+            error = max(abs(a - b) for a, b in zip(exact, fast))
+            self.assertLessEqual(error, 1, kelvin)
+            off += error
+        self.assertLess(off, 0.01 * (KELVIN_MAX - KELVIN_MIN) * 10 / 7)
+
+    def test_exact_on_steps(self):
+        for kelvin in (KELVIN_MIN, 1900, 6600, 6700, KELVIN_MAX):
+            self.assertEqual(kelvin_to_rgb_table(kelvin), kelvin_to_rgb(kelvin))
+
+    def test_outside_range_uses_formula(self):
+        self.assertEqual(kelvin_to_rgb_table(500), kelvin_to_rgb(500))
+        self.assertEqual(kelvin_to_rgb_table(45000), kelvin_to_rgb(45000))
+
+    def test_memoized(self):
+        kelvin_to_rgb.cache_clear()
+        kelvin_to_rgb(4321)
+        kelvin_to_rgb(4321)
+        self.assertEqual(kelvin_to_rgb.cache_info().hits, 1)
+
+    def test_batch(self):
+        kelvins = [1000, 2500.5, 6600, 39999.9]
+        packed = kelvins_to_rgb(kelvins)
+        self.assertEqual(len(packed), 12)
+        for i, kelvin in enumerate(kelvins):
+            self.assertEqual(tuple(packed[i * 3:i * 3 + 3]), kelvin_to_rgb_table(kelvin))
+        self.assertEqual(kelvins_to_rgb(range(0)), b'')
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
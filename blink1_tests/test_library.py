@@ -0,0 +1,137 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+import mock
+from blink1.blink1 import Blink1
+from blink1.library import (InvalidLibrary, PatternLibrary, PatternNotFound,
+                            compile_library, main)
+from blink1.simulator import Blink1Simulator
+
+ALERT = '3, #ff0000,0.3,1, #0000ff,0.3,2, #000000,0.2,0'
+OK = '0, green,1,0, black,1,0'
+
+
+class TestPatternLibrary(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        self.tmp = tmp
+        self.path = os.path.join(tmp, 'alerts.b1lib')
+        compile_library(self.path, {'alert': ALERT, 'ok': OK},
+                        [((2, 2, 2), (255, 255, 255)), ((1, 1, 1), (255, 255, 255))])
+        self.library = PatternLibrary(self.path)
+        self.addCleanup(self.library.close)
+
+    def open_blink1(self, **kwargs):
+        sim = Blink1Simulator()
+        with mock.patch.object(Blink1, 'find', return_value=sim):
+            return Blink1(**kwargs)
+
+    def test_index(self):
+        self.assertEqual(self.library.names(), ['alert', 'ok'])
+        self.assertIn('alert', self.library)
+        self.assertNotIn('nope', self.library)
+        self.assertEqual(self.library.settings('ok'),
+                         [((1.0, 1.0, 1.0), (255.0, 255.0, 255.0)),
+                          ((2.0, 2.0, 2.0), (255.0, 255.0, 255.0))])
+
+    def test_same_as_play_pattern(self):
+        for gamma in ((2, 2, 2), (1, 1, 1)):
+            expected = self.open_blink1(gamma=gamma)
+            expected.play_pattern(ALERT)
+            b1 = self.open_blink1(gamma=gamma)
+            self.library.play(b1, 'alert')
+            self.assertEqual(b1.dev.reports, expected.dev.reports)
+            self.assertEqual(b1.dev.pattern, expected.dev.pattern)
+            self.assertEqual(b1.pattern_ram.lines, expected.pattern_ram.lines)
+            self.assertEqual(b1.dev.commands()[-1], 'p')
+            self.assertEqual(b1.dev.reports[-1][5], 3)  # play count
+
+    def test_long_pattern_truncated_alike(self):
+        long_pattern = '1' + ''.join(', #%02x0000,0.1,0' % i for i in range(40))
+        path = os.path.join(self.tmp, 'long.b1lib')
+        compile_library(path, {'long': long_pattern})
+        expected = self.open_blink1()
+        expected.play_pattern(long_pattern)
+        with PatternLibrary(path) as library:
+            b1 = self.open_blink1()
+            library.play(b1, 'long')
+        self.assertEqual(b1.dev.reports, expected.dev.reports)
+        self.assertEqual(b1.dev.pattern, expected.dev.pattern)
+
+    def test_reports_are_views(self):
+        reports = self.library.reports('ok', self.open_blink1().cc)
+        self.assertIsInstance(reports[0], memoryview)
+        self.assertEqual(len(reports[0]), 9)
+        del reports
+
+    def test_upload_skipped_when_current(self):
+        b1 = self.open_blink1()
+        self.assertTrue(self.library.upload(b1, 'ok'))
+        count = len(b1.dev.reports)
+        self.assertFalse(self.library.upload(b1, 'ok'))
+        self.assertEqual(len(b1.dev.reports), count)
+        # and play_pattern() knows what is there too
+        b1.play_pattern(OK)
+        self.assertEqual(b1.dev.commands()[count:], ['p'])
+        self.assertTrue(self.library.upload(b1, 'alert'))
+
+    def test_without_shadow(self):
+        b1 = self.open_blink1(shadow=False)
+        self.assertTrue(self.library.upload(b1, 'ok'))
+        self.assertTrue(self.library.upload(b1, 'ok'))
+        self.assertEqual(b1.dev.pattern[0][:3], (0, 64, 0))
+
+    def test_not_compiled_for_settings(self):
+        b1 = self.open_blink1(gamma=(1.5, 1.5, 1.5))
+        with self.assertRaises(PatternNotFound):
+            self.library.play(b1, 'alert')
+        with self.assertRaises(PatternNotFound):
+            self.library.play(self.open_blink1(), 'nope')
+        self.assertEqual(b1.dev.reports, [])
+
+    def test_replace_while_mapped(self):
+        compile_library(self.path, {'other': OK})
+        self.assertEqual(self.library.names(), ['alert', 'ok'])
+        self.library.play(self.open_blink1(), 'alert')
+        with PatternLibrary(self.path) as library:
+            self.assertEqual(library.names(), ['other'])
+
+    def test_invalid_library(self):
+        path = os.path.join(self.tmp, 'bad.b1lib')
+        with open(self.path, 'rb') as f:
+            truncated = f.read()[:200]
+        for content in (b'', b'BLINK1PL', b'X' * 100, truncated):
+            with open(path, 'wb') as f:
+                f.write(content)
+            with self.assertRaises(InvalidLibrary):
+                PatternLibrary(path)
+        with self.assertRaises(ValueError):
+            compile_library(path, {'x' * 49: OK})
+
+    def test_cli(self):
+        path = os.path.join(self.tmp, 'cli.b1lib')
+        patterns = os.path.join(self.tmp, 'patterns.txt')
+        with open(patterns, 'w') as f:
+            f.write('# alerts\nalert = %s\n\n' % ALERT)
+        out = io.StringIO()
+        with redirect_stdout(out):
+            main(['compile', path, 'ok=' + OK, '--from', patterns,
+                  '--gamma', '2', '--gamma', '1,1,1', '--white-point', '255,255,255'])
+            main(['list', path])
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], 'compiled 2 patterns for 2 settings into ' + path)
+        self.assertEqual(len(lines), 5)
+        with PatternLibrary(path) as library:
+            b1 = self.open_blink1(gamma=(1, 1, 1))
+            library.play(b1, 'alert')
+            self.assertEqual(b1.dev.pattern[0][:3], (255, 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import threading
+import unittest
+
+import mock
+from blink1 import protocol
+from blink1.blink1 import Blink1
+from blink1.simulator import Blink1Simulator
+
+COUNT = 100
+
+
+class TestDeviceLock(unittest.TestCase):
+
+    def setUp(self):
+        # the latency makes each send yield to the other thread before the
+        # simulator copies the report, as a slow USB write would
+        self.sim = Blink1Simulator(latency=0.0001)
+        with mock.patch.object(Blink1, 'find', return_value=self.sim):
+            self.b1 = Blink1(gamma=(1, 1, 1), shadow=False)
+
+    def run_threads(self, *targets):
+        threads = [threading.Thread(target=target) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_commands_from_two_threads(self):
+        def fades():
+            for i in range(COUNT):
+                self.b1.fade_to_rgb(0, i, 0, 0, 1)
+
+        def tickles():
+            for i in range(COUNT):
+                self.b1.server_tickle(True, (i + 1) * 10)
+
+        self.run_threads(fades, tickles)
+        decoded = [protocol.decode_report(r) for r in self.sim.reports]
+        self.assertEqual([args[0] for cmd, args in decoded if cmd == 'c'],
+                         list(range(COUNT)))
+        self.assertEqual([args[1] for cmd, args in decoded if cmd == 'D'],
+                         [(i + 1) * 10 for i in range(COUNT)])
+
+    def test_reads_answer_own_command(self):
+        versions = []
+        patterns = []
+
+        def read_versions():
+            for i in range(COUNT // 4):
+                self.b1._version = None
+                versions.append(self.b1.get_version())
+
+        def read_patterns():
+            for i in range(COUNT // 4):
+                patterns.append(self.b1.read_pattern_line(0))
+
+        self.b1.write_pattern_line(100, '#102030', 0)
+        self.run_threads(read_versions, read_patterns)
+        self.assertEqual(set(versions), {'205'})
+        self.assertEqual(set(patterns), {(16, 32, 48, 100)})
+
+    def test_lock_groups_commands(self):
+        self.b1.lock.acquire()
+        other = threading.Thread(target=self.b1.fade_to_rgb, args=(0, 9, 9, 9))
+        other.start()
+        self.b1.write_pattern_line(100, '#ff0000', 0)
+        self.b1.play(0, 1)
+        self.b1.lock.release()
+        other.join()
+        self.assertEqual(self.sim.commands(), ['l', 'P', 'p', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
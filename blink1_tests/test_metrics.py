@@ -0,0 +1,114 @@
+import unittest
+import urllib.request
+
+import mock
+from blink1.blink1 import Blink1, Blink1ConnectionFailed
+from blink1.metrics import Metrics, prometheus_text, serve_prometheus
+from blink1.simulator import Blink1Simulator
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram_buckets(self):
+        m = Metrics(buckets=(0.001, 0.01))
+        m.observe('S1', 'write', ord('c'), 0.0005)
+        m.observe('S1', 'write', ord('c'), 0.001)
+        m.observe('S1', 'write', ord('c'), 0.005)
+        m.observe('S1', 'write', ord('c'), 1.0)
+        hist = m.stats('S1')['write']['c']
+        self.assertEqual(hist['count'], 4)
+        self.assertAlmostEqual(hist['sum'], 1.0065)
+        self.assertEqual(hist['buckets'], [(0.001, 2), (0.01, 3), (float('inf'), 4)])
+
+    def test_errors_and_reconnects(self):
+        m = Metrics()
+        m.opened('S1')
+        m.opened('S2')
+        m.opened('S1')
+        m.reconnected('S1')
+        m.error('S2')
+        stats = m.stats()
+        self.assertEqual(stats['S1']['reconnects'], 1)
+        self.assertEqual(stats['S2']['reconnects'], 0)
+        self.assertEqual(stats['S2']['errors'], 1)
+        self.assertEqual(m.stats('nope')['errors'], 0)
+
+    def test_prometheus_text(self):
+        m = Metrics(buckets=(0.001,))
+        m.observe('S"1', 'read', ord('R'), 0.0001)
+        m.error('S"1')
+        text = prometheus_text(m)
+        self.assertIn('# TYPE blink1_report_seconds histogram', text)
+        self.assertIn('blink1_report_seconds_bucket{command="R",le="0.001",op="read",'
+                      'serial="S\\"1"} 1', text)
+        self.assertIn('blink1_report_seconds_bucket{command="R",le="+Inf",op="read",'
+                      'serial="S\\"1"} 1', text)
+        self.assertIn('blink1_report_seconds_count{command="R",op="read",serial="S\\"1"} 1',
+                      text)
+        self.assertIn('blink1_errors_total{serial="S\\"1"} 1', text)
+
+    def test_serve_prometheus(self):
+        m = Metrics()
+        m.opened('S1')
+        server = serve_prometheus(m, port=0, addr='127.0.0.1')
+        try:
+            url = 'http://127.0.0.1:%d/metrics' % server.server_address[1]
+            body = urllib.request.urlopen(url, timeout=5).read().decode('utf-8')
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertIn('blink1_reconnects_total{serial="S1"} 0', body)
+
+
+class TestBlink1Metrics(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = Metrics()
+        patcher = mock.patch.object(Blink1, 'metrics', self.metrics)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.sim = Blink1Simulator(serial_number='CAFE0001')
+        with mock.patch.object(Blink1, 'find', return_value=self.sim):
+            self.b1 = Blink1()
+
+    def test_counts_commands(self):
+        self.b1.fade_to_color(100, 'red')
+        self.b1.fade_to_color(100, 'blue')
+        self.b1.read_pattern_line(2)
+        stats = self.b1.stats()
+        self.assertEqual(stats['write']['c']['count'], 2)
+        self.assertEqual(stats['write']['R']['count'], 1)
+        self.assertEqual(stats['read']['R']['count'], 1)
+
+    def test_counts_errors(self):
+        self.sim.disconnect()
+        with self.assertRaises(Blink1ConnectionFailed):
+            self.b1.fade_to_color(100, 'red')
+        with self.assertRaises(OSError):
+            self.b1.read()
+        self.assertEqual(self.b1.stats()['errors'], 2)
+        # raised by hidapi without a reconnect policy, not returned
+        with mock.patch.object(self.sim, 'send_feature_report', side_effect=OSError('gone')):
+            with self.assertRaises(OSError):
+                self.b1.fade_to_color(100, 'green')
+        self.assertEqual(self.b1.stats()['errors'], 3)
+
+    def test_reopen_counts_reconnect(self):
+        # opening the same device again is not a reconnect
+        self.b1.close()
+        with mock.patch.object(Blink1, 'find', return_value=self.sim):
+            self.b1 = Blink1()
+        self.assertEqual(self.b1.stats()['reconnects'], 0)
+        with mock.patch.object(Blink1, 'find', return_value=self.sim):
+            self.b1._reopen()
+        self.assertEqual(self.b1.stats()['reconnects'], 1)
+
+    def test_disabled(self):
+        with mock.patch.object(Blink1, 'metrics', None):
+            self.b1.fade_to_color(100, 'red')
+            self.assertIsNone(self.b1.stats())
+        self.assertEqual(self.metrics.stats('CAFE0001')['write'], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
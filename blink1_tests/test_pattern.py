@@ -0,0 +1,118 @@
+import unittest
+
+import mock
+from blink1.blink1 import Blink1, InvalidColor
+from blink1.colors import color_to_rgb
+from blink1.pattern import (InvalidPattern, Pattern, PatternLine,
+                            _compile_checked, compile_pattern, tokenize)
+from blink1.simulator import Blink1Simulator
+
+PATTERNS = [
+    '10, #ff00ff,0.3,1, #00ff00,0.1,2,  #ff00ff,0.3,2, #00ff00,0.1,1',
+    '5, #FF0000,0.2,0,#000000,0.2,0',
+    '0, red,0.5',
+    '3',
+]
+
+
+class TestCompilePattern(unittest.TestCase):
+
+    def test_matches_parse_pattern(self):
+        for pattern_str in PATTERNS:
+            pattern = compile_pattern(pattern_str)
+            num_repeats, colorlist = Blink1.parse_pattern(pattern_str)
+            self.assertEqual(pattern.repeats, num_repeats)
+            self.assertEqual(
+                [(l.rgb, l.time, l.millis, l.ledn) for l in pattern.lines],
+                [(color_to_rgb(c['rgb']), c['time'], c['millis'], c['ledn'])
+                 for c in colorlist])
+
+    def test_compiled(self):
+        pattern = compile_pattern('3, red,0.5,1, #0000ff,0.25,2')
+        self.assertEqual(pattern, Pattern(3, [
+            PatternLine((255, 0, 0), 0.5, 500, 1),
+            PatternLine((0, 0, 255), 0.25, 250, 2),
+        ]))
+        self.assertEqual(len(pattern), 2)
+        self.assertEqual(pattern.source, '3, red,0.5,1, #0000ff,0.25,2')
+
+    def test_empty_fields_default(self):
+        pattern = compile_pattern('2,,,, blue,,2,')
+        self.assertEqual(list(pattern), [
+            PatternLine((0, 0, 0), 0.0, 0, 0),
+            PatternLine((0, 0, 255), 0.0, 0, 2),
+            PatternLine((0, 0, 0), 0.0, 0, 0),
+        ])
+
+    def test_cached(self):
+        self.assertIs(compile_pattern('1, red,0.1,0'), compile_pattern('1, red,0.1,0'))
+
+    def test_fast_path_matches_checked_parse(self):
+        for pattern_str in ('1, red', '0,#ff0000,0.5', '2,,,, blue,,2,', ' 3 , # 00ff00 ,1e-1 , 2',
+                            PATTERNS[0]):
+            self.assertEqual(compile_pattern.__wrapped__(pattern_str),
+                             _compile_checked(pattern_str), pattern_str)
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('1, #f f0000 ,0.1'),
+                         [('1', 0), ('#ff0000', 3), ('0.1', 13)])
+
+    def test_positioned_errors(self):
+        cases = [
+            ('x, red,0.1,0', 0),
+            ('1, red,0.1,0, moomintrol,0.1,0', 14),
+            ('1, red,abc,0', 7),
+            ('1, red,0.1,-1', 11),
+            ('300, red,0.1,0', 0),
+            ('1, red,inf,0', 7),
+            ('1, red,1e400,0', 7),
+            ('1, red,nan,0', 7),
+            ('1, red,655.36,0', 7),
+        ]
+        for pattern_str, position in cases:
+            with self.assertRaises(InvalidPattern) as cm:
+                compile_pattern(pattern_str)
+            self.assertEqual(cm.exception.position, position, pattern_str)
+            self.assertIn('^', str(cm.exception))
+
+    def test_longest_time(self):
+        # the most the 16-bit, 10 ms time field of a report holds
+        self.assertEqual(compile_pattern('1, red,655.35,0').lines[0].millis, 655350)
+
+    def test_bad_color_is_invalid_color(self):
+        with self.assertRaises(InvalidColor):
+            compile_pattern('1, moomintrol,0.1,0')
+
+
+class TestPlayCompiledPattern(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = Blink1Simulator()
+        with mock.patch.object(Blink1, 'find', return_value=self.sim):
+            self.b1 = Blink1(gamma=(1, 1, 1))
+
+    def test_play_pattern(self):
+        self.b1.play_pattern(compile_pattern('4, #ff0000,0.5,1'))
+        self.assertEqual(self.sim.pattern[0], (255, 0, 0, 500, 1))
+        self.assertEqual(self.sim.playing, (1, 0, 0, 4))
+
+    def test_bad_pattern_sends_nothing(self):
+        with self.assertRaises(InvalidPattern):
+            self.b1.play_pattern('1, red,0.1,0, moomintrol,0.1,0')
+        self.assertEqual(self.sim.reports, [])
+
+    def test_play_pattern_local(self):
+        clock = [100.0]
+
+        def sleep(seconds):
+            clock[0] += seconds
+
+        with mock.patch('blink1.blink1.time.monotonic', lambda: clock[0]), \
+                mock.patch('blink1.blink1.time.sleep', side_effect=sleep) as sleep_mock:
+            self.b1.play_pattern_local('2, #ff0000,0.5,0, #00ff00,0.25,0')
+        self.assertEqual(self.sim.commands(), ['c'] * 4)
+        self.assertEqual([c[0][0] for c in sleep_mock.call_args_list], [0.5, 0.25] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+import mock
+from blink1.blink1 import Blink1
+from blink1.patternram import PATTERN_SIZE, pattern_line
+from blink1.simulator import Blink1Simulator
+
+PATTERN = '3, #ff00ff,0.3,1, #00ff00,0.1,2, #ff00ff,0.3,2, #00ff00,0.1,1'
+
+
+class TestPatternRAM(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = Blink1Simulator()
+        with mock.patch.object(Blink1, 'find', return_value=self.sim):
+            self.b1 = Blink1(gamma=(1, 1, 1))
+
+    def test_pattern_line_quantized(self):
+        self.assertEqual(pattern_line(1, 2, 3, 105, 2), (1, 2, 3, 100, 2))
+
+    def test_first_upload_writes_each_line_once(self):
+        self.b1.play_pattern(PATTERN)
+        commands = self.sim.commands()
+        self.assertEqual(commands.count('P'), PATTERN_SIZE)
+        # ledn changes 1 -> 2 -> 1 -> 0 for the padding lines
+        self.assertEqual(commands.count('l'), 4)
+        self.assertEqual(commands[-1], 'p')
+        self.assertEqual(self.sim.pattern[0], (255, 0, 255, 300, 1))
+        self.assertEqual(self.sim.pattern[3], (0, 255, 0, 100, 1))
+        self.assertEqual(self.sim.pattern[4], (0, 0, 0, 0, 0))
+
+    def test_unchanged_upload_writes_nothing(self):
+        self.b1.play_pattern(PATTERN)
+        del self.sim.reports[:]
+        self.b1.play_pattern(PATTERN)
+        self.assertEqual(self.sim.commands(), ['p'])
+
+    def test_only_changed_lines_written(self):
+        self.b1.play_pattern(PATTERN)
+        del self.sim.reports[:]
+        self.b1.play_pattern(PATTERN.replace('#00ff00,0.1,2', '#0000ff,0.1,2'))
+        self.assertEqual(self.sim.commands(), ['l', 'P', 'p'])
+        self.assertEqual(self.sim.pattern[1], (0, 0, 255, 100, 2))
+
+    def test_clear_pattern(self):
+        self.b1.clear_pattern()
+        del self.sim.reports[:]
+        self.b1.clear_pattern()
+        self.assertEqual(self.sim.reports, [])
+
+    def test_sync_from_device(self):
+        self.sim.pattern[5] = (1, 2, 3, 400, 2)
+        lines = self.b1.sync_from_device()
+        self.assertEqual(lines[5], (1, 2, 3, 400, 2))
+        del self.sim.reports[:]
+        self.assertFalse(self.b1.write_pattern_line(400, (1, 2, 3), 5, 2))
+        self.assertTrue(self.b1.write_pattern_line(400, (1, 2, 3), 6, 2))
+        self.assertEqual(self.sim.commands(), ['l', 'P'])
+
+
+if __name__ == '__main__':
+    unittest.main()
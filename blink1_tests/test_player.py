@@ -0,0 +1,205 @@
+import threading
+import time
+import unittest
+
+import mock
+from blink1 import protocol
+from blink1.blink1 import Blink1
+from blink1.player import PatternPlayer, DONE, FAILED, PAUSED, STOPPED
+from blink1.scheduler import Scheduler
+from blink1.simulator import Blink1Simulator
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = Scheduler()
+
+    def tearDown(self):
+        self.scheduler.close()
+
+    def test_runs_in_deadline_order(self):
+        ran = []
+        done = threading.Event()
+        now = time.monotonic()
+        self.scheduler.call_at(now + 0.03, ran.append, 3)
+        self.scheduler.call_at(now + 0.01, ran.append, 1)
+        self.scheduler.call_at(now + 0.02, ran.append, 2)
+        self.scheduler.call_at(now + 0.04, done.set)
+        self.assertTrue(done.wait(1))
+        self.assertEqual(ran, [1, 2, 3])
+
+    def test_cancel(self):
+        ran = []
+        done = threading.Event()
+        timer = self.scheduler.call_later(0.01, ran.append, 1)
+        self.scheduler.call_later(0.02, done.set)
+        timer.cancel()
+        self.assertTrue(done.wait(1))
+        self.assertEqual(ran, [])
+
+    def test_failing_callback_does_not_stop_thread(self):
+        done = threading.Event()
+        self.scheduler.call_later(0, lambda: 1 / 0)
+        self.scheduler.call_later(0.01, done.set)
+        self.assertTrue(done.wait(1))
+
+
+class TestPatternPlayer(unittest.TestCase):
+
+    def setUp(self):
+        self.player = PatternPlayer()
+
+    def tearDown(self):
+        self.player.close()
+
+    def open(self, sim):
+        with mock.patch.object(Blink1, 'find', return_value=sim):
+            return Blink1(shadow=False)
+
+    def test_plays_repeats_then_done(self):
+        sim = Blink1Simulator()
+        b1 = self.open(sim)
+        playback = self.player.start(b1, '2, red,0.01,0, blue,0.01,0')
+        self.assertTrue(playback.wait(1))
+        self.assertEqual(playback.state, DONE)
+        self.assertEqual(sim.commands(), ['c'] * 4)
+        self.assertEqual(sim.leds[1], (0, 0, 255))
+
+    def test_many_devices_one_thread(self):
+        sims = [Blink1Simulator(serial_number='SIM%05d' % i) for i in range(5)]
+        playbacks = [self.player.start(self.open(sim), '3, red,0.01,0, green,0.01,0')
+                     for sim in sims]
+        for playback in playbacks:
+            self.assertTrue(playback.wait(1))
+        for sim in sims:
+            self.assertEqual(len(sim.reports), 6)
+        self.assertEqual(self.player.stats()['steps'], 30)
+
+    def test_device_shared_with_caller_thread(self):
+        sim = Blink1Simulator(latency=0.0001)
+        b1 = self.open(sim)
+        playback = self.player.start(b1, '20, #ff0000,0.002,1, #0000ff,0.002,1')
+        for i in range(100):
+            b1.server_tickle(True, (i + 1) * 10)
+        with b1.lock:  # the timer thread waits for it
+            count = len(sim.reports)
+            time.sleep(0.02)
+            self.assertEqual(len(sim.reports), count)
+        self.assertTrue(playback.wait(2))
+        decoded = [protocol.decode_report(r) for r in sim.reports]
+        self.assertEqual([args[:3] for cmd, args in decoded if cmd == 'c'],
+                         [(255, 0, 0), (0, 0, 255)] * 20)
+        self.assertEqual([args[1] for cmd, args in decoded if cmd == 'D'],
+                         [(i + 1) * 10 for i in range(100)])
+
+    def test_busy_device_does_not_hold_up_others(self):
+        busy = self.open(Blink1Simulator(serial_number='BUSY'))
+        sim = Blink1Simulator(serial_number='FREE')
+        free = self.open(sim)
+        with busy.lock:
+            waiting = self.player.start(busy, '1, red,0.01,0')
+            playback = self.player.start(free, '2, red,0.01,0, blue,0.01,0')
+            # the timer thread retries the busy device instead of blocking
+            self.assertTrue(playback.wait(1))
+            self.assertEqual(sim.commands(), ['c'] * 4)
+            self.assertEqual(busy.dev.reports, [])
+        self.assertTrue(waiting.wait(1))
+        self.assertEqual(busy.dev.commands(), ['c'])
+
+    def test_no_drift(self):
+        # each write takes 5 ms; sleeping after each write would add 100 ms
+        sim = Blink1Simulator(latency=0.005)
+        b1 = self.open(sim)
+        start = time.monotonic()
+        playback = self.player.start(b1, '1' + ', red,0.01,0, blue,0.01,0' * 10)
+        self.assertTrue(playback.wait(2))
+        self.assertLess(time.monotonic() - start, 0.28)
+
+    def test_stop(self):
+        sim = Blink1Simulator()
+        b1 = self.open(sim)
+        playback = self.player.start(b1, '0, red,0.01,0, blue,0.01,0')
+        time.sleep(0.03)
+        self.assertTrue(self.player.stop(b1))
+        self.assertEqual(playback.state, STOPPED)
+        sent = len(sim.reports)
+        time.sleep(0.03)
+        self.assertEqual(len(sim.reports), sent)
+        self.assertFalse(self.player.stop(b1))
+
+    def test_pause_resume(self):
+        sim = Blink1Simulator()
+        b1 = self.open(sim)
+        playback = self.player.start(b1, '1, red,0.02,0, green,0.02,0, blue,0.02,0')
+        time.sleep(0.01)
+        self.assertTrue(self.player.pause(b1))
+        self.assertEqual(playback.state, PAUSED)
+        time.sleep(0.05)
+        self.assertEqual(sim.commands(), ['c'])
+        self.assertTrue(self.player.resume(b1))
+        self.assertTrue(playback.wait(1))
+        self.assertEqual(sim.commands(), ['c'] * 3)
+
+    def test_replace(self):
+        sim = Blink1Simulator()
+        b1 = self.open(sim)
+        first = self.player.start(b1, '0, red,0.01,0, blue,0.01,0')
+        time.sleep(0.02)
+        second = self.player.replace(b1, '1, #00ff00,0.01,0')
+        self.assertEqual(first.state, STOPPED)
+        self.assertTrue(second.wait(1))
+        self.assertEqual(sim.leds[1], (0, 255, 0))
+        self.assertIs(self.player.playback(b1), second)
+
+    def test_failure_stops_playback(self):
+        sim = Blink1Simulator()
+        b1 = self.open(sim)
+        sim.disconnect()
+        playback = self.player.start(b1, '0, red,0.01,0, blue,0.01,0')
+        self.assertTrue(playback.wait(1))
+        self.assertEqual(playback.state, FAILED)
+        self.assertIsNotNone(playback.error)
+
+    def test_zero_time_forever_rejected(self):
+        b1 = self.open(Blink1Simulator())
+        with self.assertRaises(ValueError):
+            self.player.start(b1, '0, red,0,0')
+
+    def test_jitter_stats(self):
+        b1 = self.open(Blink1Simulator())
+        self.player.start(b1, '1, red,0.01,0, blue,0.01,0').wait(1)
+        stats = self.player.stats(b1)
+        self.assertEqual(stats['steps'], 2)
+        self.assertGreaterEqual(stats['jitter_max'], stats['jitter_mean'])
+        self.assertGreaterEqual(stats['jitter_mean'], 0)
+
+
+class TestPlayPatternLocal(unittest.TestCase):
+
+    def open(self, sim):
+        with mock.patch.object(Blink1, 'find', return_value=sim):
+            return Blink1(shadow=False)
+
+    def test_blocking_no_drift(self):
+        # sleeping after each 10 ms write would take 120 ms
+        sim = Blink1Simulator(latency=0.01)
+        b1 = self.open(sim)
+        start = time.monotonic()
+        b1.play_pattern_local('2, red,0.02,0, blue,0.02,0')
+        elapsed = time.monotonic() - start
+        self.assertGreaterEqual(elapsed, 0.075)
+        self.assertLess(elapsed, 0.11)
+        self.assertEqual(sim.commands(), ['c'] * 4)
+
+    def test_background(self):
+        sim = Blink1Simulator()
+        b1 = self.open(sim)
+        playback = b1.play_pattern_local('0, red,0.01,0, blue,0.01,0', background=True)
+        time.sleep(0.03)
+        b1.close()
+        self.assertEqual(playback.state, STOPPED)
+
+
+if __name__ == '__main__':
+    unittest.main()
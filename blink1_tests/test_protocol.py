@@ -0,0 +1,105 @@
+import unittest
+
+import mock
+from blink1 import protocol
+from blink1.blink1 import Blink1
+
+
+class TestEncoders(unittest.TestCase):
+
+    def setUp(self):
+        self.buf = bytearray(protocol.REPORT_SIZE)
+
+    def test_fade_to_rgb(self):
+        protocol.encode_fade_to_rgb(self.buf, 3000, 255, 0, 128, 2)
+        self.assertEqual(list(self.buf), [1, ord('c'), 255, 0, 128, 0x01, 0x2c, 2, 0])
+
+    def test_write_pattern_line(self):
+        protocol.encode_write_pattern_line(self.buf, 100, 1, 2, 3, 7)
+        self.assertEqual(list(self.buf), [1, ord('P'), 1, 2, 3, 0, 10, 7, 0])
+
+    def test_simple_commands(self):
+        cases = [
+            (protocol.encode_set_ledn, (2,), [1, ord('l'), 2, 0, 0, 0, 0, 0, 0]),
+            (protocol.encode_read_pattern_line, (5,), [1, ord('R'), 0, 0, 0, 0, 0, 5, 0]),
+            (protocol.encode_play, (True, 2, 3, 7), [1, ord('p'), 1, 2, 3, 7, 0, 0, 0]),
+            (protocol.encode_play, (False,), [1, ord('p'), 0, 0, 0, 0, 0, 0, 0]),
+            (protocol.encode_save_pattern, (), [1, ord('W'), 0xBE, 0xEF, 0xCA, 0xFE, 0, 0, 0]),
+            (protocol.encode_get_version, (), [1, ord('v'), 0, 0, 0, 0, 0, 0, 0]),
+            (protocol.encode_server_tickle, (True, 5000, True, 0, 16),
+             [1, ord('D'), 1, 0x01, 0xf4, 1, 0, 16, 0]),
+        ]
+        for encoder, args, expected in cases:
+            self.assertEqual(list(encoder(self.buf, *args)), expected)
+
+    def test_long_times_wrap_like_the_device(self):
+        protocol.encode_fade_to_rgb(self.buf, 700000, 0, 0, 0)
+        self.assertEqual(self.buf[5:7], bytes([0x11, 0x70]))
+
+    def test_decoders(self):
+        self.assertEqual(
+            protocol.decode_pattern_line([1, ord('R'), 10, 20, 30, 0x01, 0x2c, 3, 0]),
+            (10, 20, 30, 3000)
+        )
+        self.assertEqual(
+            protocol.decode_version([1, ord('v'), 0, ord('2'), ord('4'), 0, 0, 0, 0]),
+            '204'
+        )
+        protocol.encode_fade_to_rgb(self.buf, 300, 1, 2, 3, 1)
+        self.assertEqual(protocol.decode_report(self.buf), ('c', (1, 2, 3, 300, 1)))
+        protocol.encode_server_tickle(self.buf, True, 2000)
+        self.assertEqual(protocol.decode_report(self.buf), ('D', (1, 2000, 0, 0, 16)))
+
+    def test_report_batch(self):
+        batch = protocol.ReportBatch(capacity=1)
+        batch.add(protocol.encode_set_ledn, 1)
+        batch.add(protocol.encode_write_pattern_line, 100, 255, 0, 0, 0)
+        batch.add(protocol.encode_play, True, count=3)
+        self.assertEqual(len(batch), 3)
+        reports = [bytes(r) for r in batch]
+        self.assertEqual(reports[0], bytes([1, ord('l'), 1, 0, 0, 0, 0, 0, 0]))
+        self.assertEqual(reports[2], bytes([1, ord('p'), 1, 0, 0, 3, 0, 0, 0]))
+        batch.clear()
+        self.assertEqual(list(batch), [])
+
+
+class TestBlink1Reports(unittest.TestCase):
+
+    def setUp(self):
+        self.reports = []
+        self.dev = mock.Mock()
+        self.dev.send_feature_report.side_effect = self.record
+        with mock.patch.object(Blink1, 'find', return_value=self.dev):
+            self.b1 = Blink1(gamma=(1, 1, 1))
+
+    def record(self, buf):
+        # the report buffer is reused, so keep a copy
+        self.reports.append(list(buf))
+        return protocol.REPORT_SIZE
+
+    def sent(self):
+        return self.reports
+
+    def test_fade_to_color(self):
+        self.b1.fade_to_color(1000, '#ff0080', ledn=1)
+        self.assertEqual(self.sent(), [[1, ord('c'), 255, 0, 128, 0, 100, 1, 0]])
+
+    def test_write_pattern_line(self):
+        self.b1.write_pattern_line(500, 'blue', 4, ledn=2)
+        self.assertEqual(self.sent(), [
+            [1, ord('l'), 2, 0, 0, 0, 0, 0, 0],
+            [1, ord('P'), 0, 0, 255, 0, 50, 4, 0],
+        ])
+
+    def test_read_pattern_line(self):
+        self.dev.get_feature_report.return_value = [1, ord('R'), 9, 8, 7, 0, 20, 0, 0]
+        self.assertEqual(self.b1.read_pattern_line(3), (9, 8, 7, 200))
+
+    def test_no_debug_formatting_when_disabled(self):
+        with mock.patch('blink1.protocol.format_report') as fmt:
+            self.b1.off()
+        fmt.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import time
+import unittest
+
+import mock
+from blink1.blink1 import Blink1, Blink1ConnectionFailed
+from blink1.simulator import Blink1Simulator
+
+
+class TestReadback(unittest.TestCase):
+
+    def open(self, sim):
+        with mock.patch.object(Blink1, 'find', return_value=sim):
+            return Blink1()
+
+    def test_version_without_fixed_sleep(self):
+        b1 = self.open(Blink1Simulator(version='204'))
+        start = time.monotonic()
+        self.assertEqual(b1.get_version(), '204')
+        self.assertLess(time.monotonic() - start, 0.04)
+
+    def test_version_polls_until_ready(self):
+        sim = Blink1Simulator(version='205', response_delay=0.02)
+        b1 = self.open(sim)
+        self.assertEqual(b1.get_version(), '205')
+        self.assertGreater(sim.reads, 1)
+
+    def test_version_timeout(self):
+        b1 = self.open(Blink1Simulator(response_delay=10))
+        with self.assertRaises(Blink1ConnectionFailed):
+            b1.read_response(b1._is_version, timeout=0.02)
+
+    def test_version_and_serial_cached(self):
+        sim = Blink1Simulator(serial_number='CAFE0001')
+        b1 = self.open(sim)
+        b1.get_version()
+        b1.get_version()
+        self.assertEqual(sim.commands(), ['v'])
+        self.assertEqual(b1.get_serial_number(), 'CAFE0001')
+        sim.serial_number = 'changed'
+        self.assertEqual(b1.get_serial_number(), 'CAFE0001')
+
+    def test_read_pattern_range(self):
+        sim = Blink1Simulator()
+        sim.pattern[3] = (1, 2, 3, 100, 0)
+        b1 = self.open(sim)
+        self.assertEqual(b1.read_pattern(2, 4), [(0, 0, 0, 0), (1, 2, 3, 100)])
+        self.assertEqual(sim.commands(), ['R', 'R'])
+        self.assertEqual(len(b1.read_pattern()), 32)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+
+import mock
+from blink1.blink1 import Blink1, Blink1ConnectionFailed
+from blink1.reconnect import ReconnectPolicy
+from blink1.simulator import Blink1Simulator
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestReconnect(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = Blink1Simulator(serial_number='ABCD')
+        self.plugged = [True]
+        self.opened = []
+
+        def find(serial_number=None):
+            if not self.plugged[0]:
+                raise Blink1ConnectionFailed("not found")
+            self.opened.append(serial_number)
+            self.sim.connected = True
+            return self.sim
+
+        self.clock = FakeClock()
+        patchers = [
+            mock.patch.object(Blink1, 'find', side_effect=find),
+            mock.patch('time.monotonic', self.clock.monotonic),
+            mock.patch('time.sleep', self.clock.sleep),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_without_policy_raises(self):
+        b1 = Blink1(gamma=(1, 1, 1))
+        self.sim.disconnect()
+        with self.assertRaises(Blink1ConnectionFailed):
+            b1.fade_to_rgb(0, 255, 0, 0)
+        self.assertEqual(self.opened, [None])
+
+    def test_reopens_and_replays(self):
+        events = []
+        policy = ReconnectPolicy(on_disconnect=lambda b1, e: events.append('lost'),
+                                 on_reconnect=lambda b1: events.append('back'))
+        b1 = Blink1(gamma=(1, 1, 1), reconnect=policy)
+        b1.fade_to_rgb(0, 255, 0, 0, 1)
+        b1.fade_to_rgb(0, 0, 0, 255, 2)
+        b1.write_pattern_line(100, (1, 2, 3), 0)
+        self.sim.disconnect()
+        del self.sim.reports[:]
+        b1.fade_to_rgb(0, 0, 255, 0, 2)
+
+        self.assertEqual(self.opened, [None, 'ABCD'])
+        self.assertEqual(events, ['lost', 'back'])
+        self.assertEqual(policy.reconnects, 1)
+        # both LEDs replayed, then the failed command sent again
+        self.assertEqual(self.sim.commands(), ['c', 'c', 'c'])
+        self.assertEqual(self.sim.leds[1], (255, 0, 0))
+        self.assertEqual(self.sim.leds[2], (0, 255, 0))
+        self.assertEqual(b1.shadow.color(2), (0, 255, 0))
+        self.assertIsNone(b1.pattern_ram.lines[0])  # device may have reset
+
+    def test_policy_set_later_reopens_same_device(self):
+        b1 = Blink1(gamma=(1, 1, 1))
+        b1.reconnect = ReconnectPolicy()
+        self.sim.disconnect()
+        b1.fade_to_rgb(0, 255, 0, 0)
+        self.assertEqual(self.opened, [None, 'ABCD'])
+        self.assertEqual(self.sim.leds[1], (255, 0, 0))
+
+    def test_no_replay(self):
+        b1 = Blink1(gamma=(1, 1, 1), reconnect=ReconnectPolicy(replay=False))
+        b1.fade_to_rgb(0, 255, 0, 0)
+        self.sim.disconnect()
+        del self.sim.reports[:]
+        b1.fade_to_rgb(0, 0, 0, 255, 1)
+        self.assertEqual(self.sim.commands(), ['c'])
+        self.assertIsNone(b1.shadow.color(2))
+
+    def test_backoff_and_max_block(self):
+        failed = []
+        policy = ReconnectPolicy(initial_delay=0.1, max_delay=0.4, max_block=1.0,
+                                 on_attempt_failed=lambda b1, e: failed.append(self.clock.now))
+        b1 = Blink1(gamma=(1, 1, 1), reconnect=policy)
+        self.sim.disconnect()
+        self.plugged[0] = False
+        start = self.clock.now
+        with self.assertRaises(Blink1ConnectionFailed):
+            b1.fade_to_rgb(0, 255, 0, 0)
+        self.assertLessEqual(self.clock.now - start, 1.0)
+        gaps = [round(b - a, 3) for a, b in zip(failed, failed[1:])]
+        self.assertEqual(gaps, [0.1, 0.2, 0.4])
+        self.assertTrue(policy.disconnected)
+
+        # the next command carries on with the backoff, then succeeds
+        self.plugged[0] = True
+        b1.fade_to_rgb(0, 0, 255, 0)
+        self.assertFalse(policy.disconnected)
+        self.assertEqual(policy.attempts, 5)
+        self.assertEqual(self.sim.leds[1], (0, 255, 0))
+
+    def test_failed_read_reconnects(self):
+        b1 = Blink1(reconnect=ReconnectPolicy())
+        with mock.patch.object(self.sim, 'get_feature_report', side_effect=OSError("read error")):
+            with self.assertRaises(Blink1ConnectionFailed):
+                b1.get_version()
+        self.assertEqual(self.opened, [None, 'ABCD'])
+        self.assertEqual(b1.get_version(), '205')
+
+
+if __name__ == '__main__':
+    unittest.main()
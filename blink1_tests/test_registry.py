@@ -0,0 +1,159 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+import mock
+from blink1.blink1 import Blink1
+from blink1.registry import (DeviceRegistry, InotifyWatcher, PollingWatcher,
+                             sysfs_fingerprint)
+
+
+class FakeBus(object):
+    """Fake sysfs tree plus matching hidapi enumeration"""
+
+    def __init__(self):
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, 'class', 'hidraw'))
+        self.devices = {}
+        self.enumerations = 0
+
+    def plug(self, n, serial):
+        # enumerable before the watcher can see the sysfs entry
+        self.devices[n] = {'serial_number': serial, 'path': b'/dev/hidraw%d' % n}
+        os.mkdir(os.path.join(self.root, 'class', 'hidraw', 'hidraw%d' % n))
+
+    def unplug(self, n):
+        del self.devices[n]
+        os.rmdir(os.path.join(self.root, 'class', 'hidraw', 'hidraw%d' % n))
+
+    def enumerate(self):
+        self.enumerations += 1
+        return [self.devices[n] for n in sorted(self.devices)]
+
+
+class TestDeviceRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = FakeBus()
+        self.addCleanup(shutil.rmtree, self.bus.root)
+        self.bus.plug(0, 'AAA')
+
+    def test_cached_until_invalidated(self):
+        registry = DeviceRegistry(self.bus.enumerate, watcher=None)
+        self.assertEqual(registry.serials(), ['AAA'])
+        self.assertEqual(registry.lookup('AAA')['path'], b'/dev/hidraw0')
+        self.assertEqual(registry.lookup()['serial_number'], 'AAA')
+        self.assertIsNone(registry.lookup('BBB'))
+        self.assertEqual(self.bus.enumerations, 1)
+        self.bus.plug(1, 'BBB')
+        self.assertEqual(registry.serials(), ['AAA'])
+        registry.invalidate()
+        self.assertEqual(registry.serials(), ['AAA', 'BBB'])
+        self.assertEqual(self.bus.enumerations, 2)
+
+    def test_sysfs_fingerprint(self):
+        self.assertEqual(sysfs_fingerprint(self.bus.root), ('hidraw0',))
+        self.assertEqual(sysfs_fingerprint('/nonexistent'), ())
+
+    def test_polling_hotplug_callbacks(self):
+        watcher = PollingWatcher(lambda: sysfs_fingerprint(self.bus.root), 0.01)
+        registry = DeviceRegistry(self.bus.enumerate, watcher=watcher, settle=0.001)
+        self.addCleanup(registry.close)
+        attached, detached = threading.Event(), threading.Event()
+        events = []
+
+        def on_attach(serial):
+            events.append(('attach', serial))
+            attached.set()
+
+        def on_detach(serial):
+            events.append(('detach', serial))
+            detached.set()
+
+        registry.subscribe(on_attach, on_detach)
+        self.bus.plug(1, 'BBB')
+        self.assertTrue(attached.wait(2))
+        self.assertEqual(registry.serials(), ['AAA', 'BBB'])
+        self.bus.unplug(0)
+        self.assertTrue(detached.wait(2))
+        self.assertEqual(events, [('attach', 'BBB'), ('detach', 'AAA')])
+        self.assertEqual(registry.serials(), ['BBB'])
+
+    def test_scans_until_enumeration_settles(self):
+        registry = DeviceRegistry(self.bus.enumerate, watcher=None, settle=0.001)
+        events = []
+        registry.subscribe(lambda serial: events.append(('attach', serial)),
+                           lambda serial: events.append(('detach', serial)))
+        # hidapi lists the first of two new devices before the second
+        partial = [{'serial_number': 'BBB', 'path': b'/dev/hidraw1'}]
+        self.bus.plug(1, 'BBB')
+        self.bus.plug(2, 'CCC')
+        full = self.bus.enumerate
+        scans = iter([[self.bus.devices[0]] + partial])
+        registry.enumerate_func = lambda: next(scans, None) or full()
+        registry._hotplug()
+        self.assertEqual(events, [('attach', 'BBB'), ('attach', 'CCC')])
+        self.assertEqual(registry.serials(), ['AAA', 'BBB', 'CCC'])
+
+    def test_invalidate_keeps_attached_devices(self):
+        registry = DeviceRegistry(self.bus.enumerate, watcher=None, settle=0.001)
+        events = []
+        registry.subscribe(lambda serial: events.append(('attach', serial)),
+                           lambda serial: events.append(('detach', serial)))
+        registry.invalidate()
+        self.bus.plug(1, 'BBB')
+        registry._hotplug()
+        registry.invalidate()
+        registry.serials()
+        self.bus.unplug(0)
+        registry._hotplug()
+        self.assertEqual(events, [('attach', 'BBB'), ('detach', 'AAA')])
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), "needs inotify")
+    def test_inotify_watcher(self):
+        changed = threading.Event()
+        watcher = InotifyWatcher(dev_root=self.bus.root)
+        watcher.start(changed.set)
+        self.addCleanup(watcher.stop)
+        open(os.path.join(self.bus.root, 'unrelated'), 'w').close()
+        open(os.path.join(self.bus.root, 'hidraw3'), 'w').close()
+        self.assertTrue(changed.wait(2))
+
+
+class TestBlink1WithRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = FakeBus()
+        self.addCleanup(shutil.rmtree, self.bus.root)
+        self.bus.plug(0, 'AAA')
+        self.bus.plug(1, 'BBB')
+        registry = DeviceRegistry(self.bus.enumerate, watcher=None)
+        patcher = mock.patch.object(Blink1, 'registry', registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_list(self):
+        self.assertEqual(Blink1.list(), ['AAA', 'BBB'])
+
+    def test_find_by_path(self):
+        with mock.patch('blink1.blink1.hid') as hid:
+            dev = Blink1.find('BBB')
+        dev.open_path.assert_called_once_with(b'/dev/hidraw1')
+        hid.device.assert_called_once_with()
+        self.assertEqual(self.bus.enumerations, 1)
+
+    def test_find_falls_back_when_path_fails(self):
+        with mock.patch('blink1.blink1.hid') as hid:
+            hid.device.return_value.open_path.side_effect = OSError("gone")
+            Blink1.find('AAA')
+        hid.device.return_value.open.assert_called_once_with(
+            0x27B8, 0x01ED, 'AAA')
+        Blink1.list()
+        self.assertEqual(self.bus.enumerations, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
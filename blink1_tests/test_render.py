@@ -0,0 +1,87 @@
+import array
+import unittest
+
+import mock
+from blink1.blink1 import Blink1, Blink1ConnectionFailed
+from blink1.fleet import Blink1Fleet
+from blink1.render import FrameRenderer
+from blink1.simulator import Blink1Simulator
+
+
+class TestFrameRenderer(unittest.TestCase):
+
+    def setUp(self):
+        self.sims = dict((s, Blink1Simulator(serial_number=s))
+                         for s in ['A1', 'A2', 'A3'])
+
+        def find(serial_number=None):
+            if serial_number not in self.sims:
+                raise Blink1ConnectionFailed(serial_number)
+            return self.sims[serial_number]
+
+        patcher = mock.patch.object(Blink1, 'find', side_effect=find)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.fleet = Blink1Fleet(['A1', 'A2', 'A3'], gamma=(1, 1, 1))
+        self.addCleanup(self.fleet.close)
+        self.renderer = FrameRenderer(self.fleet, fps=20)
+
+    def test_fade_matches_frame_interval(self):
+        self.assertEqual(self.renderer.fade_millis, 50)
+        self.renderer.render([[(1, 2, 3), (1, 2, 3)]] * 3)
+        for sim in self.sims.values():
+            self.assertEqual(len(sim.reports), 1)
+            self.assertEqual(sim.reports[0][5:7], b'\x00\x05')  # 5 ticks
+
+    def test_sends_only_changed_devices(self):
+        frame = bytearray(18)
+        self.renderer.render(frame)
+        frame[6:9] = b'\xff\x00\x00'  # A2 LED 1
+        result = self.renderer.render(frame)
+        self.assertEqual(sorted(result.results), ['A2'])
+        self.assertEqual(self.sims['A2'].leds[1:], [(255, 0, 0), (0, 0, 0)])
+        self.assertEqual(len(self.sims['A1'].reports), 1)
+        stats = self.renderer.stats()
+        self.assertEqual(stats['frames'], 2)
+        self.assertEqual(stats['dispatched'], 4)
+        self.assertEqual(stats['unchanged'], 2)
+
+    def test_unchanged_frame_sends_nothing(self):
+        frame = array.array('B', range(18))
+        self.renderer.render(frame)
+        result = self.renderer.render(frame)
+        self.assertEqual(result.results, {})
+
+    def test_applies_gamma_in_one_pass(self):
+        for serial in self.fleet:
+            self.fleet[serial].cc.gamma = (2, 2, 2)
+        corrected = self.renderer.correct(bytes([128, 255, 0] * 6))
+        self.assertEqual(corrected, self.fleet['A1'].cc.correct_many(bytes([128, 255, 0] * 6)))
+
+    def test_per_device_correction(self):
+        self.fleet['A3'].cc.gamma = (2, 2, 2)
+        corrected = self.renderer.correct(bytes([128] * 18))
+        self.assertEqual(corrected[:12], bytes([128] * 12))
+        self.assertEqual(corrected[12:], self.fleet['A3'].cc.correct_many(bytes([128] * 6)))
+
+    def test_wrong_size(self):
+        with self.assertRaises(ValueError):
+            self.renderer.render(bytes(17))
+
+    def test_failed_device_resent(self):
+        self.sims['A1'].disconnect()
+        result = self.renderer.render(bytes(18))
+        self.assertEqual(list(result.errors), ['A1'])
+        self.sims['A1'].connected = True
+        result = self.renderer.render(bytes(18))
+        self.assertEqual(list(result.results), ['A1'])
+
+    def test_run(self):
+        frames = [bytes([i] * 18) for i in range(5)]
+        stats = self.renderer.run(frames, max_frames=3)
+        self.assertEqual(stats['frames'] + stats['late'], 3)
+        self.assertEqual(self.sims['A1'].leds[1], (2, 2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
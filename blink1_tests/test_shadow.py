@@ -0,0 +1,85 @@
+import time
+import unittest
+
+import mock
+from blink1.blink1 import Blink1, Blink1ConnectionFailed
+from blink1.simulator import Blink1Simulator
+
+
+class TestShadowState(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = Blink1Simulator()
+        with mock.patch.object(Blink1, 'find', return_value=self.sim):
+            self.b1 = Blink1()
+
+    def test_repeated_fade_skipped(self):
+        self.assertTrue(self.b1.fade_to_color(0, 'red'))
+        for i in range(9):
+            self.assertFalse(self.b1.fade_to_color(100, 'red'))
+        self.assertEqual(self.sim.commands(), ['c'])
+        self.assertEqual(self.b1.shadow.skipped, 9)
+
+    def test_running_fade_needs_same_fade_time(self):
+        self.assertTrue(self.b1.fade_to_color(1000, 'red'))
+        self.assertFalse(self.b1.fade_to_color(1000, 'red'))
+        # still fading: another fade time changes how the LED gets there
+        self.assertTrue(self.b1.fade_to_color(0, 'red'))
+        self.assertFalse(self.b1.fade_to_color(500, 'red'))
+        self.assertTrue(self.b1.fade_to_color(300, 'blue', ledn=2))
+        self.assertTrue(self.b1.fade_to_color(0, 'blue'))
+        self.assertTrue(self.b1.fade_to_color(300, 'red'))
+        with mock.patch('time.monotonic', return_value=time.monotonic() + 1):
+            self.assertFalse(self.b1.fade_to_color(0, 'red'))
+        self.assertEqual(self.sim.commands(), ['c'] * 5)
+
+    def test_compared_after_gamma(self):
+        self.b1.fade_to_rgb(0, 10, 10, 10)
+        # 10 and 11 both gamma correct to (0, 0, 0)
+        self.assertFalse(self.b1.fade_to_rgb(0, 11, 11, 11))
+        self.assertFalse(self.b1.off())
+        self.assertEqual(len(self.sim.reports), 1)
+
+    def test_per_led(self):
+        self.b1.fade_to_color(0, 'red', ledn=1)
+        self.assertTrue(self.b1.fade_to_color(0, 'red', ledn=0))
+        self.assertFalse(self.b1.fade_to_color(0, 'red', ledn=2))
+        self.assertTrue(self.b1.fade_to_color(0, 'blue', ledn=2))
+        self.assertTrue(self.b1.fade_to_color(0, 'red', ledn=0))
+
+    def test_play_and_tickle_invalidate(self):
+        self.b1.fade_to_color(0, 'red')
+        self.b1.play()
+        self.assertTrue(self.b1.fade_to_color(0, 'red'))
+        self.b1.server_tickle(True, 2000)
+        self.assertTrue(self.b1.fade_to_color(0, 'red'))
+        self.assertTrue(self.b1.fade_to_color(0, 'red'))
+        self.b1.server_tickle(False)
+        self.assertTrue(self.b1.fade_to_color(0, 'red'))
+        self.assertFalse(self.b1.fade_to_color(0, 'red'))
+        self.b1.stop()
+        self.assertTrue(self.b1.fade_to_color(0, 'red'))
+
+    def test_set_ledn(self):
+        self.b1.write_pattern_line(100, 'red', 0, ledn=1)
+        self.b1.write_pattern_line(100, 'red', 1, ledn=1)
+        self.b1.write_pattern_line(100, 'red', 2, ledn=2)
+        self.assertEqual(self.sim.commands(), ['l', 'P', 'P', 'l', 'P'])
+
+    def test_failed_write_invalidates(self):
+        self.b1.fade_to_color(0, 'red')
+        self.sim.disconnect()
+        with self.assertRaises(Blink1ConnectionFailed):
+            self.b1.fade_to_color(0, 'blue')
+        self.assertIsNone(self.b1.shadow.color(1))
+
+    def test_disabled(self):
+        with mock.patch.object(Blink1, 'find', return_value=self.sim):
+            b1 = Blink1(shadow=False)
+        self.assertTrue(b1.fade_to_color(0, 'red'))
+        self.assertTrue(b1.fade_to_color(0, 'red'))
+        self.assertEqual(self.sim.commands(), ['c', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
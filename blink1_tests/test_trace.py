@@ -0,0 +1,110 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+import mock
+from blink1.blink1 import Blink1
+from blink1.simulator import Blink1Simulator
+from blink1.trace import (HEADER, READ, RECORD_SIZE, WRITE, InvalidTrace,
+                          TraceReader, dump, main, replay)
+
+
+class TestTrace(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        self.path = os.path.join(tmp, 'blink1.trace')
+        self.sim = Blink1Simulator()
+        patcher = mock.patch.object(Blink1, 'find', return_value=self.sim)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record(self, **kwargs):
+        b1 = Blink1(gamma=(1, 1, 1))
+        recorder = b1.start_trace(self.path, **kwargs)
+        b1.fade_to_rgb(100, 255, 0, 0, 1)
+        b1.write_pattern_line(200, '#00ff00', 3)
+        self.assertEqual(b1.get_version(), '205')
+        b1.fade_to_rgb(0, 0, 0, 255, 2)
+        b1.stop_trace()
+        b1.fade_to_rgb(0, 1, 1, 1)  # not recorded
+        return recorder
+
+    def test_record(self):
+        recorder = self.record(buffer_records=2)
+        self.assertEqual(recorder.records, 6)
+        self.assertEqual(os.path.getsize(self.path), HEADER.size + 6 * RECORD_SIZE)
+        with TraceReader(self.path) as trace:
+            self.assertEqual(len(trace), 6)
+            kinds = [kind for _, kind, _ in trace]
+            self.assertEqual(kinds, [WRITE, WRITE, WRITE, WRITE, READ, WRITE])
+            self.assertEqual(trace[0][2], self.sim.reports[0])
+            self.assertEqual(trace[-1][2], self.sim.reports[4])
+            times = [t for t, _, _ in trace]
+            self.assertEqual(times, sorted(times))
+
+    def test_record_list_report(self):
+        b1 = Blink1()
+        b1.start_trace(self.path)
+        report = [1, ord('c'), 10, 20, 30, 0, 10, 2, 0]
+        b1.write(report)
+        b1.stop_trace()
+        with TraceReader(self.path) as trace:
+            self.assertEqual(trace[0][2], bytes(report))
+        self.assertEqual(self.sim.reports, [bytes(report)])
+
+    def test_replay(self):
+        self.record()
+        target = Blink1Simulator()
+        stats = replay(self.path, target, speed=0)
+        self.assertEqual(stats['writes'], 5)
+        self.assertEqual(stats['reads'], 1)
+        self.assertEqual(stats['mismatches'], 0)
+        self.assertEqual(stats['errors'], 0)
+        self.assertEqual(target.reports, self.sim.reports[:5])
+        self.assertEqual(target.leds[1:], [(255, 0, 0), (0, 0, 255)])
+        self.assertEqual(target.pattern[3][:4], (0, 255, 0, 200))
+
+    def test_replay_timing(self):
+        self.record()
+        with TraceReader(self.path) as trace:
+            last = trace[-1][0]
+        sleeps = []
+        with mock.patch('time.sleep', side_effect=sleeps.append):
+            replay(self.path, Blink1Simulator(), speed=2)
+        self.assertLessEqual(sum(sleeps), last / 2)
+
+    def test_replay_errors(self):
+        self.record()
+        target = Blink1Simulator(version='204')
+        stats = replay(self.path, target, speed=0)
+        self.assertEqual(stats['mismatches'], 1)
+        target.disconnect()
+        stats = replay(self.path, target, speed=0)
+        self.assertEqual(stats['errors'], 6)
+
+    def test_invalid_trace(self):
+        for content in (b'', b'BLINK1TR', b'X' * 100):
+            with open(self.path, 'wb') as f:
+                f.write(content)
+            with self.assertRaises(InvalidTrace):
+                TraceReader(self.path)
+
+    def test_dump(self):
+        self.record()
+        lines = list(dump(self.path))
+        self.assertEqual(len(lines), 6)
+        self.assertIn('write', lines[0])
+        self.assertIn('0x01,0x63,0xff', lines[0])
+        out = io.StringIO()
+        with redirect_stdout(out):
+            main(['dump', self.path])
+        self.assertEqual(out.getvalue().splitlines(), lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+from blink1.blink1 import Blink1, VENDOR_ID, PRODUCT_ID
+from blink1.simulator import Blink1Simulator
+from blink1.transport import (
+    HidrawTransport, HidrawDevice, HIDIOCSFEATURE, HIDIOCGFEATURE,
+    hidraw_enumerate, parse_uevent)
+
+
+class FakeIoctl(object):
+    """fcntl.ioctl stand-in that forwards hidraw feature reports to a simulator
+    """
+    def __init__(self, sim):
+        self.sim = sim
+        self.calls = 0
+
+    def __call__(self, fd, request, buf, mutate=True):
+        self.calls += 1
+        size = (request >> 16) & 0x3fff
+        if request == HIDIOCSFEATURE(size):
+            rc = self.sim.send_feature_report(bytes(buf[:size]))
+            if rc < 0:
+                raise OSError(5, "I/O error")
+            return rc
+        if request == HIDIOCGFEATURE(size):
+            buf[:size] = bytes(self.sim.get_feature_report(buf[0], size))
+            return size
+        raise OSError(25, "Inappropriate ioctl for device")
+
+
+class TestHidrawTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.sysfs = os.path.join(self.root, 'sys')
+        self.dev = os.path.join(self.root, 'dev')
+        os.makedirs(self.dev)
+        self.add_node('hidraw0', '0003:0000046D:0000C52B', 'mouse')
+        self.add_node('hidraw1', '0003:000027B8:000001ED', '20002345')
+        self.add_node('hidraw2', '0003:000027B8:000001ED', '20002346')
+        self.sim = Blink1Simulator(serial_number='20002346')
+        self.ioctl = FakeIoctl(self.sim)
+        self.transport = HidrawTransport(self.sysfs, self.dev, ioctl=self.ioctl)
+
+    def add_node(self, name, hid_id, uniq):
+        device = os.path.join(self.sysfs, 'class', 'hidraw', name, 'device')
+        os.makedirs(device)
+        with open(os.path.join(device, 'uevent'), 'w') as f:
+            f.write("DRIVER=hid-generic\nHID_ID=%s\nHID_NAME=test\nHID_UNIQ=%s\n" %
+                    (hid_id, uniq))
+        open(os.path.join(self.dev, name), 'w').close()
+
+    def test_ioctl_numbers(self):
+        # values of HIDIOCSFEATURE(9) / HIDIOCGFEATURE(9) from <linux/hidraw.h>
+        self.assertEqual(HIDIOCSFEATURE(9), 0xC0094806)
+        self.assertEqual(HIDIOCGFEATURE(9), 0xC0094807)
+
+    def test_parse_uevent(self):
+        self.assertEqual(parse_uevent("A=1\nB=x=y\nnoise\n"), {'A': '1', 'B': 'x=y'})
+
+    def test_enumerate(self):
+        devices = hidraw_enumerate(VENDOR_ID, PRODUCT_ID, self.sysfs, self.dev)
+        self.assertEqual([d['serial_number'] for d in devices], ['20002345', '20002346'])
+        self.assertEqual(devices[0]['path'], os.path.join(self.dev, 'hidraw1'))
+
+    def test_enumerate_no_sysfs(self):
+        self.assertEqual(hidraw_enumerate(VENDOR_ID, PRODUCT_ID, '/nonexistent'), [])
+
+    def test_open_by_serial(self):
+        dev = self.transport.open(VENDOR_ID, PRODUCT_ID, '20002346')
+        self.assertEqual(dev.path, os.path.join(self.dev, 'hidraw2'))
+        self.assertEqual(dev.get_serial_number_string(), '20002346')
+        dev.close()
+
+    def test_open_missing(self):
+        with self.assertRaises(OSError):
+            self.transport.open(VENDOR_ID, PRODUCT_ID, 'nope')
+
+    def test_blink1_over_hidraw(self):
+        with mock.patch.object(Blink1, 'transport', self.transport):
+            self.assertEqual(Blink1.list(), ['20002345', '20002346'])
+            b1 = Blink1('20002346', gamma=(1, 1, 1))
+        self.assertIsInstance(b1.dev, HidrawDevice)
+        b1.fade_to_color(0, 'blue')
+        self.assertEqual(self.sim.leds[1], (0, 0, 255))
+        b1.write_pattern_line(100, (10, 20, 30), 3)
+        self.assertEqual(b1.read_pattern_line(3), (10, 20, 30, 100))
+        self.assertEqual(b1.get_version(), '205')
+        b1.close()
+
+    def test_falls_back_to_hidapi(self):
+        sim = Blink1Simulator()
+        transport = HidrawTransport('/nonexistent', self.dev, ioctl=self.ioctl)
+        with mock.patch.object(Blink1, 'transport', transport), \
+                mock.patch('blink1.blink1.hid.device', return_value=sim):
+            b1 = Blink1()
+        self.assertIs(b1.dev, sim)
+
+    def test_write_error(self):
+        dev = self.transport.open(VENDOR_ID, PRODUCT_ID, '20002346')
+        self.sim.disconnect()
+        self.assertEqual(dev.send_feature_report(bytes(9)), -1)
+        with self.assertRaises(OSError):
+            dev.get_feature_report(1, 9)
+        dev.close()
+        self.assertEqual(dev.send_feature_report(bytes(9)), -1)
+
+
+if __name__ == '__main__':
+    unittest.main()